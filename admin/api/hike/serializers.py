@@ -1,11 +1,15 @@
 import uuid
 
 from django.contrib.gis.geos import GEOSGeometry, WKTWriter
-from django.core.management import call_command
 from django.db import connection, transaction
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
+from hikster.hike.duplicates import (
+    get_transaction_timestamp,
+    remove_duplicate_trailsections,
+)
+from hikster.hike.geometry import trailsection_draping
 from hikster.hike.models import (
     EventTrailSection,
     Trail,
@@ -16,7 +20,6 @@ from hikster.hike.models import (
     TrailSectionActivity,
     TrailStep,
 )
-from hikster.hike.tasks import update_geometry_of_evenement
 
 
 class TrailSectionActivitySerializer(serializers.ModelSerializer):
@@ -109,9 +112,11 @@ class TrailSectionAdminSerializer(serializers.ModelSerializer):
         self.update_trailsection_activities(ts_uuid, activities_data)
         instance = self.Meta.model(**validated_data)
         instance.trailsection_activities_uuid = ts_uuid
-        instance.save()
+        with trailsection_draping():
+            instance.save()
         self.save_activities(instance, activities_data)
-        transaction.on_commit(lambda: call_command("remove_duplicate_trailsection"))
+        since = get_transaction_timestamp()
+        transaction.on_commit(lambda: remove_duplicate_trailsections(since))
         return instance
 
     @transaction.atomic
@@ -136,8 +141,10 @@ class TrailSectionAdminSerializer(serializers.ModelSerializer):
                 value = self.convert_3d_to_2d(value)
             setattr(instance, key, value)
 
-        instance.save()
-        transaction.on_commit(lambda: call_command("remove_duplicate_trailsection"))
+        with trailsection_draping():
+            instance.save()
+        since = get_transaction_timestamp()
+        transaction.on_commit(lambda: remove_duplicate_trailsections(since))
         return instance
 
 
@@ -176,6 +183,7 @@ class TrailAdminSerializer(serializers.ModelSerializer):
     activities = TrailActivitySerializer(many=True)
     events = EventTrailSectionSerializer(write_only=True, many=True)
     steps = TrailStepSerializer(many=True, required=False)
+    geometry_pending = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Trail
@@ -189,6 +197,7 @@ class TrailAdminSerializer(serializers.ModelSerializer):
             "images",
             "events",
             "steps",
+            "geometry_pending",
         )
         extra_kwargs = {
             "name": {"required": True, "allow_blank": False},
@@ -271,7 +280,6 @@ class TrailAdminSerializer(serializers.ModelSerializer):
         self.save_events(instance, events_data)
         self.save_steps(instance, steps_data)
         self.update_images(instance, images_data)
-        update_geometry_of_evenement.delay(instance.trail_id)
 
     @transaction.atomic
     def update(self, instance, validated_data):
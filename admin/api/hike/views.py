@@ -11,6 +11,7 @@ from hikster.admin.api.hike.serializers import (
     TrailSectionAdminSerializer,
 )
 from hikster.admin.mixins import FileUploadViewMixin
+from hikster.hike.difficulty import update_trail_activities
 from hikster.hike.models import Activity, Trail, TrailSection, TrailSectionActivity
 
 
@@ -84,10 +85,7 @@ class TrailAdminViewSet(viewsets.ModelViewSet, FileUploadViewMixin):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def calculate_difficulty_and_duration(self, instance):
-        for activity in instance.activities.all():
-            activity.calculate_duration()
-            activity.calculate_difficulty()
-            activity.save()
+        update_trail_activities(trail_ids=[instance.pk])
 
     def perform_create(self, serializer):
         instance = serializer.save()
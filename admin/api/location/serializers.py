@@ -99,7 +99,7 @@ class LocationAdminSerializer(
 
     class Meta:
         model = Location
-        fields = "__all__"
+        exclude = ["shape_simplified"]
 
     def delete_images(self, instance, ids: list):
         LocationImage.objects.filter(location=instance).exclude(id__in=ids).delete()
@@ -1,14 +1,19 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import ObjectDoesNotExist
-from django.core.serializers import serialize
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.db.models import Case, Q, When
 from django.http import Http404, HttpResponseForbidden, JsonResponse
 
 from rest_framework.response import Response
 
 from hikster.hike.models import Activity, Trail
-from hikster.hike.utils import graph_edges_nodes
+from hikster.hike.routing import get_graph
 from hikster.organizations.models import Organization
+from hikster.utils.geojson import (
+    DISPLAY_ZOOM,
+    FULL_PRECISION,
+    GeoJSONStreamingResponse,
+    serialize_geojson,
+)
 from hikster.utils.models import Contact
 
 
@@ -56,16 +61,46 @@ class TrailDetailMixin(LoginRequiredMixin, OrganizationMixin):
             self.organization.locations.values("location_id", "name").order_by("name")
         )
         trail_sections = self.organization.trail_sections.prefetch_related("activities")
-        context["trail_sections_geojson"] = serialize(
-            "geojson",
+        context["trail_sections_geojson"] = serialize_geojson(
             trail_sections,
-            geometry_field="shape",
             fields=("pk", "trailsection_id", "name"),
+            precision=FULL_PRECISION,
         )
-        context["graph"] = graph_edges_nodes(trail_sections)
+        context["graph"] = get_graph(trail_sections, self.organization.pk).to_dict()
         return context
 
 
+class GeoJSONListMixin(object):
+    """
+    Map features of a list view, simplified for the overview map. With
+    ?format=geojson, the features are streamed instead of the page, which
+    fetches them from geo_json_url.
+    """
+
+    geojson_fields = ("pk",)
+    geojson_zoom = DISPLAY_ZOOM
+
+    def get_geojson_queryset(self):
+        raise ImproperlyConfigured(
+            f"{self.__class__.__name__} must define get_geojson_queryset()"
+        )
+
+    def get_geojson_url(self):
+        # Same filters as the page
+        params = self.request.GET.copy()
+        params["format"] = "geojson"
+        return f"{self.request.path}?{params.urlencode()}"
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("format") == "geojson":
+            return GeoJSONStreamingResponse(
+                self.get_geojson_queryset(),
+                fields=self.geojson_fields,
+                zoom=self.geojson_zoom,
+            )
+        return super().get(request, *args, **kwargs)
+
+
 class JsonResponseMixin(object):
     def get(self, request, *args, **kwargs):
         context = self.get_context_data(**kwargs)
@@ -124,27 +159,20 @@ class POIViewMixin(LoginRequiredMixin, OrganizationMixin):
             for type_ in Contact.TYPE_CHOICES
             if type_[0] in Contact.FRONTEND_TYPES
         ]
-        context["trail_sections_geojson"] = serialize(
-            "geojson",
+        context["trail_sections_geojson"] = serialize_geojson(
             self.organization.trail_sections,
-            geometry_field="shape",
             fields=("pk", "trailsection_id", "name"),
+            precision=FULL_PRECISION,
         )
         other_pois = self.get_pois()
         if hasattr(self, "object"):
             other_pois = other_pois.exclude(pk=self.object.pk)
 
-        context["other_pois_geojson"] = serialize(
-            "geojson",
-            other_pois,
-            geometry_field="shape",
-            fields=("pk", "poi_id", "name"),
+        context["other_pois_geojson"] = serialize_geojson(
+            other_pois, fields=("pk", "poi_id", "name")
         )
         context["poi_categories"] = self.poi_categories
-        context["location_geojson"] = serialize(
-            "geojson",
-            self.organization.locations.all(),
-            geometry_field="shape",
-            fields=("pk",),
+        context["location_geojson"] = serialize_geojson(
+            self.organization.locations.all(), fields=("pk",), zoom=DISPLAY_ZOOM
         )
         return context
@@ -1,12 +1,6 @@
-import datetime
-
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.serializers import serialize
-from django.db.models import Count
-from django.db.models.functions import ExtractMonth
 from django.shortcuts import get_object_or_404, redirect
-from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import DetailView, ListView, TemplateView
 
@@ -24,11 +18,18 @@ from hikster.admin.api.location.serializers import (
 from hikster.hike.models import Activity, Trail, TrailSection
 from hikster.location.models import Location
 from hikster.location.utils import get_poi_categories
-from hikster.organizations.models import Organization
+from hikster.organizations.models import Organization, get_month
 from hikster.organizations.serializers import OrganizationSerializer
+from hikster.utils.geojson import DISPLAY_ZOOM, FULL_PRECISION, serialize_geojson
 from hikster.utils.models import Contact
 
-from .mixins import JsonResponseMixin, OrganizationMixin, POIViewMixin, TrailDetailMixin
+from .mixins import (
+    GeoJSONListMixin,
+    JsonResponseMixin,
+    OrganizationMixin,
+    POIViewMixin,
+    TrailDetailMixin,
+)
 
 
 class IndexView(LoginRequiredMixin, ListView):
@@ -53,42 +54,28 @@ class OrganizationView(LoginRequiredMixin, OrganizationMixin, TemplateView):
     section = "profile"
     template_name = "hikster-admin/organization.html"
 
-    def get_loads(self, load_type, years, months):
-        return (
-            getattr(self.organization, load_type)
-            .filter(date_created__year__in=years, date_created__month__in=months)
-            .annotate(month=ExtractMonth("date_created"))
-            .values("month")
-            .annotate(count=Count("pk"))
-            .order_by("month")
-        )
-
     def get_loads_data(self):
-        def get_value(values, month):
-            for item in values:
-                if item["month"] == month:
-                    return item["count"]
-            return 0
-
         def get_last_months(start_date, number_of_months):
             for i in range(number_of_months):
-                yield (start_date.year, start_date.month)
+                yield start_date
                 start_date += relativedelta(months=-1)
 
-        last_5_months = [i for i in get_last_months(timezone.now().date(), 5)]
-        years = [i[0] for i in last_5_months]
-        months = [i[1] for i in last_5_months]
-        page_loads = self.get_loads("page_loads", years, months)
-        widget_loads = self.get_loads("widget_loads", years, months)
+        last_5_months = list(get_last_months(get_month(), 5))
+        counts = {
+            item["month"]: item
+            for item in self.organization.monthly_loads.filter(
+                month__in=last_5_months
+            ).values("month", "widget_loads", "page_loads")
+        }
 
         loads_data = []
-        for item in last_5_months:
-            month = datetime.date(item[0], item[1], 1)
+        for month in last_5_months:
+            item = counts.get(month, {})
             loads_data.append(
                 {
                     "month": month,
-                    "widget_loads": get_value(widget_loads, item[1]),
-                    "page_loads": get_value(page_loads, item[1]),
+                    "widget_loads": item.get("widget_loads", 0),
+                    "page_loads": item.get("page_loads", 0),
                 }
             )
 
@@ -109,20 +96,21 @@ class OrganizationView(LoginRequiredMixin, OrganizationMixin, TemplateView):
         return context
 
 
-class LocationListView(LoginRequiredMixin, OrganizationMixin, TemplateView):
+class LocationListView(
+    LoginRequiredMixin, OrganizationMixin, GeoJSONListMixin, TemplateView
+):
     section = "location-list"
     template_name = "hikster-admin/location-list.html"
+    geojson_fields = ("pk", "location_id", "name")
+
+    def get_geojson_queryset(self):
+        return self.organization.locations.all()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         locations = self.organization.locations.all()
         context["default_sport"] = 1
-        context["geo_json"] = serialize(
-            "geojson",
-            locations,
-            geometry_field="shape",
-            fields=("pk", "location_id", "name"),
-        )
+        context["geo_json_url"] = self.get_geojson_url()
         context["map_style"] = "admin-location-list"
         context["poi_categories"] = get_poi_categories()
         context["locations"] = list(
@@ -151,38 +139,37 @@ class LocationDetailView(LoginRequiredMixin, OrganizationMixin, DetailView):
             for type_ in Contact.TYPE_CHOICES
             if type_[0] in Contact.FRONTEND_TYPES
         ]
-        context["location_shape_geojson"] = serialize(
-            "geojson",
+        context["location_shape_geojson"] = serialize_geojson(
             self.organization.locations.filter(pk=self.object.pk),
-            geometry_field="shape",
             fields=("pk", "location_id", "name"),
+            precision=FULL_PRECISION,
         )
         return context
 
 
-class TrailSectionListView(LoginRequiredMixin, OrganizationMixin, TemplateView):
+class TrailSectionListView(
+    LoginRequiredMixin, OrganizationMixin, GeoJSONListMixin, TemplateView
+):
     section = "trail-sections"
     template_name = "hikster-admin/trail-section-list.html"
+    geojson_fields = ("pk", "trailsection_id", "name")
+
+    def get_geojson_queryset(self):
+        return self.organization.trail_sections
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         trail_sections = self.organization.trail_sections.prefetch_related("activities")
         activities = Activity.objects.values("id", "name").order_by("id")
         context["activities"] = list(activities)
-        context["geo_json"] = serialize(
-            "geojson",
-            trail_sections,
-            geometry_field="shape",
-            fields=("pk", "trailsection_id", "name"),
-        )
+        context["geo_json_url"] = self.get_geojson_url()
         serializer = TrailSectionThinSerializer(trail_sections, many=True)
         context["trail_sections"] = serializer.data
         context["map_style"] = "admin-trail-section-list"
-        context["location_geojson"] = serialize(
-            "geojson",
+        context["location_geojson"] = serialize_geojson(
             self.organization.locations.all(),
-            geometry_field="shape",
             fields=("pk", "location_id", "name"),
+            zoom=DISPLAY_ZOOM,
         )
         return context
 
@@ -201,25 +188,22 @@ class TrailSectionDetailView(LoginRequiredMixin, OrganizationMixin, DetailView):
         context = super().get_context_data(**kwargs)
         trail_section_data = TrailSectionAdminSerializer(self.object).data
         context["trail_section_data"] = trail_section_data
-        context["trail_section_shape_geojson"] = serialize(
-            "geojson",
+        context["trail_section_shape_geojson"] = serialize_geojson(
             self.organization.trail_sections.filter(pk=self.object.pk),
-            geometry_field="shape",
             fields=("pk", "trailsection_id", "name"),
+            precision=FULL_PRECISION,
         )
         activities = Activity.objects.values("id", "name").order_by("id")
         context["activities"] = list(activities)
-        context["location_geojson"] = serialize(
-            "geojson",
+        context["location_geojson"] = serialize_geojson(
             self.organization.locations.all(),
-            geometry_field="shape",
             fields=("pk", "location_id", "name"),
+            zoom=DISPLAY_ZOOM,
         )
-        context["other_trail_sections_geojson"] = serialize(
-            "geojson",
+        context["other_trail_sections_geojson"] = serialize_geojson(
             self.organization.trail_sections.exclude(pk=self.object.pk),
-            geometry_field="shape",
             fields=("pk", "trailsection_id", "name"),
+            precision=FULL_PRECISION,
         )
         context["map_style"] = "admin-trail-section-detail"
         return context
@@ -233,27 +217,30 @@ class TrailSectionCreateView(LoginRequiredMixin, OrganizationMixin, TemplateView
         context = super().get_context_data(**kwargs)
         activities = Activity.objects.values("id", "name").order_by("id")
         context["activities"] = list(activities)
-        context["location_geojson"] = serialize(
-            "geojson",
+        context["location_geojson"] = serialize_geojson(
             self.organization.locations.all(),
-            geometry_field="shape",
             fields=("pk", "location_id", "name"),
+            zoom=DISPLAY_ZOOM,
         )
-        context["other_trail_sections_geojson"] = serialize(
-            "geojson",
+        context["other_trail_sections_geojson"] = serialize_geojson(
             self.organization.trail_sections,
-            geometry_field="shape",
             fields=("pk", "trailsection_id", "name"),
+            precision=FULL_PRECISION,
         )
         context["map_style"] = "admin-trail-section-detail"
         return context
 
 
 class TrailListView(
-    LoginRequiredMixin, OrganizationMixin, JsonResponseMixin, TemplateView
+    LoginRequiredMixin,
+    OrganizationMixin,
+    GeoJSONListMixin,
+    JsonResponseMixin,
+    TemplateView,
 ):
     section = "trail-list"
     template_name = "hikster-admin/trail-list.html"
+    geojson_fields = ("pk", "trail_id", "name")
 
     def get_selected_activity(self):
         activity_id = self.get_query("activity")
@@ -282,6 +269,9 @@ class TrailListView(
 
         return trails
 
+    def get_geojson_queryset(self):
+        return self.get_trails().filter(shape__isnull=False)
+
     def get_context_data(self, **kwargs):
         if self.request.is_ajax():
             context = {}
@@ -307,13 +297,10 @@ class TrailListView(
             context["poi_categories"] = get_poi_categories()
 
         trails = self.get_trails()
-        context["geo_json"] = serialize(
-            "geojson",
-            trails.filter(shape__isnull=False),
-            geometry_field="shape",
-            fields=("pk", "trail_id", "name"),
-        )
-        context["trails"] = TrailThinSerializer(trails, many=True).data
+        context["geo_json_url"] = self.get_geojson_url()
+        context["trails"] = TrailThinSerializer(
+            trails.with_listing_data(), many=True
+        ).data
         return context
 
 
@@ -340,20 +327,21 @@ class TrailDetailView(TrailDetailMixin, DetailView):
         context = super().get_context_data(**kwargs)
         context.update(self.get_common_context())
         context["trail_data"] = TrailAdminSerializer(self.object).data
-        context["trail_shape_geojson"] = serialize(
-            "geojson",
+        context["trail_shape_geojson"] = serialize_geojson(
             Trail.objects.filter(pk=self.object.pk),
-            geometry_field="shape",
             fields=("pk", "trail_id", "name"),
+            precision=FULL_PRECISION,
         )
         context["map_style"] = "admin-trail-detail"
         context["markers"] = self.object.markers
         return context
 
 
-class POIListView(POIViewMixin, JsonResponseMixin, TemplateView):
+class POIListView(POIViewMixin, GeoJSONListMixin, JsonResponseMixin, TemplateView):
     section = "poi-list"
     template_name = "hikster-admin/poi-list.html"
+    geojson_fields = ("pk", "name", "type", "display_name")
+    geojson_zoom = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -368,6 +356,9 @@ class POIListView(POIViewMixin, JsonResponseMixin, TemplateView):
 
         return self.poi_categories[0]
 
+    def get_geojson_queryset(self):
+        return self.get_pois()
+
     def get_selected_type(self, category):
         type_id = self.get_query("type")
         if type_id is not None:
@@ -386,20 +377,14 @@ class POIListView(POIViewMixin, JsonResponseMixin, TemplateView):
             selected_category = self.get_selected_category()
             context["selected_category"] = selected_category
             context["selected_type"] = self.get_selected_type(selected_category)
-            context["trail_sections_geojson"] = serialize(
-                "geojson",
+            context["trail_sections_geojson"] = serialize_geojson(
                 self.organization.trail_sections,
-                geometry_field="shape",
                 fields=("pk", "trailsection_id", "name"),
+                zoom=DISPLAY_ZOOM,
             )
             context["poi_categories"] = self.poi_categories
 
-        context["geo_json"] = serialize(
-            "geojson",
-            self.get_pois(),
-            geometry_field="shape",
-            fields=("pk", "name", "type", "display_name"),
-        )
+        context["geo_json_url"] = self.get_geojson_url()
         context["point_of_interests"] = POIAdminThinSerializer(
             self.get_pois(), many=True
         ).data
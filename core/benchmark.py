@@ -0,0 +1,353 @@
+"""
+Benchmark of the hot paths of the site and the API.
+
+A synthetic dataset is seeded in the database, then every scenario is requested
+with the test client and its query count, wall time and peak memory are
+measured. The dataset is tagged so it can be removed afterwards: its
+organization has the DATASET_TOKEN token, its trail sections the DATASET_TAG
+external id, and the other objects belong to the organization.
+"""
+import math
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import LineString, Point, Polygon
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from hikster.hike.geometry import deferred_event_geometry
+from hikster.hike.models import (
+    Activity,
+    EventTrailSection,
+    Trail,
+    TrailActivity,
+    TrailImage,
+    TrailSection,
+)
+from hikster.location.models import (
+    LOCATION_NETWORK,
+    Location,
+    LocationImage,
+    PointOfInterest,
+    PointOfInterestType,
+)
+from hikster.organizations.models import Organization, OrganizationMember
+
+DATASET_PREFIX = "Benchmark"
+USERNAME = "benchmark"
+DATASET_TOKEN = f"{USERNAME}-token"
+DATASET_TAG = "benchmark-dataset"
+
+# South-west corner of the dataset and size of the square of each location, in
+# degrees
+ORIGIN = (-74.0, 45.5)
+CELL_SIZE = 0.1
+LOCATION_SIZE = 0.08
+SECTIONS_PER_ROW = 10
+VERTICES_PER_SECTION = 5
+
+Scenario = namedtuple("Scenario", ["name", "path", "params", "login"])
+
+
+class DatasetError(Exception):
+    pass
+
+
+class Dataset:
+    """
+    Synthetic dataset: an organization with `locations` networks. Each
+    location contains rows of chained trail sections, trails following these
+    sections, points of interest and banner images.
+    """
+
+    def __init__(self, locations=10, trail_sections=200, trails=50, pois=200):
+        self.locations = max(locations, 1)
+        self.trail_sections = trail_sections
+        self.trails = trails
+        self.pois = pois
+
+    @classmethod
+    @transaction.atomic
+    def clear(cls):
+        """
+        Delete the objects of the dataset, and only them.
+        """
+        TrailSection.objects.filter(external_id=DATASET_TAG).delete()
+
+        organization = cls.organization()
+        if organization is None:
+            return
+        locations = Location.objects.filter(organization=organization)
+        user_ids = list(
+            organization.members.filter(user__username=USERNAME).values_list(
+                "user_id", flat=True
+            )
+        )
+        Trail.objects.filter(location__in=locations).delete()
+        PointOfInterest.objects.filter(organization=organization).delete()
+        locations.delete()
+        organization.delete()
+        get_user_model().objects.filter(pk__in=user_ids).delete()
+
+    @staticmethod
+    def organization():
+        return Organization.objects.filter(
+            name__startswith=DATASET_PREFIX, aid=DATASET_TOKEN
+        ).first()
+
+    @transaction.atomic
+    def seed(self):
+        organization = Organization.objects.create(
+            name=f"{DATASET_PREFIX} organization", aid=DATASET_TOKEN
+        )
+        user = get_user_model().objects.create_user(USERNAME, password=USERNAME)
+        OrganizationMember.objects.create(organization=organization, user=user)
+
+        activities = list(Activity.objects.filter(id__gt=0).order_by("id")[:2])
+        if not activities:
+            activities = [Activity.objects.create(name=f"{DATASET_PREFIX} activity")]
+        poi_type, _ = PointOfInterestType.objects.get_or_create(
+            name=f"{DATASET_PREFIX} type", category=1
+        )
+
+        columns = math.ceil(math.sqrt(self.locations))
+        for index in range(self.locations):
+            x = ORIGIN[0] + (index % columns) * CELL_SIZE
+            y = ORIGIN[1] + (index // columns) * CELL_SIZE
+            location = Location.objects.create(
+                name=f"{DATASET_PREFIX} location {index}",
+                type=LOCATION_NETWORK,
+                dog_allowed=bool(index % 2),
+                organization=organization,
+                shape=Polygon.from_bbox((x, y, x + LOCATION_SIZE, y + LOCATION_SIZE)),
+            )
+            LocationImage.objects.create(
+                location=location, image_type="banner", image="benchmark/banner.jpg"
+            )
+
+            rows = self.seed_trail_sections(index, x, y)
+            with deferred_event_geometry():
+                self.seed_trails(index, location, rows, activities)
+            self.seed_pois(index, x, y, organization, poi_type)
+
+    def share(self, total, index):
+        """
+        Number of objects out of `total` belonging to the location `index`.
+        """
+        return total // self.locations + (index < total % self.locations)
+
+    def seed_trail_sections(self, index, x, y):
+        count = self.share(self.trail_sections, index)
+        row_count = max(math.ceil(count / SECTIONS_PER_ROW), 1)
+        row_height = LOCATION_SIZE / (row_count + 1)
+        section_width = LOCATION_SIZE / SECTIONS_PER_ROW
+        step = section_width / (VERTICES_PER_SECTION - 1)
+
+        rows = []
+        for number in range(count):
+            row, column = divmod(number, SECTIONS_PER_ROW)
+            if column == 0:
+                rows.append([])
+            base_x = x + column * section_width
+            base_y = y + (row + 1) * row_height
+            coordinates = [
+                (
+                    base_x + vertex * step,
+                    base_y + math.sin(vertex) * row_height / 8
+                    if 0 < vertex < VERTICES_PER_SECTION - 1
+                    else base_y,
+                )
+                for vertex in range(VERTICES_PER_SECTION)
+            ]
+            rows[-1].append(
+                TrailSection.objects.create(
+                    name=f"{DATASET_PREFIX} section {index}-{number}",
+                    external_id=DATASET_TAG,
+                    shape_2d=LineString(coordinates, srid=4326),
+                )
+            )
+        return rows
+
+    def seed_trails(self, index, location, rows, activities):
+        if not rows:
+            return
+
+        for number in range(self.share(self.trails, index)):
+            sections = rows[number % len(rows)]
+            start = number // len(rows) % len(sections)
+            trail = Trail.objects.create(
+                name=f"{DATASET_PREFIX} trail {index}-{number}",
+                description=f"{DATASET_PREFIX} trail",
+                location=location,
+                path_type=1,
+            )
+            EventTrailSection.objects.bulk_create(
+                EventTrailSection(
+                    evnt_id=trail.pk,
+                    trailsection=section,
+                    start_position=0,
+                    end_position=1,
+                    order=order,
+                )
+                for order, section in enumerate(sections[start:])
+            )
+            TrailActivity.objects.bulk_create(
+                TrailActivity(
+                    trail=trail,
+                    activity=activity,
+                    difficulty=(number + rank) % 5 + 1,
+                    duration=30 + number % 120,
+                )
+                for rank, activity in enumerate(activities)
+            )
+            TrailImage.objects.create(
+                trail=trail, image_type="banner", image="benchmark/banner.jpg"
+            )
+
+    def seed_pois(self, index, x, y, organization, poi_type):
+        count = self.share(self.pois, index)
+        side = max(math.ceil(math.sqrt(count)), 1)
+        for number in range(count):
+            row, column = divmod(number, side)
+            PointOfInterest.objects.create(
+                name=f"{DATASET_PREFIX} poi {index}-{number}",
+                organization=organization,
+                type=poi_type,
+                category=poi_type.category,
+                visible_in_map=1,
+                shape=Point(
+                    x + (column + 0.5) * LOCATION_SIZE / side,
+                    y + (row + 0.5) * LOCATION_SIZE / side,
+                    srid=4326,
+                ),
+            )
+
+
+def get_scenarios(organization):
+    """
+    Return the benchmarked requests, with the paths of hikster.urls.
+
+    :raise DatasetError: if the dataset has no trail or no location with a
+        shape
+    """
+    trail = Trail.objects.filter(location__organization=organization).first()
+    location = (
+        organization.locations.filter(shape__isnull=False).order_by("pk").first()
+    )
+    if trail is None or location is None:
+        raise DatasetError(
+            "The benchmark dataset needs at least a trail and a location, seed "
+            "it again with --clear --seed."
+        )
+    center = location.shape.centroid
+    min_lng, min_lat, max_lng, max_lat = location.shape.extent
+    bbox = {
+        "min_lng": min_lng,
+        "min_lat": min_lat,
+        "max_lng": max_lng,
+        "max_lat": max_lat,
+    }
+    admin = f"/admin/{organization.pk}"
+
+    return [
+        Scenario("api.trails.list", "/api/trails/", {}, False),
+        Scenario("api.trails.list.bbox", "/api/trails/", bbox, False),
+        Scenario(
+            "api.trails.list.filtered",
+            "/api/trails/",
+            {**bbox, "activities": "1,2", "difficulty": "1,2,3", "dog_allowed": 1},
+            False,
+        ),
+        Scenario(
+            "api.trails.list.keyset",
+            "/api/trails/",
+            {**bbox, "cursor": "", "count": "estimate"},
+            False,
+        ),
+        Scenario("api.trails.retrieve", f"/api/trails/{trail.pk}/", {}, False),
+        Scenario(
+            "api.locations.autosuggest",
+            "/api/locations/autosuggest/",
+            {"search_term": DATASET_PREFIX},
+            False,
+        ),
+        Scenario(
+            "api.pois.coord",
+            "/api/point-of-interests/",
+            {"coord": f"{center.x},{center.y}"},
+            False,
+        ),
+        Scenario("api.search", "/api/search/", {"search_term": DATASET_PREFIX}, False),
+        Scenario(
+            "api.search.autosuggest",
+            "/api/search/autosuggest/",
+            {"search_term": DATASET_PREFIX},
+            False,
+        ),
+        Scenario("website.search", "/results/", {}, False),
+        Scenario(
+            "website.search-iframe", "/map-widget/", {"token": organization.aid}, False
+        ),
+        Scenario("admin.locations", f"{admin}/locations/", {}, True),
+        Scenario("admin.trail-sections", f"{admin}/trail-sections/", {}, True),
+        Scenario("admin.trails", f"{admin}/trails/", {}, True),
+        Scenario("admin.pois", f"{admin}/poi/", {}, True),
+    ]
+
+
+def consume(response):
+    """
+    Render the response completely, the way it would be sent to the client.
+    """
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(scenario, repeat=5, warmup=1):
+    """
+    Request a scenario `warmup` + `repeat` times.
+
+    :return: a dict of the status, size, query count, wall times (in ms) and
+        peak memory (in KiB) of the scenario
+    """
+    client = Client()
+    if scenario.login:
+        client.login(username=USERNAME, password=USERNAME)
+
+    def request():
+        return client.get(scenario.path, scenario.params)
+
+    for _ in range(warmup):
+        consume(request())
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            size = consume(response)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    # Memory is traced in a separate run, tracemalloc slows the code down
+    tracemalloc.start()
+    try:
+        consume(request())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": scenario.name,
+        "status": response.status_code,
+        "size": size,
+        "queries": len(queries),
+        "time_min": round(min(timings), 3),
+        "time_median": round(statistics.median(timings), 3),
+        "time_mean": round(statistics.mean(timings), 3),
+        "peak_memory": round(peak / 1024, 1),
+    }
@@ -0,0 +1,127 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from hikster.core.benchmark import Dataset, DatasetError, get_scenarios, measure
+from hikster.hike.models import Trail
+from hikster.location.models import PointOfInterest
+
+
+class Command(BaseCommand):
+    help = "Measure the query count, wall time and peak memory of the hot paths.\n"
+    help += "The synthetic dataset is written in the configured database, only "
+    help += "run this against a development or benchmark database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", action="store_true", help="Seed the synthetic dataset first."
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove the synthetic dataset (before seeding, if both are given).",
+        )
+        parser.add_argument("--locations", type=int, default=10)
+        parser.add_argument("--trail-sections", type=int, default=200)
+        parser.add_argument("--trails", type=int, default=50)
+        parser.add_argument("--pois", type=int, default=200)
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Measured requests per scenario."
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=1, help="Ignored requests per scenario."
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            default=[],
+            help="Only run the scenarios starting with this name (repeatable).",
+        )
+        parser.add_argument(
+            "--output", help="Write the JSON results to this file instead of stdout."
+        )
+
+    def get_revision(self):
+        try:
+            revision = subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return revision.decode().strip()
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            self.stderr.write("Removing the benchmark dataset...")
+            Dataset.clear()
+
+        if options["seed"]:
+            if Dataset.organization() is not None:
+                raise CommandError(
+                    "The benchmark dataset already exists, use --clear to replace it."
+                )
+            self.stderr.write("Seeding the benchmark dataset...")
+            Dataset(
+                locations=options["locations"],
+                trail_sections=options["trail_sections"],
+                trails=options["trails"],
+                pois=options["pois"],
+            ).seed()
+
+        organization = Dataset.organization()
+        if organization is None:
+            if options["clear"]:
+                return
+            raise CommandError("No benchmark dataset, run the command with --seed.")
+
+        try:
+            all_scenarios = get_scenarios(organization)
+        except DatasetError as e:
+            raise CommandError(str(e))
+        scenarios = [
+            scenario
+            for scenario in all_scenarios
+            if not options["only"]
+            or any(scenario.name.startswith(name) for name in options["only"])
+        ]
+
+        results = []
+        setup_test_environment()
+        try:
+            with override_settings(ROOT_URLCONF="hikster.urls"):
+                for scenario in scenarios:
+                    self.stderr.write(f"Running {scenario.name}...")
+                    results.append(
+                        measure(scenario, options["repeat"], options["warmup"])
+                    )
+        finally:
+            teardown_test_environment()
+
+        report = {
+            "revision": self.get_revision(),
+            "dataset": {
+                "locations": organization.locations.count(),
+                "trail_sections": organization.trail_sections.count(),
+                "trails": Trail.objects.filter(
+                    location__organization=organization
+                ).count(),
+                "pois": PointOfInterest.objects.filter(
+                    organization=organization
+                ).count(),
+            },
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -2,7 +2,8 @@ from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils.translation import ugettext_lazy as _
 
-from hikster.organizations.models import Organization, PageLoad, WidgetLoad
+from hikster.organizations.loads import record_page_load
+from hikster.organizations.models import Organization
 
 
 class PageLoadMixin(object):
@@ -18,14 +19,12 @@ class PageLoadMixin(object):
         if org.consumed_max_page_loads:
             return JsonResponse({"error": _("Max page load exceeded")})
 
-        try:
-            widget_load = WidgetLoad.objects.get(pk=session.get("widget_load_id"))
-        except WidgetLoad.DoesNotExist:
-            widget_load = None
-
-        PageLoad.objects.create(
-            organization=org,
-            widget_load=widget_load,
+        # The sessions opened before the loads were buffered have the id of
+        # the widget load instead of its key
+        record_page_load(
+            org,
+            session.get("widget_load_key"),
             referrer=self.request.META.get("HTTP_REFERER", ""),
             url=self.request.get_raw_uri(),
+            widget_load_id=session.get("widget_load_id"),
         )
@@ -0,0 +1,154 @@
+"""
+Mapbox Vector Tiles for the map layers, rendered by PostGIS with ST_AsMVT.
+
+Each layer reads the geometries intersecting the tile from its table. The
+organization and activity filters are expressed with the ORM and applied as a
+subquery on the primary key, so they stay in sync with the rest of the site.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import Q
+
+from hikster.hike.models import Trail, TrailSection
+from hikster.location.models import Location, PointOfInterest
+
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+
+# Half of the web mercator (EPSG:3857) world width, in meters
+ORIGIN_SHIFT = 20037508.342789244
+
+Layer = namedtuple("Layer", ["model", "geometry", "columns"])
+
+LAYERS = {
+    "trails": Layer(Trail, "shape_2d", ("name", "path_type", "total_length")),
+    "trail-sections": Layer(TrailSection, "shape_2d", ("name",)),
+    "pois": Layer(PointOfInterest, "shape", ("name", "category", "type")),
+    "locations": Layer(Location, "shape", ("name", "type")),
+}
+
+TILE_SQL = """
+    SELECT ST_AsMVT(tile, %s, {extent}, 'geom')
+    FROM (
+        SELECT
+            ST_AsMVTGeom(
+                ST_Transform(t.{geometry}, 3857), envelope.geom, {extent}, {buffer}, true
+            ) AS geom,
+            {columns}
+        FROM {table} t, (SELECT ST_MakeEnvelope(%s, %s, %s, %s, 3857) AS geom) envelope
+        WHERE t.{geometry} && ST_Transform(envelope.geom, 4326)
+        {condition}
+    ) AS tile
+    WHERE tile.geom IS NOT NULL
+"""
+
+
+class InvalidTile(Exception):
+    pass
+
+
+def tile_bounds(z, x, y):
+    """
+    Return the (xmin, ymin, xmax, ymax) web mercator bounds of a tile.
+    """
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise InvalidTile(f"Invalid tile {z}/{x}/{y}")
+
+    size = 2 * ORIGIN_SHIFT / 2 ** z
+    xmin = -ORIGIN_SHIFT + x * size
+    ymax = ORIGIN_SHIFT - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def get_layer_queryset(name, organization=None, activity_id=None):
+    """
+    Return the queryset filtering the features of a layer, or None when the
+    layer is not filtered.
+    """
+    if name == "trails":
+        if organization is None and activity_id is None:
+            return None
+        if organization is not None:
+            queryset = organization.trails
+        else:
+            queryset = Trail.objects.all()
+        if activity_id is not None:
+            queryset = queryset.filter(activities__activity_id=activity_id)
+        return queryset
+
+    if name == "trail-sections":
+        if organization is None and activity_id is None:
+            return None
+        if organization is not None:
+            queryset = organization.trail_sections
+        else:
+            queryset = TrailSection.objects.all()
+        if activity_id is not None:
+            queryset = queryset.filter(activities__activity_id=activity_id)
+        return queryset
+
+    if name == "pois":
+        if organization is not None:
+            return organization.point_of_interests
+        return PointOfInterest.objects.filter(
+            Q(visible_in_map=1) & (~Q(category__in=[1, 4, 5]) | Q(premium=True))
+        )
+
+    if name == "locations":
+        if organization is None:
+            return None
+        return organization.locations.all()
+
+    raise InvalidTile(f"Unknown layer {name}")
+
+
+def get_tile(name, z, x, y, organization=None, activity_id=None):
+    """
+    Render a tile of a layer.
+
+    :param name: one of the LAYERS keys
+    :param organization: only include the features of this organization
+    :param activity_id: only include the trails and trail sections of this activity
+    :return: the tile, as bytes
+    """
+    try:
+        layer = LAYERS[name]
+    except KeyError:
+        raise InvalidTile(f"Unknown layer {name}")
+
+    bounds = tile_bounds(z, x, y)
+    opts = layer.model._meta
+
+    columns = [f"t.{opts.pk.column} AS id"]
+    columns += [
+        f"t.{opts.get_field(column).column} AS {column}" for column in layer.columns
+    ]
+
+    condition = ""
+    params = [name, *bounds]
+    queryset = get_layer_queryset(name, organization, activity_id)
+    if queryset is not None:
+        try:
+            subquery, subquery_params = queryset.values("pk").query.sql_with_params()
+        except EmptyResultSet:
+            return b""
+        condition = f"AND t.{opts.pk.column} IN ({subquery})"
+        params += subquery_params
+
+    sql = TILE_SQL.format(
+        extent=EXTENT,
+        buffer=BUFFER,
+        geometry=opts.get_field(layer.geometry).column,
+        columns=", ".join(columns),
+        table=opts.db_table,
+        condition=condition,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        tile = cursor.fetchone()[0]
+
+    return bytes(tile) if tile else b""
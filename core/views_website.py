@@ -1,7 +1,12 @@
-from django.views.generic import TemplateView
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.generic import TemplateView, View
 
+from hikster.core.tiles import InvalidTile, get_tile
 from hikster.hike.models import Activity
 from hikster.location.models import Location
+from hikster.organizations.models import Organization
 
 
 class AboutView(TemplateView):
@@ -26,3 +31,37 @@ class HomeView(TemplateView):
         )
         context["location_count"] = Location.objects.count()
         return context
+
+
+class TileView(View):
+    """
+    Serve a vector tile of the map layers. The tile can be restricted to an
+    organization with ?organization=<id> and to an activity with ?activity=<id>.
+    """
+
+    cache_max_age = 60 * 60
+
+    def get(self, request, layer, z, x, y):
+        organization = None
+        organization_id = request.GET.get("organization")
+        if organization_id:
+            if not organization_id.isdigit():
+                raise Http404
+            organization = get_object_or_404(Organization, pk=organization_id)
+
+        activity_id = request.GET.get("activity")
+        if activity_id:
+            if not activity_id.isdigit():
+                raise Http404
+            activity_id = int(activity_id)
+        else:
+            activity_id = None
+
+        try:
+            tile = get_tile(layer, z, x, y, organization, activity_id)
+        except InvalidTile:
+            raise Http404
+
+        response = HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile")
+        patch_cache_control(response, public=True, max_age=self.cache_max_age)
+        return response
@@ -0,0 +1,101 @@
+"""
+Nearest neighbour queries with the PostGIS KNN operator.
+
+Ordering by `shape <-> point` lets PostGIS walk the GiST index of the shape
+and stop as soon as enough rows are found, instead of computing the exact
+distance of every candidate before sorting them. The operator orders by the
+distance between the bounding boxes in degrees, which is close enough to
+rank the map results; the exact distance is only computed for the returned
+rows (see nearest).
+"""
+from math import cos, radians
+
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Polygon
+from django.contrib.gis.measure import D
+from django.db.models import F, FloatField, Func, Subquery, Value
+from rest_framework.exceptions import ValidationError
+
+# Length of a degree of latitude, in metres
+DEGREE_LENGTH = 111320
+
+# Upper bound of the number of nearest objects returned
+MAX_LIMIT = 500
+
+
+class KNNDistance(Func):
+    """
+    The `field <-> point` expression, to order by.
+    """
+
+    arg_joiner = " <-> "
+    template = "(%(expressions)s)"
+
+    def __init__(self, field, point):
+        super().__init__(
+            F(field),
+            Value(point, output_field=GeometryField(srid=point.srid)),
+            output_field=FloatField(),
+        )
+
+
+def get_knn_params(params):
+    """
+    Return the `limit` and `radius` query parameters of a nearest search.
+
+    :raise ValidationError: if a parameter is not a positive number
+    """
+    try:
+        limit = int(params["limit"]) if params.get("limit") else None
+        radius = float(params["radius"]) if params.get("radius") else None
+    except ValueError:
+        raise ValidationError("limit and radius must be numbers")
+
+    if (limit is not None and limit <= 0) or (radius is not None and radius <= 0):
+        raise ValidationError("limit and radius must be positive")
+    return limit, radius
+
+
+def radius_envelope(point, radius):
+    """
+    Return the bounding box of the circle of `radius` metres around a point.
+    """
+    dy = radius / DEGREE_LENGTH
+    dx = dy / max(cos(radians(point.y)), 0.01)
+    envelope = Polygon.from_bbox(
+        (point.x - dx, point.y - dy, point.x + dx, point.y + dy)
+    )
+    envelope.srid = point.srid
+    return envelope
+
+
+def nearest(queryset, field, point, limit=None, radius=None, distance=None):
+    """
+    Order a queryset by the distance of its `field` to a point, nearest first.
+
+    :param limit: only keep the `limit` nearest objects (at most MAX_LIMIT)
+    :param radius: only keep the objects closer than `radius` metres, the
+        GiST index is used to find the candidates
+    :param distance: annotate the exact distance to the point under this
+        name, it is only computed for the rows fetched
+
+    :return: the queryset, ordered by distance then by primary key
+    """
+    if radius is not None:
+        queryset = queryset.filter(
+            **{f"{field}__bboverlaps": radius_envelope(point, radius)}
+        ).filter(**{f"{field}__distance_lte": (point, D(m=radius))})
+
+    if limit is not None:
+        # The nearest objects are found by an index scan stopped after `limit`
+        # rows, the outer query only orders them
+        nearest_ids = (
+            queryset.order_by(KNNDistance(field, point))
+            .values("pk")[: min(limit, MAX_LIMIT)]
+        )
+        queryset = queryset.filter(pk__in=Subquery(nearest_ids))
+
+    if distance:
+        queryset = queryset.annotate(**{distance: Distance(field, point)})
+    return queryset.order_by(KNNDistance(field, point), "pk")
@@ -1,5 +1,16 @@
+import base64
+import binascii
+import json
+import operator
+from functools import reduce
+
+from django.db import connections
+from django.db.models import F, Q, Subquery
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -20,3 +31,179 @@ class CustomPageNumberPagination(PageNumberPagination):
             return int(self.page.paginator.count / self.page_size)
         else:
             return int(self.page.paginator.count / self.page_size) + 1
+
+
+def estimate_count(queryset) -> int:
+    """
+    Return the number of rows of a queryset estimated by the planner, without
+    running the query.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_keyset(queryset):
+    """
+    Return the ordering of a queryset as a list of (expression, descending),
+    ending with the primary key so the rows are in a unique order.
+    """
+    model = queryset.model
+    ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+
+    keys = []
+    for item in ordering:
+        if isinstance(item, str):
+            name = item.lstrip("-")
+            keys.append((F(name), item.startswith("-"), name))
+        elif isinstance(item, OrderBy):
+            keys.append((item.expression, item.descending, None))
+        else:
+            keys.append((item, False, None))
+
+    if not keys or keys[-1][2] not in ("pk", model._meta.pk.name):
+        keys.append((F("pk"), False, "pk"))
+    return [(expression, descending) for expression, descending, _ in keys]
+
+
+class KeysetPagination(CustomPageNumberPagination):
+    """
+    Same as CustomPageNumberPagination, or keyset pagination when the request
+    has a `cursor` parameter (empty for the first page): a page starts after
+    the last row of the previous one instead of skipping OFFSET rows, so
+    deep pages are as fast as the first one.
+
+    The rows are in the order of the queryset, completed by the primary key.
+    The ordering may contain expressions, like the distance of
+    helpers.knn.nearest. The rows with NULL keys are only on the first page.
+
+    The count is not computed, unless asked with `count=exact`, or
+    `count=estimate` for the planner estimate.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    keyset = False
+
+    def encode_cursor(self, pk, reverse=False):
+        data = json.dumps([pk, reverse]).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        :return: the primary key of the row the page starts after (None for
+            the first page) and whether the page is before it
+        """
+        if not cursor:
+            return None, False
+        try:
+            pk, reverse = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return pk, bool(reverse)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return queryset.count()
+        if mode == "estimate":
+            return estimate_count(queryset)
+        return None
+
+    def get_boundary_filter(self, queryset, aliases, keys, pk, reverse):
+        """
+        Return the filter of the rows after (before if reverse) the row `pk`.
+        Its keys are computed in the query, as they are in the ordering.
+        """
+        boundary = queryset.filter(pk=pk).order_by()
+        values = {alias: Subquery(boundary.values(alias)[:1]) for alias in aliases}
+
+        conditions = []
+        for index, (alias, (_, descending)) in enumerate(zip(aliases, keys)):
+            lookup = "lt" if descending != reverse else "gt"
+            condition = Q(**{f"{alias}__{lookup}": values[alias]})
+            for previous in aliases[:index]:
+                condition &= Q(**{previous: values[previous]})
+            conditions.append(condition)
+        return reduce(operator.or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        pk, reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        self.count = self.get_count(queryset, request)
+
+        keys = get_keyset(queryset)
+        aliases = [f"_keyset_{index}" for index in range(len(keys))]
+        queryset = queryset.annotate(
+            **{alias: expression for alias, (expression, _) in zip(aliases, keys)}
+        )
+        queryset = queryset.order_by(
+            *[
+                F(alias).desc() if descending != reverse else F(alias).asc()
+                for alias, (_, descending) in zip(aliases, keys)
+            ]
+        )
+        if pk is not None:
+            queryset = queryset.filter(
+                self.get_boundary_filter(queryset, aliases, keys, pk, reverse)
+            )
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.previous_pk = rows[0].pk if has_more else None
+            # The next page starts at the row the cursor pointed to
+            self.next_pk = rows[-1].pk if rows else None
+            self.has_next = True
+        else:
+            self.previous_pk = rows[0].pk if pk is not None and rows else None
+            self.next_pk = rows[-1].pk if has_more else None
+            self.has_next = has_more
+        return rows
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        cursor = "" if self.next_pk is None else self.encode_cursor(self.next_pk)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if self.previous_pk is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.previous_pk, reverse=True),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "prev": self.get_previous_link(),
+            "count": self.count,
+            "results": data
+        })
@@ -0,0 +1,107 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from hikster.helpers.knn import nearest
+from hikster.helpers.pagination import KeysetPagination
+from hikster.location.models import PointOfInterest
+
+PAGE_SIZE = 3
+
+# Bound of the number of pages walked, in case the links loop
+MAX_PAGES = 50
+
+
+class KeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # A grid around the origin: many points are at the same distance of
+        # it, and the names repeat, so the ties are broken by the primary key
+        for x in range(-2, 3):
+            for y in range(-2, 3):
+                PointOfInterest.objects.create(
+                    name=f"poi {abs(x) + abs(y)}", shape=Point(x, y, srid=4326)
+                )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def paginate(self, queryset, cursor):
+        paginator = KeysetPagination()
+        paginator.page_size = PAGE_SIZE
+        request = Request(self.factory.get("/pois/", {"cursor": cursor}))
+        rows = paginator.paginate_queryset(queryset, request)
+        return paginator, [row.pk for row in rows]
+
+    def get_cursor(self, link):
+        if link is None:
+            return None
+        params = parse_qs(urlparse(link).query, keep_blank_values=True)
+        return params["cursor"][0]
+
+    def walk(self, queryset):
+        """
+        Follow the next links from the first page, then the previous links
+        from the last page.
+
+        :return: the primary keys of the pages, forward and backward
+        """
+        forward, cursor = [], ""
+        while cursor is not None and len(forward) < MAX_PAGES:
+            paginator, pks = self.paginate(queryset, cursor)
+            forward.append(pks)
+            cursor = self.get_cursor(paginator.get_next_link())
+
+        backward, cursor = [], self.get_cursor(paginator.get_previous_link())
+        while cursor is not None and len(backward) < MAX_PAGES:
+            paginator, pks = self.paginate(queryset, cursor)
+            backward.insert(0, pks)
+            cursor = self.get_cursor(paginator.get_previous_link())
+        backward.append(forward[-1])
+
+        return forward, backward
+
+    def assertWalks(self, queryset):
+        expected = [poi.pk for poi in queryset]
+        forward, backward = self.walk(queryset)
+
+        for pages in (forward, backward):
+            pks = [pk for page in pages for pk in page]
+            self.assertEqual(pks, expected)
+            self.assertTrue(all(len(page) <= PAGE_SIZE for page in pages))
+            self.assertTrue(all(pages))
+        self.assertTrue(all(len(page) == PAGE_SIZE for page in forward[:-1]))
+
+    def test_field_ordering(self):
+        self.assertWalks(PointOfInterest.objects.order_by("name"))
+
+    def test_descending_field_ordering(self):
+        self.assertWalks(PointOfInterest.objects.order_by("-name"))
+
+    def test_knn_ordering(self):
+        queryset = nearest(
+            PointOfInterest.objects.all(), "shape", Point(0, 0, srid=4326)
+        )
+        self.assertWalks(queryset)
+
+    def test_knn_ordering_with_distance(self):
+        queryset = nearest(
+            PointOfInterest.objects.all(),
+            "shape",
+            Point(0.5, 0, srid=4326),
+            distance="distance",
+        )
+        self.assertWalks(queryset)
+
+    def test_no_count_by_default(self):
+        paginator, _ = self.paginate(PointOfInterest.objects.order_by("pk"), "")
+        self.assertIsNone(paginator.count)
+        self.assertIsNone(paginator.get_previous_link())
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate(PointOfInterest.objects.order_by("pk"), "not-a-cursor")
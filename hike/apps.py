@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class HikeConfig(AppConfig):
     name = 'hikster.hike'
+
+    def ready(self):
+        import hikster.hike.signals  # noqa
@@ -0,0 +1,153 @@
+"""
+Batch computation of the difficulty and the duration of the trail activities.
+
+The rules are the ones of TrailActivity.calculate_difficulty and
+calculate_duration, but the length, ascent and descent of the trails and the
+parameters of the activities are loaded once in NumPy arrays and every
+trail × activity pair is computed in one pass. Only the changed rows are
+written back, with a single UPDATE.
+"""
+import numpy as np
+from django.db import connection
+
+from .models import Activity, Trail, TrailActivity
+
+ACTIVITY_FIELDS = (
+    "flat_pace",
+    "ascent_pace",
+    "descent_pace",
+    "dev1",
+    "dev2",
+    "dev3",
+    "dev4",
+    "distance1",
+    "distance2",
+    "distance3",
+    "distance4",
+)
+
+TRAIL_FIELDS = ("total_length", "height_positive", "height_negative")
+
+UPDATE_SQL = """
+    UPDATE hike_trailactivity ta
+    SET difficulty = v.difficulty, duration = v.duration
+    FROM unnest(%s::integer[], %s::integer[], %s::integer[])
+        AS v(id, difficulty, duration)
+    WHERE ta.id = v.id
+        AND (
+            ta.difficulty IS DISTINCT FROM v.difficulty
+            OR ta.duration IS DISTINCT FROM v.duration
+        )
+"""
+
+
+def load_arrays(queryset, fields):
+    """
+    Return the primary keys of a queryset, sorted, and the values of its
+    fields as a float array with a row per object (None is NaN).
+    """
+    rows = list(queryset.order_by("pk").values_list("pk", *fields))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(fields)))
+    values = np.array(rows, dtype=np.float64)
+    return values[:, 0].astype(np.int64), values[:, 1:]
+
+
+def compute_duration(length, ascent, descent, activity):
+    """
+    Return the durations in minutes, rounded up to the next 15 minutes, NaN
+    when they can't be computed.
+
+    :param activity: the ACTIVITY_FIELDS arrays, by field
+    """
+    descent_duration = np.where(
+        activity["descent_pace"] != 0, -descent / activity["descent_pace"], 0
+    )
+    duration_hours = (
+        ascent / activity["ascent_pace"]
+        + descent_duration
+        + length / activity["flat_pace"]
+    )
+    duration_minutes = np.trunc(duration_hours * 60)
+    return (np.trunc(duration_minutes / 15) + 1) * 15
+
+
+def compute_difficulty(length, ascent, descent, activity):
+    """
+    Return the difficulties, the first level whose distance and elevation
+    ellipse contains the trail, NaN when they can't be computed.
+
+    :param activity: the ACTIVITY_FIELDS arrays, by field
+    """
+    length_km = length / 1000
+    ascent_descent = ascent - np.where(activity["descent_pace"] != 0, descent, 0)
+
+    levels = np.column_stack(
+        [
+            (length_km / activity[f"distance{x}"]) ** 2
+            + (ascent_descent / activity[f"dev{x}"]) ** 2
+            < 1
+            for x in (1, 2, 3, 4)
+        ]
+    )
+    difficulty = np.where(
+        levels.any(axis=1),
+        levels.argmax(axis=1) + TrailActivity.DIFFICULTY_BEGINNER,
+        TrailActivity.DIFFICULTY_EXPERT,
+    ).astype(np.float64)
+
+    difficulty[np.isnan(length) | np.isnan(ascent) | np.isnan(descent)] = np.nan
+    return difficulty
+
+
+def to_list(values):
+    return [int(value) if np.isfinite(value) else None for value in values]
+
+
+def update_trail_activities(trail_ids=None, activity_ids=None):
+    """
+    Compute the difficulty and the duration of the trail activities.
+
+    :param trail_ids: only update the activities of these trails, all of them
+        if None
+    :param activity_ids: only update these activities, all of them if None
+
+    :return: the number of trail activities whose values changed
+    """
+    pairs = TrailActivity.objects.all()
+    if trail_ids is not None:
+        pairs = pairs.filter(trail_id__in=trail_ids)
+    if activity_ids is not None:
+        pairs = pairs.filter(activity_id__in=activity_ids)
+
+    pairs = np.array(
+        list(pairs.order_by().values_list("pk", "trail_id", "activity_id")),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    if not len(pairs):
+        return 0
+
+    trail_pks, trails = load_arrays(
+        Trail.objects.filter(pk__in=np.unique(pairs[:, 1]).tolist()), TRAIL_FIELDS
+    )
+    activity_pks, activities = load_arrays(
+        Activity.objects.filter(pk__in=np.unique(pairs[:, 2]).tolist()),
+        ACTIVITY_FIELDS,
+    )
+
+    # Broadcast the trails and the activities to the pairs
+    trails = trails[np.searchsorted(trail_pks, pairs[:, 1])]
+    activities = activities[np.searchsorted(activity_pks, pairs[:, 2])]
+    length, ascent, descent = trails.T
+    activity = dict(zip(ACTIVITY_FIELDS, activities.T))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        duration = compute_duration(length, ascent, descent, activity)
+        difficulty = compute_difficulty(length, ascent, descent, activity)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPDATE_SQL,
+            [pairs[:, 0].tolist(), to_list(difficulty), to_list(duration)],
+        )
+        return cursor.rowcount
@@ -0,0 +1,94 @@
+"""
+Removal of the duplicate trail sections, the sections with the same shape_2d.
+
+The candidates are found by shape_hash (see hike/sql/93_trailsection_shape_hash.sql)
+and confirmed with a bounding box and an exact comparison of the shapes. The
+section with the lowest id of every group is kept, the events using the
+others are moved to it before they are deleted.
+"""
+from django.db import connection, transaction
+
+from .models import TrailSection
+
+DUPLICATES_SQL = """
+    SELECT keep.trailsection_id, dup.trailsection_id
+    FROM hike_trailsection dup
+    JOIN LATERAL (
+        SELECT t.trailsection_id FROM hike_trailsection t
+        WHERE t.shape_hash = dup.shape_hash
+            AND t.shape_2d ~= dup.shape_2d
+            AND ST_OrderingEquals(t.shape_2d, dup.shape_2d)
+        ORDER BY t.trailsection_id
+        LIMIT 1
+    ) keep ON keep.trailsection_id < dup.trailsection_id
+    WHERE dup.shape_hash IN ({hashes})
+    ORDER BY dup.trailsection_id
+"""
+
+# Hashes shared by several sections
+ALL_HASHES_SQL = """
+    SELECT shape_hash FROM hike_trailsection
+    WHERE shape_hash IS NOT NULL
+    GROUP BY shape_hash HAVING count(*) > 1
+"""
+
+# Hashes of the sections inserted or updated since a date
+CHANGED_HASHES_SQL = """
+    SELECT shape_hash FROM hike_trailsection
+    WHERE shape_hash IS NOT NULL AND date_update >= %s
+"""
+
+MOVE_EVENTS_SQL = """
+    UPDATE hike_eventtrailsection et SET trailsection = d.keep_id
+    FROM unnest(%s::integer[], %s::integer[]) AS d(keep_id, remove_id)
+    WHERE et.trailsection = d.remove_id
+"""
+
+
+def get_transaction_timestamp():
+    """
+    Return the start date of the current transaction, the date_update of the
+    sections written in it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT now()")
+        return cursor.fetchone()[0]
+
+
+def find_duplicate_trailsections(since=None):
+    """
+    :param since: only look for the duplicates of the sections inserted or
+        updated since this date, look in the whole table if None
+
+    :return: a list of (kept section id, duplicate section id)
+    """
+    if since is None:
+        sql, params = DUPLICATES_SQL.format(hashes=ALL_HASHES_SQL), []
+    else:
+        sql, params = DUPLICATES_SQL.format(hashes=CHANGED_HASHES_SQL), [since]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+@transaction.atomic
+def remove_duplicate_trailsections(since=None):
+    """
+    Move the events of the duplicate sections to the kept sections and
+    delete the duplicates.
+
+    :param since: see find_duplicate_trailsections
+
+    :return: the ids of the deleted sections
+    """
+    duplicates = find_duplicate_trailsections(since)
+    if not duplicates:
+        return []
+
+    keep_ids, remove_ids = (list(ids) for ids in zip(*duplicates))
+    with connection.cursor() as cursor:
+        cursor.execute(MOVE_EVENTS_SQL, [keep_ids, remove_ids])
+    TrailSection.objects.filter(pk__in=remove_ids).delete()
+
+    return remove_ids
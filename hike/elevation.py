@@ -0,0 +1,314 @@
+"""
+Elevation engine sampling the DEM with NumPy.
+
+It computes the same elevation infos as ft_elevation_infos (see
+hike/sql/71_update_3d_triggers.sql) without querying the raster for every
+sampled point: the tiles of the `mnt` table loaded by loaddem are read once,
+cached on disk as .npy files and memory-mapped, then whole lines are sampled
+at once with a bilinear interpolation.
+"""
+import os
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection
+
+# Same fields as the elevation_infos SQL type
+ElevationInfos = namedtuple(
+    "ElevationInfos",
+    [
+        "draped",
+        "slope",
+        "min_elevation",
+        "max_elevation",
+        "positive_gain",
+        "negative_gain",
+    ],
+)
+
+DEM_TABLE = "mnt"
+
+# Maximal distance between two sampled points, in SRID units. This is the step
+# given to ft_drape_line by the triggers.
+DRAPE_STEP = 1
+
+# Number of points on each side averaged by the smoothing (see ft_smooth_line)
+SMOOTHING_STEP = 1
+
+# Number of memory-mapped tiles kept open by a Dem
+MAX_OPEN_TILES = 256
+
+EARTH_RADIUS = 6371008.8
+
+TILES_SQL = f"""
+    SELECT rid, (md).upperleftx, (md).upperlefty, (md).width, (md).height,
+        (md).scalex, (md).scaley, ST_BandNoDataValue(rast, 1)
+    FROM (
+        SELECT rid, rast, ST_MetaData(rast) AS md FROM {DEM_TABLE}
+        WHERE ST_ConvexHull(rast) && ST_MakeEnvelope(%s, %s, %s, %s, %s)
+    ) tiles
+"""
+
+TILE_VALUES_SQL = f"SELECT ST_DumpValues(rast, 1) FROM {DEM_TABLE} WHERE rid = %s"
+
+
+def get_cache_dir():
+    return getattr(
+        settings, "DEM_CACHE_DIR", os.path.join(settings.MEDIA_ROOT, "..", "dem")
+    )
+
+
+def geodesic_length(xs, ys):
+    """
+    Return the length in metres of a line in degrees (haversine formula).
+    """
+    if len(xs) < 2:
+        return 0.0
+
+    lng = np.radians(xs)
+    lat = np.radians(ys)
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+    )
+    return float(np.sum(2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))))
+
+
+def length(geom):
+    """
+    Return the length in metres of a line in degrees.
+    """
+    if geom.geom_type != "LineString":
+        return 0.0
+    coords = np.asarray(geom.coords)
+    return geodesic_length(coords[:, 0], coords[:, 1])
+
+
+class DemTile:
+    """
+    A tile of the DEM, its values are read from the cache file.
+    """
+
+    def __init__(self, rid, x, y, width, height, scale_x, scale_y, nodata):
+        self.rid = rid
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+        self.nodata = nodata
+
+    @property
+    def path(self):
+        return os.path.join(get_cache_dir(), f"{self.rid}.npy")
+
+    def fetch(self):
+        """
+        Read the values of the tile from the database and write them in the
+        cache, the no data values are stored as NaN.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(TILE_VALUES_SQL, [self.rid])
+            values = np.array(cursor.fetchone()[0], dtype=np.float64)
+
+        if self.nodata is not None:
+            values[values == self.nodata] = np.nan
+
+        os.makedirs(get_cache_dir(), exist_ok=True)
+        # Written then renamed, other processes may read the cache
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self.fetch()
+        return np.load(self.path, mmap_mode="r")
+
+    def contains(self, xs, ys):
+        col = (xs - self.x) / self.scale_x
+        row = (ys - self.y) / self.scale_y
+        return (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+
+    def sample(self, values, xs, ys):
+        """
+        Interpolate the values at the points, between the centers of the 4
+        closest pixels of the tile.
+        """
+        col = np.clip((xs - self.x) / self.scale_x - 0.5, 0, self.width - 1)
+        row = np.clip((ys - self.y) / self.scale_y - 0.5, 0, self.height - 1)
+        col0 = np.floor(col).astype(int)
+        row0 = np.floor(row).astype(int)
+        col1 = np.minimum(col0 + 1, self.width - 1)
+        row1 = np.minimum(row0 + 1, self.height - 1)
+        dx = col - col0
+        dy = row - row0
+
+        top = values[row0, col0] * (1 - dx) + values[row0, col1] * dx
+        bottom = values[row1, col0] * (1 - dx) + values[row1, col1] * dx
+        result = top * (1 - dy) + bottom * dy
+
+        # Next to a no data pixel, fall back to the closest pixel
+        missing = np.isnan(result)
+        if missing.any():
+            nearest = values[
+                np.rint(row[missing]).astype(int), np.rint(col[missing]).astype(int)
+            ]
+            result[missing] = nearest
+        return result
+
+
+class Dem:
+    """
+    The DEM loaded in the `mnt` table. The tiles are looked up in the
+    database, their values are memory-mapped from the cache.
+    """
+
+    def __init__(self, srid=4326):
+        self.srid = srid
+        self.open_tiles = OrderedDict()
+
+    @staticmethod
+    def exists():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM raster_columns WHERE r_table_name = %s", [DEM_TABLE]
+            )
+            return cursor.fetchone() is not None
+
+    @staticmethod
+    def clear_cache():
+        """
+        Remove the cached tiles, to call after the DEM was (re)loaded.
+        """
+        cache_dir = get_cache_dir()
+        if not os.path.isdir(cache_dir):
+            return
+        for filename in os.listdir(cache_dir):
+            if filename.endswith(".npy"):
+                os.remove(os.path.join(cache_dir, filename))
+
+    def get_tiles(self, xs, ys):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                TILES_SQL, [xs.min(), ys.min(), xs.max(), ys.max(), self.srid]
+            )
+            return [DemTile(*row) for row in cursor.fetchall()]
+
+    def get_values(self, tile):
+        values = self.open_tiles.pop(tile.rid, None)
+        if values is None:
+            values = tile.load()
+        self.open_tiles[tile.rid] = values
+        while len(self.open_tiles) > MAX_OPEN_TILES:
+            self.open_tiles.popitem(last=False)
+        return values
+
+    def sample(self, xs, ys):
+        """
+        Return the elevation at the points, rounded like ST_Value(...)::integer.
+        The points outside the DEM are at 0.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        elevations = np.full(xs.shape, np.nan)
+        if not len(xs):
+            return elevations
+
+        for tile in self.get_tiles(xs, ys):
+            todo = np.isnan(elevations) & tile.contains(xs, ys)
+            if todo.any():
+                elevations[todo] = tile.sample(
+                    self.get_values(tile), xs[todo], ys[todo]
+                )
+
+        return np.rint(np.nan_to_num(elevations))
+
+    def drape(self, coords, step=DRAPE_STEP):
+        """
+        Return the 3D points of a line sampled every `step` (see
+        ft_drape_line). A line already in 3D is returned as is.
+
+        :param coords: the coordinates of the line, an array of (x, y[, z])
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        if coords.shape[1] > 2:
+            if coords[:, 2].min() < 0 or coords[:, 2].max() > 0:
+                return coords[:, :3]
+
+        start = coords[:-1, :2]
+        end = coords[1:, :2]
+        lengths = np.hypot(*(end - start).T)
+        counts = np.trunc(lengths / step).astype(int) + 1
+        # The end of the segments is the start of the next one, except the last
+        counts_with_end = counts.copy()
+        counts_with_end[-1] += 1
+
+        segments = np.repeat(np.arange(len(counts)), counts_with_end)
+        offsets = np.arange(len(segments)) - np.repeat(
+            np.cumsum(counts_with_end) - counts_with_end, counts_with_end
+        )
+        fractions = offsets / counts[segments]
+        points = start[segments] + (end - start)[segments] * fractions[:, None]
+
+        elevations = self.sample(points[:, 0], points[:, 1])
+        return np.column_stack([points, elevations])
+
+    def elevation_infos(self, geom, step=DRAPE_STEP):
+        """
+        Return the ElevationInfos of a geometry, see ft_elevation_infos.
+        """
+        srid = geom.srid or self.srid
+
+        if geom.geom_type == "Point":
+            elevation = self.sample([geom.x], [geom.y])[0]
+            if geom.hasz and geom.z and geom.z > 0:
+                elevation = geom.z
+            point = Point(geom.x, geom.y, elevation, srid=srid)
+            return ElevationInfos(point, 0.0, int(elevation), int(elevation), 0, 0)
+
+        if geom.geom_type != "LineString":
+            return ElevationInfos(geom.clone(), 0.0, 0, 0, 0, 0)
+
+        points = self.drape(geom.coords, step)
+        elevations = smooth(points[:, 2])
+
+        gains = np.diff(elevations)
+        min_elevation = int(elevations.min())
+        max_elevation = int(elevations.max())
+        length = geodesic_length(points[:, 0], points[:, 1])
+        slope = (max_elevation - min_elevation) / length if length > 0 else 0.0
+
+        draped = LineString(
+            np.column_stack([points[:, :2], elevations]).tolist(), srid=srid
+        )
+        return ElevationInfos(
+            draped,
+            slope,
+            min_elevation,
+            max_elevation,
+            int(gains[gains > 0].sum()),
+            int(gains[gains < 0].sum()),
+        )
+
+
+def smooth(elevations, step=SMOOTHING_STEP):
+    """
+    Moving average of the elevations over `step` points on each side, rounded
+    like ft_smooth_line.
+    """
+    window = np.ones(2 * step + 1)
+    padding = np.zeros(step)
+    totals = np.convolve(
+        np.concatenate([padding, elevations, padding]), window, mode="valid"
+    )
+    counts = np.convolve(
+        np.concatenate([padding, np.ones(len(elevations)), padding]),
+        window,
+        mode="valid",
+    )
+    return np.rint(totals / counts)
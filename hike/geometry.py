@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .difficulty import update_trail_activities
+from .duplicates import get_transaction_timestamp
+from .models import Event, TrailSection
+
+DEFER_SETTING = "hikster.defer_event_geometry"
+SKIP_DRAPING_SETTING = "hikster.skip_draping"
+
+PENDING_EVENTS_SQL = """
+    DELETE FROM hike_pendingeventgeometry WHERE event_id IN (
+        SELECT event_id FROM hike_pendingeventgeometry
+        ORDER BY date_queued, event_id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING event_id
+"""
+
+
+def use_numpy_engine():
+    """
+    Whether the elevations are computed by hike.elevation instead of the
+    PostGIS functions (see the ELEVATION_ENGINE setting).
+    """
+    return getattr(settings, "ELEVATION_ENGINE", "postgis") == "numpy"
+
+
+def set_local(name, value):
+    """
+    Set a setting until the end of the transaction.
+
+    :return: the previous value
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT current_setting(%s, true)", [name])
+        previous = cursor.fetchone()[0] or "off"
+        cursor.execute("SELECT set_config(%s, %s, true)", [name, value])
+    return previous
+
+
+def drape_trailsections(queryset, dem=None):
+    """
+    Compute the 3D shape and the elevation infos of trail sections with the
+    NumPy engine.
+    """
+    from .elevation import Dem, length
+
+    dem = dem or Dem()
+    for section in queryset.exclude(shape_2d__isnull=True).only("pk", "shape_2d"):
+        infos = dem.elevation_infos(section.shape_2d)
+        TrailSection.objects.filter(pk=section.pk).update(
+            shape=infos.draped,
+            lgth=length(infos.draped),
+            slope=infos.slope,
+            min_elevation=infos.min_elevation,
+            max_elevation=infos.max_elevation,
+            ascent=infos.positive_gain,
+            descent=infos.negative_gain,
+        )
+
+
+def drape_events(ids, dem=None):
+    """
+    Compute the elevation infos of events with the NumPy engine, from the 3D
+    shape merged by update_geometry_of_evenement. The trails are updated by
+    update_geometry_of_trail_trg.
+    """
+    from .elevation import Dem, length
+
+    dem = dem or Dem()
+    events = Event.objects.filter(pk__in=ids).exclude(shape__isnull=True)
+    for event in events.only("pk", "shape"):
+        infos = dem.elevation_infos(event.shape)
+        Event.objects.filter(pk=event.pk).update(
+            shape=infos.draped,
+            lgth=length(infos.draped),
+            slope=infos.slope,
+            min_elevation=infos.min_elevation,
+            max_elevation=infos.max_elevation,
+            ascent=infos.positive_gain,
+            descent=infos.negative_gain,
+        )
+
+
+def update_pending_event_geometries(max_count=None):
+    """
+    Compute the geometry of the queued events (see PendingEventGeometry).
+
+    :param max_count: the maximum number of events to compute, all of them by
+        default
+
+    :return: the number of events computed
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(PENDING_EVENTS_SQL, [max_count])
+            ids = [row[0] for row in cursor.fetchall()]
+
+            if use_numpy_engine():
+                previous = set_local(SKIP_DRAPING_SETTING, "on")
+            cursor.execute(
+                """
+                SELECT update_geometry_of_evenement(event_id) FROM hike_event
+                WHERE event_id = ANY(%s)
+                """,
+                [ids],
+            )
+
+        if use_numpy_engine():
+            set_local(SKIP_DRAPING_SETTING, previous)
+            drape_events(ids)
+
+        # The length and the elevation gains of the trails changed
+        update_trail_activities(trail_ids=ids)
+
+    return len(ids)
+
+
+@contextmanager
+def deferred_event_geometry(update=True):
+    """
+    Defer the computation of the event geometries during bulk writes of
+    EventTrailSection: in the block, the touched events are only queued, then
+    they are computed once each at the end of the block.
+
+    :param update: if False, the queued events are left for a later
+        update_pending_event_geometries call
+    """
+    with transaction.atomic():
+        previous = set_local(DEFER_SETTING, "on")
+
+        yield
+
+        set_local(DEFER_SETTING, previous)
+        if update and previous != "on":
+            update_pending_event_geometries()
+
+
+@contextmanager
+def trailsection_draping():
+    """
+    With the NumPy engine, drape the trail sections written in the block
+    (including the ones split by the triggers) at the end of the block. The
+    events using them are queued for update_pending_event_geometries_task.
+    """
+    if not use_numpy_engine():
+        yield
+        return
+
+    with transaction.atomic():
+        since = get_transaction_timestamp()
+        with deferred_event_geometry(update=False):
+            previous = set_local(SKIP_DRAPING_SETTING, "on")
+
+            yield
+
+            set_local(SKIP_DRAPING_SETTING, previous)
+
+        drape_trailsections(TrailSection.objects.filter(date_update__gte=since))
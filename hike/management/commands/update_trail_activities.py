@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hikster.hike.difficulty import update_trail_activities
+
+
+class Command(BaseCommand):
+    help = """Compute the difficulty and the duration of the trail activities."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--trail",
+            type=int,
+            action="append",
+            dest="trail_ids",
+            help="Only update the activities of this trail (repeatable).",
+        )
+        parser.add_argument(
+            "--activity",
+            type=int,
+            action="append",
+            dest="activity_ids",
+            help="Only update this activity (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = update_trail_activities(
+                trail_ids=options["trail_ids"], activity_ids=options["activity_ids"]
+            )
+
+        if options["verbosity"] > 0:
+            self.stdout.write(
+                self.style.SUCCESS(f"{count} trail activities have been updated")
+            )
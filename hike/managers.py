@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
 
 
 # Custom manager to return objects eagerly. This is to prevent overriding get_queryset in serializers
@@ -9,7 +10,47 @@ class TrailSectionManager(models.Manager):
         return queryset
 
 
-class TrailManager(models.Manager):
+class TrailQuerySet(models.QuerySet):
+    def with_listing_data(self):
+        """
+        Load the data displayed in the trail lists along with the trails: the
+        lowest difficulty and duration of the activities are annotated as
+        min_difficulty and min_duration, the pending geometry computation as
+        has_pending_geometry, the activities and the banners are prefetched.
+        The elevation profile is not loaded.
+        """
+        from .models import PendingEventGeometry, TrailActivity, TrailImage
+
+        activities = TrailActivity.objects.filter(trail=OuterRef("pk"))
+
+        return self.defer("profile").annotate(
+            min_difficulty=Subquery(
+                activities.filter(difficulty__isnull=False)
+                .order_by("difficulty")
+                .values("difficulty")[:1]
+            ),
+            min_duration=Subquery(
+                activities.filter(duration__isnull=False)
+                .order_by("duration")
+                .values("duration")[:1]
+            ),
+            has_pending_geometry=Exists(
+                PendingEventGeometry.objects.filter(event_id=OuterRef("pk"))
+            ),
+        ).prefetch_related(
+            Prefetch(
+                "activities",
+                queryset=TrailActivity.objects.select_related("activity"),
+            ),
+            Prefetch(
+                "images",
+                queryset=TrailImage.objects.banners().order_by("pk"),
+                to_attr="banner_images",
+            ),
+        )
+
+
+class TrailManager(models.Manager.from_queryset(TrailQuerySet)):
     def get_queryset(self):
         queryset = super(TrailManager, self).get_queryset()
         queryset = queryset.select_related("location__address")
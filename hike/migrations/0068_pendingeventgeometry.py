@@ -0,0 +1,31 @@
+import os
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("hike", "0067_shape_simplified")]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingEventGeometry",
+            fields=[
+                ("event_id", models.IntegerField(primary_key=True, serialize=False)),
+                (
+                    "date_queued",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            load_sql_statement_from_file("91_event_geometry_statement_triggers.sql")
+        ),
+    ]
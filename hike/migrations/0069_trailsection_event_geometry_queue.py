@@ -0,0 +1,20 @@
+import os
+
+from django.db import migrations
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("hike", "0068_pendingeventgeometry")]
+
+    operations = [
+        migrations.RunSQL(
+            load_sql_statement_from_file("92_trailsection_event_geometry_queue.sql")
+        )
+    ]
@@ -0,0 +1,27 @@
+import os
+
+from django.db import migrations, models
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("hike", "0069_trailsection_event_geometry_queue")]
+
+    operations = [
+        migrations.AddField(
+            model_name="trailsection",
+            name="shape_hash",
+            field=models.CharField(
+                db_index=True, editable=False, max_length=32, null=True
+            ),
+        ),
+        migrations.RunSQL(
+            load_sql_statement_from_file("93_trailsection_shape_hash.sql")
+        ),
+    ]
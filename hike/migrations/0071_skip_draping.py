@@ -0,0 +1,18 @@
+import os
+
+from django.db import migrations
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("hike", "0070_trailsection_shape_hash")]
+
+    operations = [
+        migrations.RunSQL(load_sql_statement_from_file("94_skip_draping.sql"))
+    ]
@@ -0,0 +1,26 @@
+import os
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("hike", "0071_skip_draping")]
+
+    operations = [
+        migrations.AddField(
+            model_name="trail",
+            name="profile",
+            field=django.contrib.postgres.fields.jsonb.JSONField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(load_sql_statement_from_file("95_trail_profile.sql")),
+    ]
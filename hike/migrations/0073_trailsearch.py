@@ -0,0 +1,66 @@
+import os
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("location", "0038_location_shape_simplified"),
+        ("hike", "0072_trail_profile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrailSearch",
+            fields=[
+                ("trail_id", models.IntegerField(primary_key=True, serialize=False)),
+                (
+                    "activity_ids",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), default=list, size=None
+                    ),
+                ),
+                (
+                    "difficulties",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), default=list, size=None
+                    ),
+                ),
+                ("total_length", models.FloatField(db_index=True, null=True)),
+                ("path_type", models.IntegerField(db_index=True, null=True)),
+                ("dog_allowed", models.NullBooleanField()),
+                ("location_id", models.IntegerField(db_index=True, null=True)),
+                ("region_id", models.IntegerField(db_index=True, null=True)),
+                (
+                    "shape",
+                    django.contrib.gis.db.models.fields.GeometryField(
+                        null=True, srid=4326
+                    ),
+                ),
+            ],
+            options={"db_table": "trail_search"},
+        ),
+        migrations.AddIndex(
+            model_name="trailsearch",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["activity_ids"], name="trail_search_activity_ids_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trailsearch",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["difficulties"], name="trail_search_difficulties_gin"
+            ),
+        ),
+        migrations.RunSQL(load_sql_statement_from_file("96_trail_search.sql")),
+    ]
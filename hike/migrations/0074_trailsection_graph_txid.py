@@ -0,0 +1,25 @@
+import os
+
+from django.db import migrations, models
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("hike", "0073_trailsearch")]
+
+    operations = [
+        migrations.AddField(
+            model_name="trailsection",
+            name="graph_txid",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            load_sql_statement_from_file("97_trailsection_graph_txid.sql")
+        ),
+    ]
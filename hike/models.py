@@ -4,7 +4,9 @@ import itertools
 from decimal import Decimal
 
 from django.contrib.gis.db import models
-from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import ugettext_lazy as _
@@ -12,7 +14,7 @@ from django.utils.translation import ugettext_lazy as _
 from hikster.helpers import functions
 from hikster.search import types as index_types
 from hikster.utils.models import ImageBase
-from .managers import TrailManager, TrailSectionManager
+from .managers import TrailManager, TrailQuerySet, TrailSectionManager
 
 
 class Activity(models.Model):
@@ -156,6 +158,17 @@ class TrailSection(models.Model):
     shape_2d = models.LineStringField(
         blank=True, null=True, srid=4326, dim=2, spatial_index=False
     )
+    # Simplified 2D shape for the maps, computed by a trigger
+    shape_simplified = models.GeometryField(
+        srid=4326, null=True, editable=False, spatial_index=False
+    )
+    # md5 of shape_2d to find the duplicate sections, computed by a trigger
+    shape_hash = models.CharField(
+        max_length=32, null=True, editable=False, db_index=True
+    )
+    # Transaction that last wrote shape_2d or lgth, set by a trigger for the
+    # routing graph cache (see hike.routing.get_graph)
+    graph_txid = models.BigIntegerField(default=0, editable=False)
     ascent = models.IntegerField(
         default=0, null=True, blank=True
     )  # denivellee_positive
@@ -210,6 +223,21 @@ class EventTrailSection(models.Model):
         return super(EventTrailSection, self).save(*args, **kwargs)
 
 
+class PendingEventGeometry(models.Model):
+    """
+    Event whose geometry has to be recomputed. The triggers of
+    EventTrailSection queue the events here instead of computing their
+    geometry when the hikster.defer_event_geometry setting is on (see
+    hike.geometry.deferred_event_geometry).
+    """
+
+    event_id = models.IntegerField(primary_key=True)
+    date_queued = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.event_id} Pending event geometry"
+
+
 class Event(models.Model):
     event_id = models.OneToOneField(
         "Trail",
@@ -266,6 +294,30 @@ class Trail(models.Model):
     id_field = "trail_id"
     index_type = index_types.TYPE_TRAIL
 
+    # Properties of the trails in the GeoJSON of the maps, read by the popups
+    GEOJSON_FIELDS = (
+        "pk",
+        "trail_id",
+        "objectid",
+        "slug",
+        "trail_type",
+        "name",
+        "description",
+        "total_length",
+        "min_elevation",
+        "max_elevation",
+        "path_type",
+        "height_positive",
+        "height_negative",
+        "height_difference",
+        "private",
+        "hikster_creation",
+        "opening_dates",
+        "last_modified",
+        "location",
+        "region",
+    )
+
     objectid = models.IntegerField(null=True, blank=True)
     trail_id = models.AutoField(primary_key=True)
     slug = models.SlugField(max_length=300, default="", blank=True)
@@ -303,10 +355,16 @@ class Trail(models.Model):
     trail_sections = models.ManyToManyField(TrailSection, blank=True)
 
     # Managers
-    objects = models.Manager()
+    objects = TrailQuerySet.as_manager()
     objects_with_eager_loading = TrailManager()
 
     shape_2d = models.GeometryField(srid=4326, null=True, blank=True, dim=2)
+    # Simplified 2D shape for the maps, computed by a trigger
+    shape_simplified = models.GeometryField(
+        srid=4326, null=True, editable=False, spatial_index=False
+    )
+    # Elevation profile of the shape, computed by a trigger (see hike.profile)
+    profile = JSONField(null=True, editable=False)
 
     @property
     def object_type(self):
@@ -332,24 +390,41 @@ class Trail(models.Model):
             self.slug = "%s-%d" % (original, x)
 
         super(Trail, self).save(*args, **kwargs)
-        trailAcivities = TrailActivity.objects.filter(trail_id=self.trail_id)
-        for trailActivity in trailAcivities:
-            trailActivity.calculate_difficulty
-            trailActivity.calculate_duration
-            trailActivity.save()
+
+        from .difficulty import update_trail_activities
+
+        update_trail_activities(trail_ids=[self.trail_id])
+
+    @property
+    def activities_prefetched(self):
+        return "activities" in getattr(self, "_prefetched_objects_cache", {})
 
     @property
     def activity_names(self):
+        if self.activities_prefetched:
+            return [activity.activity.name for activity in self.activities.all()]
         return self.activities.values_list("activity__name", flat=True)
 
     @property
     def banner(self):
+        # Prefetched by TrailQuerySet.with_listing_data
+        if hasattr(self, "banner_images"):
+            return self.banner_images[0] if self.banner_images else None
         return self.images.banners().first()
 
     @property
     def activity_ids(self):
+        if self.activities_prefetched:
+            return [activity.activity_id for activity in self.activities.all()]
         return self.activities.values_list("activity__id", flat=True)
 
+    @property
+    def geometry_pending(self):
+        # Annotated by TrailQuerySet.with_listing_data
+        if hasattr(self, "has_pending_geometry"):
+            return self.has_pending_geometry
+        return PendingEventGeometry.objects.filter(event_id=self.trail_id).exists()
+
     @property
     def markers(self):
         event_trail_sections = list(
@@ -361,20 +436,59 @@ class Trail(models.Model):
 
     @cached_property
     def difficulty(self):
+        # Annotated by TrailQuerySet.with_listing_data
+        if hasattr(self, "min_difficulty"):
+            choices = dict(TrailActivity.DIFFICULTY_CHOICES)
+            return choices.get(self.min_difficulty, "")
+
         activity = self.activities.order_by("difficulty").first()
         return activity.get_difficulty_display() if activity else ""
 
     @cached_property
     def duration(self):
-        activity = self.activities.order_by("duration").first()
-        if activity is None:
+        # Annotated by TrailQuerySet.with_listing_data
+        if hasattr(self, "min_duration"):
+            duration = self.min_duration
+        else:
+            activity = self.activities.order_by("duration").first()
+            duration = activity.duration if activity else None
+
+        if duration is None:
             return "-"
-        duration = activity.duration
         hours = math.floor(duration / 60)
         minutes = duration % 60
         return f"{hours}h{minutes}"
 
 
+class TrailSearch(models.Model):
+    """
+    Search data of a trail, denormalized in one row by the triggers of
+    hike/sql/96_trail_search.sql so the trails can be filtered without
+    joining their activities and their location. The shape is the
+    simplified 2D shape of the trail.
+    """
+
+    trail_id = models.IntegerField(primary_key=True)
+    activity_ids = ArrayField(models.IntegerField(), default=list)
+    difficulties = ArrayField(models.IntegerField(), default=list)
+    total_length = models.FloatField(null=True, db_index=True)
+    path_type = models.IntegerField(null=True, db_index=True)
+    dog_allowed = models.NullBooleanField()
+    location_id = models.IntegerField(null=True, db_index=True)
+    region_id = models.IntegerField(null=True, db_index=True)
+    shape = models.GeometryField(srid=4326, null=True)
+
+    class Meta:
+        db_table = "trail_search"
+        indexes = [
+            GinIndex(fields=["activity_ids"], name="trail_search_activity_ids_gin"),
+            GinIndex(fields=["difficulties"], name="trail_search_difficulties_gin"),
+        ]
+
+    def __str__(self):
+        return f"{self.trail_id} Trail search"
+
+
 class TrailSectionActivity(models.Model):
     trail_section = models.ForeignKey(
         TrailSection, on_delete=models.CASCADE, related_name="activities"
@@ -0,0 +1,84 @@
+"""
+Elevation profiles of the trails.
+
+The profile of a trail is stored in Trail.profile by the hikster_trail_profile_trg
+trigger (see hike/sql/95_trail_profile.sql) whenever its shape changes:
+{"distance": [...], "elevation": [...]}, the cumulative distance and the
+elevation in metres, simplified with a tolerance of PROFILE_TOLERANCE.
+"""
+
+# Tolerance of the stored profiles, in metres
+PROFILE_TOLERANCE = 1
+
+
+def bucket_bounds(count, points):
+    """
+    Return the (start, end) index ranges of the buckets of the downsampling of
+    `count` points to `points` points: the first and last points are kept, the
+    others are split in `points - 2` buckets. Computed with integers, so the
+    last bucket always ends before the last point.
+    """
+    buckets = points - 2
+    return [
+        (
+            bucket * (count - 2) // buckets + 1,
+            (bucket + 1) * (count - 2) // buckets + 1,
+        )
+        for bucket in range(buckets)
+    ]
+
+
+def downsample(distance, elevation, points):
+    """
+    Downsample a profile to `points` points with the Largest-Triangle-Three-
+    Buckets algorithm, which keeps the peaks and the valleys of the chart.
+
+    :return: the distance and elevation lists
+    """
+    count = len(distance)
+    if points >= count or points < 3:
+        return distance, elevation
+
+    sampled = [0]
+    bounds = bucket_bounds(count, points)
+    selected = 0
+
+    for bucket, (start, end) in enumerate(bounds):
+        # Average point of the next bucket, the last point after the last one
+        next_start, next_end = (
+            bounds[bucket + 1] if bucket + 1 < len(bounds) else (count - 1, count)
+        )
+        next_count = next_end - next_start
+        average_x = sum(distance[next_start:next_end]) / next_count
+        average_y = sum(elevation[next_start:next_end]) / next_count
+
+        x, y = distance[selected], elevation[selected]
+        best_area = -1
+        for index in range(start, end):
+            area = abs(
+                (x - average_x) * (elevation[index] - y)
+                - (x - distance[index]) * (average_y - y)
+            )
+            if area > best_area:
+                best_area = area
+                selected = index
+        sampled.append(selected)
+
+    sampled.append(count - 1)
+    return (
+        [distance[index] for index in sampled],
+        [elevation[index] for index in sampled],
+    )
+
+
+def get_profile(profile, points=None):
+    """
+    Return a stored profile, downsampled to at most `points` points.
+    """
+    if not profile:
+        return {"distance": [], "elevation": []}
+
+    distance, elevation = profile["distance"], profile["elevation"]
+    if points:
+        distance, elevation = downsample(distance, elevation, points)
+    return {"distance": distance, "elevation": elevation}
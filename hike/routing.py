@@ -0,0 +1,517 @@
+"""
+Server-side routing on the trail section network.
+
+The network is kept in a compact, array-backed graph: every trail section is an
+edge between the two nodes found at its extremities, and the adjacency is
+stored in CSR form (an offsets array indexing flat arrays of edges and
+neighbours). Shortest paths are computed with A*, using the great-circle
+distance to the destination as heuristic.
+
+Routes are returned as an ordered list of topology entries
+(trailsection, start_position, end_position, order), the same shape as the
+``EventTrailSection`` rows the trail admin saves.
+
+Building the graph means reading every section of the network, so graphs are
+kept in the cache in a compact binary form (see ``get_graph``) and patched
+with the sections changed since they were stored.
+"""
+import heapq
+import math
+import struct
+from array import array
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Aggregate, CharField, FloatField, Func, Q
+
+EARTH_RADIUS = 6371008.8
+
+# Section lengths are computed on the spheroid while the heuristic uses a
+# sphere; shrink it slightly so it never overestimates the remaining distance.
+HEURISTIC_FACTOR = 0.99
+
+INFINITY = float("inf")
+
+GRAPH_CACHE_KEY = "routing-graph:v3:{}"
+GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Magic, format version, node count, edge count, adjacency size
+_HEADER = struct.Struct("<4sBiii")
+_MAGIC = b"HKRG"
+_FORMAT_VERSION = 1
+
+
+class RoutingError(Exception):
+    pass
+
+
+class IdSetHash(Aggregate):
+    """
+    md5 of the sorted ids of a queryset, changes when a row is added or
+    removed.
+    """
+
+    template = "md5(string_agg(%(expressions)s::text, ',' ORDER BY %(expressions)s))"
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, output_field=CharField(), **extra)
+
+
+# A point snapped on the network: the trail section it lies on, its position
+# along the section (0 to 1) and its coordinates.
+Anchor = namedtuple("Anchor", ["section", "position", "lng", "lat"])
+
+
+def haversine(lng1, lat1, lng2, lat2):
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def _coordinate(function, extremity, field="shape_2d"):
+    return Func(
+        Func(field, function=extremity), function=function, output_field=FloatField()
+    )
+
+
+def section_extremities(queryset):
+    """
+    Return (trailsection_id, lgth, start_lng, start_lat, end_lng, end_lat) rows,
+    with the extremities computed by the database instead of GEOS.
+    """
+    return (
+        queryset.filter(shape_2d__isnull=False)
+        .annotate(
+            start_lng=_coordinate("ST_X", "ST_StartPoint"),
+            start_lat=_coordinate("ST_Y", "ST_StartPoint"),
+            end_lng=_coordinate("ST_X", "ST_EndPoint"),
+            end_lat=_coordinate("ST_Y", "ST_EndPoint"),
+        )
+        .values_list(
+            "trailsection_id", "lgth", "start_lng", "start_lat", "end_lng", "end_lat"
+        )
+        .order_by()
+    )
+
+
+class TrailSectionGraph:
+    """
+    Undirected graph of trail sections.
+
+    Nodes are identified by the exact coordinates of section extremities (the
+    database triggers snap extremities together), edges by their index in the
+    edge arrays. Removed sections leave an edge with a section id of -1 behind
+    until the graph is compacted.
+    """
+
+    def __init__(self):
+        self.node_lng = array("d")
+        self.node_lat = array("d")
+        self.edge_section = array("i")
+        self.edge_source = array("i")
+        self.edge_target = array("i")
+        self.edge_length = array("d")
+
+        self._nodes = {}
+        self._sections = {}
+        self._offsets = None
+        self._adjacent_edges = None
+        self._adjacent_nodes = None
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        graph = cls()
+        for section_id, length, *coords in section_extremities(queryset):
+            graph.add_section(section_id, length, coords[:2], coords[2:])
+        return graph
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __contains__(self, section_id):
+        return section_id in self._sections
+
+    @property
+    def section_ids(self):
+        return self._sections.keys()
+
+    @property
+    def removed(self):
+        return len(self.edge_section) - len(self._sections)
+
+    def _node(self, coords):
+        coords = tuple(coords)
+        try:
+            return self._nodes[coords]
+        except KeyError:
+            node = self._nodes[coords] = len(self.node_lng)
+            self.node_lng.append(coords[0])
+            self.node_lat.append(coords[1])
+            return node
+
+    def add_section(self, section_id, length, start, end):
+        """
+        Add a section to the graph, replacing it if it is already there.
+        """
+        self.remove_section(section_id)
+        source, target = self._node(start), self._node(end)
+        if length is None or math.isnan(length):
+            length = haversine(*start, *end)
+
+        self._sections[section_id] = len(self.edge_section)
+        self.edge_section.append(section_id)
+        self.edge_source.append(source)
+        self.edge_target.append(target)
+        self.edge_length.append(length)
+        self._offsets = None
+
+    def remove_section(self, section_id):
+        edge = self._sections.pop(section_id, None)
+        if edge is not None:
+            self.edge_section[edge] = -1
+            self._offsets = None
+
+    def compact(self):
+        """
+        Return a copy of the graph without removed sections and orphan nodes.
+        """
+        graph = self.__class__()
+        for edge, section in enumerate(self.edge_section):
+            if section < 0:
+                continue
+            source, target = self.edge_source[edge], self.edge_target[edge]
+            graph.add_section(
+                section,
+                self.edge_length[edge],
+                (self.node_lng[source], self.node_lat[source]),
+                (self.node_lng[target], self.node_lat[target]),
+            )
+        return graph
+
+    def to_bytes(self):
+        if self._offsets is None:
+            self._build_adjacency()
+
+        header = _HEADER.pack(
+            _MAGIC,
+            _FORMAT_VERSION,
+            len(self.node_lng),
+            len(self.edge_section),
+            len(self._adjacent_edges),
+        )
+        return header + b"".join(values.tobytes() for values in self._arrays())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, nodes, edges, adjacency = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("Unknown routing graph format")
+
+        graph = cls()
+        graph._offsets = array("i")
+        graph._adjacent_edges = array("i")
+        graph._adjacent_nodes = array("i")
+
+        counts = [nodes, nodes, edges, edges, edges, edges, nodes + 1]
+        counts += [adjacency, adjacency]
+        offset = _HEADER.size
+        for values, count in zip(graph._arrays(), counts):
+            size = values.itemsize * count
+            values.frombytes(data[offset : offset + size])
+            offset += size
+
+        graph._nodes = {
+            coords: node
+            for node, coords in enumerate(zip(graph.node_lng, graph.node_lat))
+        }
+        graph._sections = {
+            section: edge
+            for edge, section in enumerate(graph.edge_section)
+            if section >= 0
+        }
+        return graph
+
+    def _arrays(self):
+        return (
+            self.node_lng,
+            self.node_lat,
+            self.edge_section,
+            self.edge_source,
+            self.edge_target,
+            self.edge_length,
+            self._offsets,
+            self._adjacent_edges,
+            self._adjacent_nodes,
+        )
+
+    def edge(self, section_id):
+        try:
+            return self._sections[section_id]
+        except KeyError:
+            raise RoutingError(f"Trail section {section_id} is not in the network")
+
+    def _build_adjacency(self):
+        degrees = array("i", [0]) * (len(self.node_lng) + 1)
+        for edge, section in enumerate(self.edge_section):
+            if section < 0:
+                continue
+            degrees[self.edge_source[edge] + 1] += 1
+            degrees[self.edge_target[edge] + 1] += 1
+
+        offsets = array("i", degrees)
+        for node in range(1, len(offsets)):
+            offsets[node] += offsets[node - 1]
+
+        adjacent_edges = array("i", [0]) * offsets[-1]
+        adjacent_nodes = array("i", [0]) * offsets[-1]
+        cursor = array("i", offsets)
+        for edge, section in enumerate(self.edge_section):
+            if section < 0:
+                continue
+            source, target = self.edge_source[edge], self.edge_target[edge]
+            for node, other in ((source, target), (target, source)):
+                adjacent_edges[cursor[node]] = edge
+                adjacent_nodes[cursor[node]] = other
+                cursor[node] += 1
+
+        self._offsets = offsets
+        self._adjacent_edges = adjacent_edges
+        self._adjacent_nodes = adjacent_nodes
+
+    def neighbours(self, node):
+        if self._offsets is None:
+            self._build_adjacency()
+
+        for i in range(self._offsets[node], self._offsets[node + 1]):
+            yield self._adjacent_edges[i], self._adjacent_nodes[i]
+
+    def to_dict(self):
+        """
+        Return the graph in the format of ``hikster.hike.utils.graph_edges_nodes``,
+        which is what the map editor expects.
+        """
+        edges = {}
+        nodes = {}
+        for edge, section in enumerate(self.edge_section):
+            if section < 0:
+                continue
+            source = self.edge_source[edge] + 1
+            target = self.edge_target[edge] + 1
+            nodes.setdefault(source, {})[target] = section
+            nodes.setdefault(target, {})[source] = section
+            edges[section] = {
+                "id": section,
+                "length": self.edge_length[edge],
+                "nodes_id": [source, target],
+            }
+        return {"edges": edges, "nodes": nodes}
+
+    def route(self, anchors):
+        """
+        Compute the shortest route going through every anchor, in order.
+
+        :param anchors: list of at least two Anchor (start, vias..., end)
+        :return: (length, topology) where topology is a list of dicts with the
+                 trailsection, start_position, end_position and order keys
+        """
+        if len(anchors) < 2:
+            raise RoutingError("A route needs a start and an end")
+
+        length = 0.0
+        topology = []
+        for origin, destination in zip(anchors, anchors[1:]):
+            leg_length, leg = self._shortest_path(origin, destination)
+            length += leg_length
+            topology.extend(leg)
+
+        steps = [step for step in topology if step[1] != step[2]] or topology[:1]
+        return (
+            length,
+            [
+                {
+                    "trailsection": section,
+                    "start_position": start,
+                    "end_position": end,
+                    "order": order,
+                }
+                for order, (section, start, end) in enumerate(steps)
+            ],
+        )
+
+    def _endpoints(self, anchor):
+        """
+        Return {node: (distance, position)} for the extremities of the section
+        the anchor lies on.
+        """
+        edge = self.edge(anchor.section)
+        length = self.edge_length[edge]
+        endpoints = {}
+        extremities = ((self.edge_source[edge], 0.0), (self.edge_target[edge], 1.0))
+        for node, position in extremities:
+            distance = abs(anchor.position - position) * length
+            if node not in endpoints or distance < endpoints[node][0]:
+                endpoints[node] = (distance, position)
+        return endpoints
+
+    def _shortest_path(self, origin, destination):
+        if self._offsets is None:
+            self._build_adjacency()
+
+        node_count = len(self.node_lng)
+        cost = array("d", [INFINITY]) * node_count
+        previous_node = array("i", [-1]) * node_count
+        previous_edge = array("i", [-1]) * node_count
+
+        def heuristic(node):
+            return HEURISTIC_FACTOR * haversine(
+                self.node_lng[node],
+                self.node_lat[node],
+                destination.lng,
+                destination.lat,
+            )
+
+        best = INFINITY
+        best_node = None
+        if origin.section == destination.section:
+            edge = self.edge(origin.section)
+            best = abs(destination.position - origin.position) * self.edge_length[edge]
+
+        starts = self._endpoints(origin)
+        exits = self._endpoints(destination)
+
+        heap = []
+        for node, (distance, _) in starts.items():
+            cost[node] = distance
+            heapq.heappush(heap, (distance + heuristic(node), distance, node))
+
+        while heap:
+            estimate, distance, node = heapq.heappop(heap)
+            if estimate >= best:
+                break
+            if distance > cost[node]:
+                continue
+
+            if node in exits and distance + exits[node][0] < best:
+                best = distance + exits[node][0]
+                best_node = node
+
+            for edge, other in self.neighbours(node):
+                candidate = distance + self.edge_length[edge]
+                if candidate < cost[other]:
+                    cost[other] = candidate
+                    previous_node[other] = node
+                    previous_edge[other] = edge
+                    heapq.heappush(
+                        heap, (candidate + heuristic(other), candidate, other)
+                    )
+
+        if best == INFINITY:
+            raise RoutingError("No route found between the given points")
+
+        if best_node is None:
+            return best, [(origin.section, origin.position, destination.position)]
+
+        path = []
+        node = best_node
+        while previous_edge[node] != -1:
+            edge, before = previous_edge[node], previous_node[node]
+            if self.edge_source[edge] == before:
+                path.append((self.edge_section[edge], 0.0, 1.0))
+            else:
+                path.append((self.edge_section[edge], 1.0, 0.0))
+            node = before
+        path.reverse()
+
+        path.insert(0, (origin.section, origin.position, starts[node][1]))
+        path.append((destination.section, exits[best_node][1], destination.position))
+        return best, path
+
+
+def locate(point, queryset):
+    """
+    Snap a point on the closest trail section of the queryset.
+
+    :param point: a GEOS Point in SRID 4326
+    :return: an Anchor
+    """
+    section = (
+        queryset.filter(shape_2d__isnull=False)
+        .annotate(distance=Distance("shape_2d", point))
+        .only("trailsection_id", "shape_2d")
+        .order_by("distance")
+        .first()
+    )
+    if section is None:
+        raise RoutingError("No trail section found near the given point")
+
+    line = section.shape_2d
+    position = line.project_normalized(point)
+    snapped = line.interpolate_normalized(position)
+    return Anchor(section.trailsection_id, position, snapped.x, snapped.y)
+
+
+def get_snapshot_xmin(using):
+    """
+    Return the id of the oldest transaction still running: the ones after it
+    may commit later, so their writes are not all visible yet.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def get_graph(trail_sections, key):
+    """
+    Return the routing graph of a set of trail sections, going through the cache.
+
+    The cached graph is stored with the hash of the ids of the sections and
+    the oldest transaction running when it was read (see
+    97_trailsection_graph_txid.sql). Only the sections written by that
+    transaction or a later one are read again, along with the added ones,
+    and the deleted ones are dropped from the graph.
+
+    :param trail_sections: TrailSection queryset
+    :param key: identifies the set of trail sections in the cache (e.g. the organization id)
+    :return: a TrailSectionGraph
+    """
+    cache = caches[getattr(settings, "ROUTING_GRAPH_CACHE", "default")]
+    cache_key = GRAPH_CACHE_KEY.format(key)
+
+    # Before reading the sections, so that nothing written meanwhile is missed
+    xmin = get_snapshot_xmin(trail_sections.db)
+    id_hash = trail_sections.aggregate(id_hash=IdSetHash("pk"))["id_hash"]
+
+    cached = cache.get(cache_key)
+    if cached is None:
+        graph = TrailSectionGraph.from_queryset(trail_sections)
+    else:
+        cached_xmin, cached_id_hash, data = cached
+        graph = TrailSectionGraph.from_bytes(data)
+        missing = set()
+        if id_hash != cached_id_hash:
+            section_ids = set(trail_sections.values_list("trailsection_id", flat=True))
+            for section_id in set(graph.section_ids) - section_ids:
+                graph.remove_section(section_id)
+            missing = section_ids - set(graph.section_ids)
+
+        changed = trail_sections.filter(
+            Q(graph_txid__gte=cached_xmin) | Q(trailsection_id__in=missing)
+        )
+        rows = list(section_extremities(changed))
+        if not rows and id_hash == cached_id_hash:
+            return graph
+        for section_id, length, *coords in rows:
+            graph.add_section(section_id, length, coords[:2], coords[2:])
+
+        if graph.removed > len(graph):
+            graph = graph.compact()
+
+    timeout = getattr(settings, "ROUTING_GRAPH_CACHE_TIMEOUT", GRAPH_CACHE_TIMEOUT)
+    cache.set(cache_key, (xmin, id_hash, graph.to_bytes()), timeout)
+    return graph
@@ -1,10 +1,13 @@
 from collections import OrderedDict
 
+from django.contrib.gis.geos import Point
+from django.utils.translation import ugettext_lazy as _
 from expander import ExpanderSerializerMixin
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
 from hikster.helpers import mixins, functions
+from .difficulty import update_trail_activities
 from .models import (
     Trail,
     TrailImage,
@@ -38,7 +41,7 @@ class TrailSectionSerializer(
 ):
     class Meta:
         model = TrailSection
-        exclude = ("objectid",)
+        exclude = ("objectid", "shape_simplified", "shape_hash")
 
 
 class IntegerListField(serializers.ListField):
@@ -65,18 +68,20 @@ class TrailSerializer(
     banner = serializers.SerializerMethodField(read_only=True)
     difficulty = serializers.CharField(read_only=True)
     duration = serializers.CharField(read_only=True)
+    geometry_pending = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Trail
-        exclude = ["trail_sections"]
+        exclude = ["trail_sections", "shape_simplified", "profile"]
         expandable_fields = {
             "images": (TrailImageSerializer, (), {"many": True}),
             "location": LocationSerializer,
         }
 
     def get_banner(self, obj):
-        if obj.banner and obj.banner.image:
-            return self.context["request"].build_absolute_uri(obj.banner.image.url)
+        banner = obj.banner
+        if banner and banner.image:
+            return self.context["request"].build_absolute_uri(banner.image.url)
         return ""
 
     def validate(self, attrs):
@@ -113,6 +118,7 @@ class TrailSerializer(
                     TrailActivity.objects.get(trail=trail, activity=activity)
                 except TrailActivity.DoesNotExist:
                     TrailActivity.objects.create(trail=trail, activity=activity)
+            update_trail_activities(trail_ids=[trail.pk])
 
         user = self.context["request"].user
         trail.owner.add(user.trailadmin)
@@ -152,6 +158,7 @@ class TrailSerializer(
                     TrailActivity.objects.get(trail=trail, activity=activity)
                 except TrailActivity.DoesNotExist:
                     TrailActivity.objects.create(trail=trail, activity=activity)
+            update_trail_activities(trail_ids=[trail.pk])
 
         # Save nested representations
         if images:
@@ -176,6 +183,36 @@ class TrailSerializer(
         return trail
 
 
+class RouteQuerySerializer(serializers.Serializer):
+    """
+    Validates the query string of the route endpoint: "lng,lat" points for the
+    start and the end, and an optional list of via points separated by ";".
+    """
+
+    start = serializers.CharField()
+    end = serializers.CharField()
+    via = serializers.CharField(required=False, allow_blank=True)
+    organization = serializers.IntegerField(required=False)
+
+    def _to_point(self, value):
+        try:
+            lng, lat = map(float, value.split(","))
+        except ValueError:
+            raise serializers.ValidationError(
+                _("Invalid point. Please provide a lng,lat pair."), code="invalid_point"
+            )
+        return Point(lng, lat, srid=4326)
+
+    def validate_start(self, value):
+        return self._to_point(value)
+
+    def validate_end(self, value):
+        return self._to_point(value)
+
+    def validate_via(self, value):
+        return [self._to_point(point) for point in value.split(";") if point]
+
+
 class Trail3DSerializer(GeoFeatureModelSerializer):
     class Meta:
         model = Trail
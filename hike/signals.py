@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Activity, TrailSection
+from .tasks import update_pending_event_geometries_task, update_trail_activities_task
+
+
+@receiver(post_save, sender=TrailSection)
+def update_pending_event_geometries(
+    sender, instance: TrailSection, update_fields, **kwargs
+):
+    # The triggers queue the events of the section when its shape changes
+    if update_fields is None or "shape_2d" in update_fields:
+        transaction.on_commit(update_pending_event_geometries_task.delay)
+
+
+@receiver(post_save, sender=Activity)
+def update_trail_activities(sender, instance: Activity, created, **kwargs):
+    # The paces and the difficulty levels may have changed
+    if not created:
+        transaction.on_commit(
+            lambda: update_trail_activities_task.delay(activity_ids=[instance.pk])
+        )
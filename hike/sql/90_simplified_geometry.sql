@@ -0,0 +1,42 @@
+-- Simplified 2D geometries displayed by the maps. The tolerance must match
+-- SIMPLIFIED_TOLERANCE in hikster/utils/geojson.py
+
+CREATE OR REPLACE FUNCTION ft_simplify_geometry(geom geometry) RETURNS geometry AS $$
+BEGIN
+    IF geom IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    RETURN ST_SimplifyPreserveTopology(ST_Force2D(geom), 0.00004);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+
+CREATE OR REPLACE FUNCTION simplify_shape() RETURNS trigger AS $$
+BEGIN
+    NEW.shape_simplified := ft_simplify_geometry(NEW.shape);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- The shape of the trail sections is computed from shape_2d by
+-- hikster_new_trailsection_shape_force3dtrg, this trigger must be fired after it
+DROP TRIGGER IF EXISTS hikster_trailsection_simplify_shape_trg ON hike_trailsection;
+CREATE TRIGGER hikster_trailsection_simplify_shape_trg
+BEFORE INSERT OR UPDATE OF shape, shape_2d ON hike_trailsection
+FOR EACH ROW EXECUTE PROCEDURE simplify_shape();
+
+-- The shape of the trails is updated by update_geometry_of_trail
+DROP TRIGGER IF EXISTS hikster_trail_simplify_shape_trg ON hike_trail;
+CREATE TRIGGER hikster_trail_simplify_shape_trg
+BEFORE INSERT OR UPDATE OF shape ON hike_trail
+FOR EACH ROW EXECUTE PROCEDURE simplify_shape();
+
+
+-- Fill the existing rows without touching their update date
+ALTER TABLE hike_trailsection DISABLE TRIGGER hike_trailsection_date_update_tgr;
+UPDATE hike_trailsection SET shape_simplified = ft_simplify_geometry(shape);
+ALTER TABLE hike_trailsection ENABLE TRIGGER hike_trailsection_date_update_tgr;
+
+UPDATE hike_trail SET shape_simplified = ft_simplify_geometry(shape);
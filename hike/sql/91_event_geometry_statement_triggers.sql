@@ -0,0 +1,63 @@
+-------------------------------------------------------------------------------
+-- Compute the geometry of the events once per statement
+--
+-- The row level hike_eventtrailsection_geometry_tgr recomputed the geometry of
+-- an event for every one of its eventtrailsections, the statement level
+-- triggers below recompute every touched event once.
+-------------------------------------------------------------------------------
+
+DROP TRIGGER IF EXISTS hike_eventtrailsection_geometry_tgr ON hike_eventtrailsection;
+DROP FUNCTION IF EXISTS hike_eventtrailsection_geometry();
+
+-- When the hikster.defer_event_geometry setting is on, the events are queued
+-- in hike_pendingeventgeometry instead, see update_pending_event_geometries
+-- in hikster/hike/geometry.py
+CREATE OR REPLACE FUNCTION ft_event_geometry_deferred() RETURNS boolean AS $$
+    SELECT coalesce(current_setting('hikster.defer_event_geometry', true), '') = 'on';
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION update_geometry_of_evenements(eids integer[]) RETURNS void AS $$
+DECLARE
+    eid integer;
+BEGIN
+    IF ft_event_geometry_deferred() THEN
+        INSERT INTO hike_pendingeventgeometry (event_id, date_queued)
+        SELECT DISTINCT e, now() FROM unnest(eids) e WHERE e IS NOT NULL
+        ON CONFLICT (event_id) DO NOTHING;
+        RETURN;
+    END IF;
+
+    FOR eid IN SELECT DISTINCT e FROM unnest(eids) e WHERE e IS NOT NULL ORDER BY e LOOP
+        PERFORM update_geometry_of_evenement(eid);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hike_eventtrailsection_geometry_i() RETURNS trigger AS $$
+BEGIN
+    PERFORM update_geometry_of_evenements(ARRAY(SELECT evnt FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hike_eventtrailsection_geometry_u() RETURNS trigger AS $$
+BEGIN
+    -- An eventtrailsection moved to another event changes both events
+    PERFORM update_geometry_of_evenements(
+        ARRAY(SELECT evnt FROM old_rows UNION SELECT evnt FROM new_rows)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS hike_eventtrailsection_geometry_i_tgr ON hike_eventtrailsection;
+CREATE TRIGGER hike_eventtrailsection_geometry_i_tgr
+AFTER INSERT ON hike_eventtrailsection
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_eventtrailsection_geometry_i();
+
+DROP TRIGGER IF EXISTS hike_eventtrailsection_geometry_u_tgr ON hike_eventtrailsection;
+CREATE TRIGGER hike_eventtrailsection_geometry_u_tgr
+AFTER UPDATE ON hike_eventtrailsection
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_eventtrailsection_geometry_u();
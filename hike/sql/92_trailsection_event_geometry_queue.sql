@@ -0,0 +1,41 @@
+-------------------------------------------------------------------------------
+-- Queue the events of an updated trailsection
+--
+-- Re-draping every event using a shared trailsection made the update of the
+-- section as slow as the number of its trails. The events are queued in
+-- hike_pendingeventgeometry instead and computed by the
+-- update_pending_event_geometries_task celery task.
+-------------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION update_evenement_geom_when_troncon_changes() RETURNS trigger AS $$
+DECLARE
+    eid integer;
+    egeom geometry;
+    linear_offset float;
+    side_offset float;
+BEGIN
+    -- Geometry of linear topologies are always updated
+    -- Geometry of point topologies are updated if offset = 0
+    INSERT INTO hike_pendingeventgeometry (event_id, date_queued)
+    SELECT e.event_id, now()
+    FROM hike_eventtrailsection et, hike_event e
+    WHERE et.trailsection = NEW.trailsection_id AND et.evnt = e.event_id
+    GROUP BY e.event_id, e.e_offset
+    HAVING BOOL_OR(et.start_position != et.end_position) OR e.e_offset = 0.0
+    ON CONFLICT (event_id) DO NOTHING;
+
+    -- Special case of point geometries with offset != 0
+    FOR eid, egeom IN SELECT e.event_id, e.shape_2d
+               FROM hike_eventtrailsection et, hike_event e
+               WHERE et.trailsection = NEW.trailsection_id AND et.evnt = e.event_id
+               GROUP BY e.event_id, e.e_offset
+               HAVING COUNT(et.eventtrailsection_id) = 1 AND BOOL_OR(et.start_position = et.end_position) AND e.e_offset != 0.0
+    LOOP
+        SELECT * INTO linear_offset, side_offset FROM ST_InterpolateAlong(NEW.shape_2d, egeom) AS (position float, distance float);
+        UPDATE hike_event SET e_offset = side_offset WHERE event_id = eid;
+        UPDATE hike_eventtrailsection SET start_position = linear_offset, end_position = linear_offset WHERE evnt = eid AND trailsection = NEW.trailsection_id;
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,28 @@
+-- Hash of the 2D shape of the trail sections, used to find the duplicate
+-- sections (see hikster/hike/duplicates.py) without comparing every pair
+
+CREATE OR REPLACE FUNCTION ft_shape_hash(geom geometry) RETURNS varchar AS $$
+    SELECT md5(ST_AsBinary(ST_Force2D(geom)));
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+
+CREATE OR REPLACE FUNCTION hash_shape() RETURNS trigger AS $$
+BEGIN
+    NEW.shape_hash := ft_shape_hash(NEW.shape_2d);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- shape_2d is snapped by hike_trailsection_00_snap_geom_iu_tgr, this trigger
+-- must be fired after it
+DROP TRIGGER IF EXISTS hikster_trailsection_shape_hash_trg ON hike_trailsection;
+CREATE TRIGGER hikster_trailsection_shape_hash_trg
+BEFORE INSERT OR UPDATE OF shape_2d ON hike_trailsection
+FOR EACH ROW EXECUTE PROCEDURE hash_shape();
+
+
+-- Fill the existing rows without touching their update date
+ALTER TABLE hike_trailsection DISABLE TRIGGER hike_trailsection_date_update_tgr;
+UPDATE hike_trailsection SET shape_hash = ft_shape_hash(shape_2d);
+ALTER TABLE hike_trailsection ENABLE TRIGGER hike_trailsection_date_update_tgr;
@@ -0,0 +1,25 @@
+-- The elevation of the trail sections and events can be computed by the NumPy
+-- engine (see hikster/hike/elevation.py). When the hikster.skip_draping setting
+-- is on, ft_elevation_infos only forces the geometries in 3D and the engine
+-- drapes them afterwards.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'ft_dem_elevation_infos') THEN
+        ALTER FUNCTION ft_elevation_infos(geometry, float) RENAME TO ft_dem_elevation_infos;
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION ft_elevation_infos(geom geometry, epsilon float) RETURNS elevation_infos AS $$
+DECLARE
+    result elevation_infos;
+BEGIN
+    IF coalesce(current_setting('hikster.skip_draping', true), '') = 'on' THEN
+        SELECT ST_Force3DZ(geom), 0.0, 0, 0, 0, 0 INTO result;
+        RETURN result;
+    END IF;
+
+    RETURN ft_dem_elevation_infos(geom, epsilon);
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,53 @@
+-- Elevation profile of the trails: the cumulative distance and the elevation
+-- of the points of the draped shape, in metres. The profile is simplified in
+-- this space (Douglas-Peucker), the tolerance must match PROFILE_TOLERANCE in
+-- hikster/hike/profile.py
+
+CREATE OR REPLACE FUNCTION ft_elevation_profile(geom geometry, tolerance float) RETURNS jsonb AS $$
+DECLARE
+    profile geometry;
+    result jsonb;
+BEGIN
+    IF geom IS NULL OR ST_NDims(geom) < 3 OR ST_NPoints(geom) < 2 THEN
+        RETURN NULL;
+    END IF;
+
+    WITH points AS (
+        SELECT dp.path, dp.geom AS point, lag(dp.geom) OVER (ORDER BY dp.path) AS previous
+        FROM ST_DumpPoints(geom) dp
+    ), distances AS (
+        SELECT path, ST_Z(point) AS elevation,
+            sum(coalesce(ST_DistanceSphere(previous, point), 0)) OVER (ORDER BY path) AS distance
+        FROM points
+    )
+    SELECT ST_MakeLine(ST_MakePoint(distance, elevation) ORDER BY path) INTO profile
+    FROM distances;
+
+    profile := ST_Simplify(profile, tolerance, true);
+
+    SELECT jsonb_build_object(
+        'distance', jsonb_agg(round(ST_X(dp.geom)::numeric, 1) ORDER BY dp.path),
+        'elevation', jsonb_agg(round(ST_Y(dp.geom)::numeric, 1) ORDER BY dp.path)
+    ) INTO result
+    FROM ST_DumpPoints(profile) dp;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+
+CREATE OR REPLACE FUNCTION compute_trail_profile() RETURNS trigger AS $$
+BEGIN
+    NEW.profile := ft_elevation_profile(NEW.shape, 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The shape of the trails is updated by update_geometry_of_trail
+DROP TRIGGER IF EXISTS hikster_trail_profile_trg ON hike_trail;
+CREATE TRIGGER hikster_trail_profile_trg
+BEFORE INSERT OR UPDATE OF shape ON hike_trail
+FOR EACH ROW EXECUTE PROCEDURE compute_trail_profile();
+
+
+UPDATE hike_trail SET profile = ft_elevation_profile(shape, 1);
@@ -0,0 +1,151 @@
+-- Denormalized search data of the trails (see hike.models.TrailSearch), kept
+-- up to date by statement triggers on the trails, their activities and the
+-- locations
+
+CREATE OR REPLACE FUNCTION refresh_trail_search(tids integer[]) RETURNS void AS $$
+BEGIN
+    DELETE FROM trail_search s
+    WHERE s.trail_id = ANY(tids)
+        AND NOT EXISTS (SELECT 1 FROM hike_trail t WHERE t.trail_id = s.trail_id);
+
+    INSERT INTO trail_search (
+        trail_id, activity_ids, difficulties, total_length, path_type,
+        dog_allowed, location_id, region_id, shape
+    )
+    SELECT
+        t.trail_id,
+        ARRAY(
+            SELECT DISTINCT ta.activity_id FROM hike_trailactivity ta
+            WHERE ta.trail_id = t.trail_id
+            ORDER BY ta.activity_id
+        ),
+        ARRAY(
+            SELECT DISTINCT ta.difficulty FROM hike_trailactivity ta
+            WHERE ta.trail_id = t.trail_id AND ta.difficulty IS NOT NULL
+            ORDER BY ta.difficulty
+        ),
+        t.total_length,
+        t.path_type,
+        l.dog_allowed,
+        t.location_id,
+        t.region_id,
+        t.shape_simplified
+    FROM hike_trail t
+    LEFT JOIN location_location l ON l.location_id = t.location_id
+    WHERE t.trail_id = ANY(tids)
+    ON CONFLICT (trail_id) DO UPDATE SET
+        activity_ids = EXCLUDED.activity_ids,
+        difficulties = EXCLUDED.difficulties,
+        total_length = EXCLUDED.total_length,
+        path_type = EXCLUDED.path_type,
+        dog_allowed = EXCLUDED.dog_allowed,
+        location_id = EXCLUDED.location_id,
+        region_id = EXCLUDED.region_id,
+        shape = EXCLUDED.shape;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Trails
+
+CREATE OR REPLACE FUNCTION hike_trail_search_iu() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_trail_search(ARRAY(SELECT trail_id FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hike_trail_search_d() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM trail_search WHERE trail_id IN (SELECT trail_id FROM old_rows);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS hike_trail_search_i_tgr ON hike_trail;
+CREATE TRIGGER hike_trail_search_i_tgr
+AFTER INSERT ON hike_trail
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_trail_search_iu();
+
+DROP TRIGGER IF EXISTS hike_trail_search_u_tgr ON hike_trail;
+CREATE TRIGGER hike_trail_search_u_tgr
+AFTER UPDATE ON hike_trail
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_trail_search_iu();
+
+DROP TRIGGER IF EXISTS hike_trail_search_d_tgr ON hike_trail;
+CREATE TRIGGER hike_trail_search_d_tgr
+AFTER DELETE ON hike_trail
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_trail_search_d();
+
+
+-- Activities of the trails, their difficulty is computed by
+-- hike.difficulty.update_trail_activities
+
+CREATE OR REPLACE FUNCTION hike_trailactivity_search_i() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_trail_search(ARRAY(SELECT DISTINCT trail_id FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hike_trailactivity_search_u() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_trail_search(
+        ARRAY(SELECT trail_id FROM old_rows UNION SELECT trail_id FROM new_rows)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hike_trailactivity_search_d() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_trail_search(ARRAY(SELECT DISTINCT trail_id FROM old_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS hike_trailactivity_search_i_tgr ON hike_trailactivity;
+CREATE TRIGGER hike_trailactivity_search_i_tgr
+AFTER INSERT ON hike_trailactivity
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_trailactivity_search_i();
+
+DROP TRIGGER IF EXISTS hike_trailactivity_search_u_tgr ON hike_trailactivity;
+CREATE TRIGGER hike_trailactivity_search_u_tgr
+AFTER UPDATE ON hike_trailactivity
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_trailactivity_search_u();
+
+DROP TRIGGER IF EXISTS hike_trailactivity_search_d_tgr ON hike_trailactivity;
+CREATE TRIGGER hike_trailactivity_search_d_tgr
+AFTER DELETE ON hike_trailactivity
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE hike_trailactivity_search_d();
+
+
+-- Locations, for dog_allowed. The trails of a deleted location are updated by
+-- Django (SET_NULL).
+
+CREATE OR REPLACE FUNCTION location_trail_search_u() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_trail_search(ARRAY(
+        SELECT t.trail_id FROM hike_trail t
+        JOIN new_rows n ON n.location_id = t.location_id
+        JOIN old_rows o ON o.location_id = n.location_id
+        WHERE o.dog_allowed IS DISTINCT FROM n.dog_allowed
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS location_trail_search_u_tgr ON location_location;
+CREATE TRIGGER location_trail_search_u_tgr
+AFTER UPDATE ON location_location
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE location_trail_search_u();
+
+
+SELECT refresh_trail_search(ARRAY(SELECT trail_id FROM hike_trail));
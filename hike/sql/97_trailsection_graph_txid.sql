@@ -0,0 +1,19 @@
+-- Transaction that last wrote the graph columns of the trail sections, for the
+-- routing graph cache (see get_graph in hikster/hike/routing.py). The ids are
+-- not in commit order: the graphs are stored with the oldest transaction still
+-- running when they were read (txid_snapshot_xmin), and the sections written
+-- by that transaction or a later one are read again.
+
+CREATE OR REPLACE FUNCTION ft_trailsection_graph_txid() RETURNS trigger AS $$
+BEGIN
+    NEW.graph_txid := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Fired after the other BEFORE triggers, which may change the section
+DROP TRIGGER IF EXISTS zz_hike_trailsection_graph_txid_tgr ON hike_trailsection;
+CREATE TRIGGER zz_hike_trailsection_graph_txid_tgr
+BEFORE INSERT OR UPDATE OF shape_2d, lgth ON hike_trailsection
+FOR EACH ROW EXECUTE PROCEDURE ft_trailsection_graph_txid();
@@ -1,18 +1,42 @@
-from django.db import connection
-
-from django_rq import job
-
-
-@job
-def update_geometry_of_evenement(trail_id):
-    with connection.cursor() as cursor:
-        cursor.execute(
-            """
-            DO $$
-            BEGIN
-                PERFORM update_geometry_of_evenement(%s);
-            END;
-            $$;
-            """,
-            [trail_id],
-        )
+from celery.utils.log import get_task_logger
+from django.db import transaction
+
+from hikster.celery import app
+from .difficulty import update_trail_activities
+from .geometry import update_pending_event_geometries
+
+logger = get_task_logger(__name__)
+
+PENDING_EVENT_GEOMETRY_BATCH_SIZE = 20
+
+
+@app.task(name="update_pending_event_geometries_task")
+def update_pending_event_geometries_task(batch_size=PENDING_EVENT_GEOMETRY_BATCH_SIZE):
+    """
+    Compute the geometry of the queued events (see PendingEventGeometry) until
+    the queue is empty. Every batch is committed on its own, so the trails
+    leave the "geometry pending" state as soon as their batch is done.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            count = update_pending_event_geometries(batch_size)
+        total += count
+        if count < batch_size:
+            break
+
+    logger.info(f"{total} event geometries computed")
+    return total
+
+
+@app.task(name="update_trail_activities_task")
+def update_trail_activities_task(trail_ids=None, activity_ids=None):
+    """
+    Compute the difficulty and the duration of the trail activities, see
+    hike.difficulty.update_trail_activities.
+    """
+    with transaction.atomic():
+        count = update_trail_activities(trail_ids, activity_ids)
+
+    logger.info(f"{count} trail activities updated")
+    return count
@@ -0,0 +1,102 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from hikster.hike.difficulty import (
+    ACTIVITY_FIELDS,
+    compute_difficulty,
+    compute_duration,
+)
+from hikster.hike.models import Activity, Trail, TrailActivity
+
+ACTIVITIES = [
+    Activity(
+        name="Randonnée",
+        flat_pace=4000,
+        ascent_pace=300,
+        descent_pace=-500,
+        dev1=200,
+        dev2=400,
+        dev3=700,
+        dev4=1000,
+        distance1=5,
+        distance2=10,
+        distance3=15,
+        distance4=25,
+    ),
+    # Without descent pace, the descent is ignored
+    Activity(
+        name="Vélo",
+        flat_pace=15000,
+        ascent_pace=600,
+        descent_pace=0,
+        dev1=100,
+        dev2=300,
+        dev3=600,
+        dev4=900,
+        distance1=10,
+        distance2=20,
+        distance3=40,
+        distance4=60,
+    ),
+]
+
+# total_length, height_positive, height_negative
+TRAILS = [
+    (0, 0, 0),
+    (1200, 30, 25),
+    (4999, 10, 10),
+    (8000, 350, 150),
+    (14500, 120, 600),
+    (22000, 800, 800),
+    (60000, 2500, 100),
+    (3000, None, 50),
+    (None, 100, 100),
+]
+
+
+class DifficultyTestCase(SimpleTestCase):
+    """
+    The vectorized computation must match TrailActivity.calculate_duration and
+    calculate_difficulty.
+    """
+
+    def compute(self, activity):
+        length, ascent, descent = np.array(TRAILS, dtype=np.float64).T
+        values = {
+            field: np.full(len(TRAILS), getattr(activity, field), dtype=np.float64)
+            for field in ACTIVITY_FIELDS
+        }
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (
+                compute_duration(length, ascent, descent, values),
+                compute_difficulty(length, ascent, descent, values),
+            )
+
+    def expected(self, activity, trail):
+        length, ascent, descent = trail
+        trail_activity = TrailActivity(
+            trail=Trail(
+                total_length=length, height_positive=ascent, height_negative=descent
+            ),
+            activity=activity,
+        )
+        trail_activity.calculate_duration()
+        trail_activity.calculate_difficulty()
+        return trail_activity.duration, trail_activity.difficulty
+
+    def test_same_as_trail_activity(self):
+        for activity in ACTIVITIES:
+            durations, difficulties = self.compute(activity)
+            for trail, duration, difficulty in zip(TRAILS, durations, difficulties):
+                with self.subTest(activity=activity.name, trail=trail):
+                    expected_duration, expected_difficulty = self.expected(
+                        activity, trail
+                    )
+                    if expected_duration is None:
+                        self.assertTrue(np.isnan(duration))
+                    else:
+                        self.assertEqual(int(duration), expected_duration)
+                    if expected_difficulty is None:
+                        self.assertTrue(np.isnan(difficulty))
+                    else:
+                        self.assertEqual(int(difficulty), expected_difficulty)
@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from hikster.hike.elevation import Dem, DemTile, smooth
+
+LINES = [
+    [(0, 0), (1, 0)],
+    [(0, 0), (3.5, 0), (3.5, 2.2), (10, 10)],
+    [(5, 5), (5, 5.4), (4.1, 5.4)],
+    [(-2, 3), (7.25, -1.5), (7.25, -1.5), (0, 0)],
+]
+
+
+def ft_drape_line(coords, step):
+    """
+    The points of ft_drape_line (hike/sql/10_utility.sql), without elevation.
+    """
+    points = []
+    for index, (p1, p2) in enumerate(zip(coords, coords[1:])):
+        is_last = index == len(coords) - 2
+        n = math.trunc(math.hypot(p2[0] - p1[0], p2[1] - p1[1]) / step) + 1
+        for i in range(n + 1 if is_last else n):
+            f = i / n
+            points.append((p1[0] + (p2[0] - p1[0]) * f, p1[1] + (p2[1] - p1[1]) * f))
+    return points
+
+
+def ft_smooth_line(elevations, step):
+    """
+    The elevations of ft_smooth_line (hike/sql/10_utility.sql). Like the cast
+    of a float to integer in PostgreSQL, round() rounds half to even.
+    """
+    return [
+        round(sum(window) / len(window))
+        for window in (
+            elevations[max(i - step, 0) : i + step + 1] for i in range(len(elevations))
+        )
+    ]
+
+
+class PlaneDem(Dem):
+    """
+    A DEM whose elevation is x + 10 * y, without database.
+    """
+
+    def sample(self, xs, ys):
+        return np.asarray(xs) + 10 * np.asarray(ys)
+
+
+class TileDem(Dem):
+    """
+    A DEM made of in-memory tiles, without database.
+    """
+
+    def __init__(self, tiles):
+        super().__init__()
+        self.tiles = [tile for tile, _ in tiles]
+        self.values = {tile.rid: values for tile, values in tiles}
+
+    def get_tiles(self, xs, ys):
+        return self.tiles
+
+    def get_values(self, tile):
+        return self.values[tile.rid]
+
+
+class DrapeTestCase(SimpleTestCase):
+    def test_drape_line(self):
+        dem = PlaneDem()
+        for coords in LINES:
+            for step in (1, 2, 3):
+                with self.subTest(coords=coords, step=step):
+                    points = dem.drape(coords, step)
+                    expected = ft_drape_line(coords, step)
+                    np.testing.assert_allclose(points[:, :2], expected, atol=1e-12)
+                    np.testing.assert_allclose(
+                        points[:, 2], points[:, 0] + 10 * points[:, 1]
+                    )
+
+    def test_drape_keeps_vertices(self):
+        coords = LINES[1]
+        points = PlaneDem().drape(coords, 1)
+        for vertex in coords:
+            self.assertTrue(np.any(np.all(points[:, :2] == vertex, axis=1)))
+
+    def test_drape_3d_line(self):
+        dem = PlaneDem()
+        coords = [(0, 0, 12), (4, 0, 15), (4, 3, -1)]
+        np.testing.assert_array_equal(dem.drape(coords), coords)
+
+        # Without elevation, the line is draped
+        flat = [(0, 0, 0), (4, 0, 0)]
+        points = dem.drape(flat)
+        self.assertEqual(len(points), 6)
+        np.testing.assert_array_equal(points[:, 2], points[:, 0])
+
+
+class SmoothTestCase(SimpleTestCase):
+    def test_smooth_line(self):
+        profiles = [
+            [100],
+            [100, 101],
+            [2, 3, 5, 4, 8, 13, 1, 0, 0, 7],
+            [-3, -2, -4, -5, 0, 1],
+            [10, 11, 11, 10, 12, 15, 17, 16, 16, 14, 13],
+        ]
+        for elevations in profiles:
+            for step in (1, 2, 3):
+                with self.subTest(elevations=elevations, step=step):
+                    self.assertEqual(
+                        smooth(np.array(elevations, dtype=float), step).tolist(),
+                        ft_smooth_line(elevations, step),
+                    )
+
+
+class DemTileTestCase(SimpleTestCase):
+    def setUp(self):
+        # 3 x 2 pixels of 10 units, from (0, 20) to (30, 0)
+        self.tile = DemTile(1, 0, 20, 3, 2, 10, -10, None)
+        self.values = np.array([[100.0, 110.0, 130.0], [200.0, 210.0, np.nan]])
+
+    def test_pixel_centers(self):
+        xs = np.array([5.0, 15.0, 5.0, 15.0])
+        ys = np.array([15.0, 15.0, 5.0, 5.0])
+        np.testing.assert_array_equal(
+            self.tile.sample(self.values, xs, ys), [100, 110, 200, 210]
+        )
+
+    def test_bilinear(self):
+        result = self.tile.sample(self.values, np.array([10.0]), np.array([10.0]))
+        np.testing.assert_allclose(result, [155])
+
+    def test_edges(self):
+        # Beyond the centers of the border pixels, the border values are kept
+        xs = np.array([0.0, 0.0])
+        ys = np.array([20.0, 0.0])
+        np.testing.assert_array_equal(self.tile.sample(self.values, xs, ys), [100, 200])
+
+    def test_no_data(self):
+        # Next to the no data pixel, the closest pixel is used
+        xs = np.array([23.0, 26.0])
+        ys = np.array([12.0, 14.0])
+        np.testing.assert_array_equal(self.tile.sample(self.values, xs, ys), [130, 130])
+
+    def test_contains(self):
+        xs = np.array([0.0, 29.9, 30.0, 15.0, 15.0])
+        ys = np.array([20.0, 0.1, 10.0, 20.1, -0.1])
+        self.assertEqual(
+            self.tile.contains(xs, ys).tolist(), [True, True, False, False, False]
+        )
+
+    def test_dem_sample(self):
+        other = DemTile(2, 30, 20, 1, 1, 10, -10, None)
+        dem = TileDem([(self.tile, self.values), (other, np.array([[42.4]]))])
+
+        xs = [5.0, 12.5, 35.0, 100.0]
+        ys = [15.0, 15.0, 15.0, 100.0]
+        # Rounded, and 0 outside of the tiles
+        self.assertEqual(dem.sample(xs, ys).tolist(), [100, 108, 42, 0])
+        self.assertEqual(len(dem.sample([], [])), 0)
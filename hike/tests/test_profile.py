@@ -0,0 +1,73 @@
+from django.test import SimpleTestCase
+
+from hikster.hike.profile import bucket_bounds, downsample, get_profile
+
+
+def make_profile(count):
+    distance = [index * 10.0 for index in range(count)]
+    elevation = [100.0 + (index * 7 % 13) for index in range(count)]
+    return distance, elevation
+
+
+class DownsampleTestCase(SimpleTestCase):
+    def test_bucket_bounds(self):
+        for count in range(4, 150):
+            for points in range(3, count):
+                with self.subTest(count=count, points=points):
+                    bounds = bucket_bounds(count, points)
+                    self.assertEqual(len(bounds), points - 2)
+                    # Contiguous and not empty, from the second point to the
+                    # one before the last
+                    self.assertEqual(bounds[0][0], 1)
+                    self.assertEqual(bounds[-1][1], count - 1)
+                    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+                        self.assertEqual(end, start)
+                    self.assertTrue(all(start < end for start, end in bounds))
+
+    def test_bucket_sizes(self):
+        # 17 points to 13 points used to leave out the one before the last
+        bounds = bucket_bounds(17, 13)
+        sizes = [end - start for start, end in bounds]
+        self.assertEqual(sum(sizes), 15)
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_downsample(self):
+        for count, points in [(17, 13), (100, 10), (1000, 3), (1000, 999)]:
+            with self.subTest(count=count, points=points):
+                distance, elevation = make_profile(count)
+                sampled_distance, sampled_elevation = downsample(
+                    distance, elevation, points
+                )
+                self.assertEqual(len(sampled_distance), points)
+                self.assertEqual(len(sampled_elevation), points)
+                self.assertEqual(sampled_distance[0], distance[0])
+                self.assertEqual(sampled_distance[-1], distance[-1])
+                self.assertEqual(sampled_distance, sorted(set(sampled_distance)))
+                for x, y in zip(sampled_distance, sampled_elevation):
+                    self.assertEqual(elevation[distance.index(x)], y)
+
+    def test_keeps_peaks(self):
+        distance = [float(index) for index in range(100)]
+        elevation = [100.0] * 100
+        elevation[37] = 250.0
+        elevation[71] = 20.0
+
+        sampled_distance, sampled_elevation = downsample(distance, elevation, 10)
+        self.assertIn(37.0, sampled_distance)
+        self.assertIn(71.0, sampled_distance)
+        self.assertEqual(max(sampled_elevation), 250.0)
+        self.assertEqual(min(sampled_elevation), 20.0)
+
+    def test_not_downsampled(self):
+        distance, elevation = make_profile(10)
+        self.assertEqual(downsample(distance, elevation, 10), (distance, elevation))
+        self.assertEqual(downsample(distance, elevation, 50), (distance, elevation))
+        self.assertEqual(downsample(distance, elevation, 2), (distance, elevation))
+
+    def test_get_profile(self):
+        distance, elevation = make_profile(50)
+        profile = {"distance": distance, "elevation": elevation}
+
+        self.assertEqual(get_profile(None), {"distance": [], "elevation": []})
+        self.assertEqual(get_profile(profile), profile)
+        self.assertEqual(len(get_profile(profile, points=20)["distance"]), 20)
@@ -0,0 +1,133 @@
+from django.test import SimpleTestCase
+
+from hikster.hike.routing import Anchor, RoutingError, TrailSectionGraph, haversine
+
+A = (-73.60, 45.50)
+B = (-73.59, 45.50)
+C = (-73.58, 45.50)
+D = (-73.59, 45.51)
+E = (-73.50, 45.60)
+F = (-73.49, 45.60)
+
+# (section id, start, end): A-B-C along a parallel, with a detour by D, and a
+# section E-F out of the network
+SECTIONS = [(1, A, B), (2, B, C), (3, A, D), (4, D, C), (5, E, F)]
+
+
+def make_graph(lengths=None):
+    lengths = lengths or {}
+    graph = TrailSectionGraph()
+    for section_id, start, end in SECTIONS:
+        graph.add_section(section_id, lengths.get(section_id), start, end)
+    return graph
+
+
+def anchor(section_id, position):
+    _, start, end = next(section for section in SECTIONS if section[0] == section_id)
+    return Anchor(
+        section_id,
+        position,
+        start[0] + (end[0] - start[0]) * position,
+        start[1] + (end[1] - start[1]) * position,
+    )
+
+
+def sections(topology):
+    return [
+        (step["trailsection"], step["start_position"], step["end_position"])
+        for step in topology
+    ]
+
+
+class TrailSectionGraphTestCase(SimpleTestCase):
+    def test_shortest_path(self):
+        graph = make_graph()
+        length, topology = graph.route([anchor(1, 0.0), anchor(2, 1.0)])
+
+        self.assertEqual(sections(topology), [(1, 0.0, 1.0), (2, 0.0, 1.0)])
+        self.assertEqual([step["order"] for step in topology], [0, 1])
+        self.assertAlmostEqual(length, haversine(*A, *B) + haversine(*B, *C))
+
+    def test_detour(self):
+        # The direct section is longer than the detour by D
+        graph = make_graph({2: 1e6})
+        length, topology = graph.route([anchor(1, 0.0), anchor(2, 1.0)])
+
+        self.assertEqual(sections(topology), [(3, 0.0, 1.0), (4, 0.0, 1.0)])
+        self.assertAlmostEqual(length, haversine(*A, *D) + haversine(*D, *C))
+
+    def test_reversed_sections(self):
+        graph = make_graph()
+        _, topology = graph.route([anchor(2, 0.5), anchor(1, 0.5)])
+
+        self.assertEqual(sections(topology), [(2, 0.5, 0.0), (1, 1.0, 0.5)])
+
+    def test_same_section(self):
+        graph = make_graph()
+        length, topology = graph.route([anchor(1, 0.2), anchor(1, 0.8)])
+
+        self.assertEqual(sections(topology), [(1, 0.2, 0.8)])
+        self.assertAlmostEqual(length, 0.6 * haversine(*A, *B))
+
+    def test_via(self):
+        graph = make_graph()
+        _, topology = graph.route([anchor(1, 0.0), anchor(4, 0.5), anchor(2, 1.0)])
+
+        self.assertEqual(
+            sections(topology),
+            [(3, 0.0, 1.0), (4, 0.0, 0.5), (4, 0.5, 1.0)],
+        )
+
+    def test_no_route(self):
+        graph = make_graph()
+        with self.assertRaises(RoutingError):
+            graph.route([anchor(1, 0.0), anchor(5, 1.0)])
+
+    def test_unknown_section(self):
+        graph = make_graph()
+        graph.remove_section(2)
+        with self.assertRaises(RoutingError):
+            graph.route([anchor(1, 0.0), anchor(2, 1.0)])
+
+    def test_replaced_section(self):
+        graph = make_graph()
+        graph.add_section(2, 1e6, B, C)
+
+        self.assertEqual(len(graph), len(SECTIONS))
+        self.assertEqual(graph.removed, 1)
+        _, topology = graph.route([anchor(1, 0.0), anchor(2, 1.0)])
+        self.assertEqual(sections(topology), [(3, 0.0, 1.0), (4, 0.0, 1.0)])
+
+    def test_bytes_round_trip(self):
+        graph = make_graph({2: 1e6})
+        graph.remove_section(5)
+        copy = TrailSectionGraph.from_bytes(graph.to_bytes())
+
+        self.assertEqual(set(copy.section_ids), {1, 2, 3, 4})
+        self.assertEqual(copy.removed, 1)
+        self.assertEqual(copy.to_dict(), graph.to_dict())
+        anchors = [anchor(1, 0.0), anchor(2, 1.0)]
+        self.assertEqual(copy.route(anchors), graph.route(anchors))
+
+        # The copy can still be modified
+        copy.add_section(6, None, C, F)
+        self.assertIn(6, copy)
+        self.assertEqual(
+            TrailSectionGraph.from_bytes(copy.to_bytes()).to_dict(), copy.to_dict()
+        )
+
+    def test_compact(self):
+        graph = make_graph()
+        graph.remove_section(5)
+        compacted = graph.compact()
+
+        self.assertEqual(compacted.removed, 0)
+        self.assertEqual(len(compacted.node_lng), 4)
+        anchors = [anchor(1, 0.0), anchor(2, 1.0)]
+        self.assertEqual(compacted.route(anchors), graph.route(anchors))
+
+    def test_unknown_format(self):
+        data = bytearray(make_graph().to_bytes())
+        data[:4] = b"XXXX"
+        with self.assertRaises(ValueError):
+            TrailSectionGraph.from_bytes(bytes(data))
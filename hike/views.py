@@ -1,24 +1,35 @@
-from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Polygon
-from django.db.models import Q
 from django.db.models import QuerySet
-from rest_framework import viewsets, status
-from rest_framework.decorators import list_route
+from django.shortcuts import get_object_or_404
+from rest_framework import status, views, viewsets
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
-from hikster.helpers import functions, pagination, permissions
-from hikster.hike.models import Activity, Event, EventTrailSection, Trail, TrailSection
+from hikster.helpers import functions, knn, pagination, permissions
+from hikster.hike.models import (
+    Activity,
+    Event,
+    EventTrailSection,
+    Trail,
+    TrailSearch,
+    TrailSection,
+)
+from hikster.hike.profile import get_profile
+from hikster.hike.routing import RoutingError, get_graph, locate
 from hikster.hike.serializers import (
     ActivitySerializer,
     EventSerializer,
     EventTrailSectionSerializer,
+    RouteQuerySerializer,
     Trail3DSerializer,
     TrailSectionSerializer,
     TrailSerializer,
 )
 from hikster.location.models import LOCATION_NETWORK, Location
+from hikster.organizations.models import Organization, get_territory
+from hikster.utils.geojson import SIMPLIFIED_TOLERANCE
 
 
 class ActivityViewSet(viewsets.ModelViewSet):
@@ -46,7 +57,7 @@ class TrailSectionViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
     def get_queryset(self) -> QuerySet:
         queryset = self.queryset
         arguments = {
-            key: value for key, value in self.request.self.request.GET.items() if value
+            key: value for key, value in self.request.GET.items() if value
         }
 
         ids = arguments.pop("ids", None)
@@ -57,31 +68,14 @@ class TrailSectionViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
             return queryset.filter(pk__in=trailsections_to_find)
 
         if location:
-            # first, get all location ids from the url - location_id_list
-            # second, get only the location objects of these ids in Location table
-            # third, loc_shapes is an list of the shape attr of all location objects
-            # last, filter all the query sets using GeoJson shape__within all the shapes in location_shapes
+            # Only the trail sections inside of the buffered shapes of the
+            # locations, as in Organization.trail_sections
             location_id_list = [int(loc_id) for loc_id in location.split(",")]
-            location_obj_list = Location.objects.filter(
-                location_id__in=location_id_list
-            )
+            territory = get_territory(location_id_list)
+            if territory is None:
+                return queryset.none()
 
-            location_buffered_shapes = [
-                location_obj.shape.buffer(0.02)
-                for location_obj in location_obj_list
-                if location_obj.shape is not None
-            ]
-
-            # Turn the list of location shapes into a list of Q objects
-            queries = [Q(shape__within=shape) for shape in location_buffered_shapes]
-            # Take one Q object from the list
-            query = queries.pop()
-            # Or the Q object with the ones remaining in the list
-            for item in queries:
-                query |= item
-
-            queryset = queryset.filter(query)
-            return queryset
+            return queryset.filter(shape__within=territory)
 
         return queryset
 
@@ -116,7 +110,7 @@ class TrailSectionViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
     def list(self, request, *arg, **kwargs):
         queryset = self.get_queryset()
 
-        if "location" in request.self.request.GET:
+        if "location" in request.GET:
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
 
@@ -155,7 +149,9 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
     - length [type: string] (e.g. "0" | "0-2000" | "2000-5000" | "5000-10000" | "10000"). Expressed in meter.
     - dog_allowed [type: boolean] (e.g. 1 | 0)
     - types [type: int]
-    - Constrain by a bounding box
+    - Constrain by a bounding box, the trails are then ordered by distance to its center
+    - limit [type: int] the number of nearest trails, with a bounding box
+    - radius [type: float] the maximal distance to the center of the bounding box, in meters
     - Constrain by a location
 
     Values for "difficulty" are 0=Toutes les difficultés, 1=Débutant, 2=Modéré, 3=Intermédiaire, 4=Soutenu, 5=Exigeant
@@ -166,6 +162,7 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
 
     Here are some exemple of requests :
     /trails/59072/?expand=location,location.address,location.contact,images
+    /trails/59072/profile/?points=200
     /trails/difficulty=2&date=2&length=2-5&dog_allowed=true
     /trails/?difficutly=1,2,3
     /trails/?activities=1,2,3
@@ -174,11 +171,17 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
     /trails/?types=1,2,3
     /trails/?min_lng=-73.587738&min_lat=45.504050&max_lng=-73.587730&max_lat=45.504058
     /trails/?min_lng=-73.587738&min_lat=45.504050&max_lng=-73.587730&max_lat=45.504058&difficulty=1
+    /trails/?min_lng=-73.6&min_lat=45.4&max_lng=-73.5&max_lat=45.6&radius=5000&limit=50
+
+    The list is paginated by page number (page=2), or by keyset with the cursor
+    parameter: empty for the first page, then the next and prev links. The count
+    is then only returned with count=exact, or count=estimate for an estimate:
+    /trails/?activities=1&cursor=&count=estimate
 
     """
 
     queryset = Trail.objects_with_eager_loading.all()
-    pagination_class = pagination.CustomPageNumberPagination
+    pagination_class = pagination.KeysetPagination
     permission_classes = (permissions.IsOwnerOrReadOnly,)
     serializer_class = TrailSerializer
 
@@ -217,8 +220,8 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
         #
         queryset = super().get_queryset()
         if self.action in ["retrieve", "list"]:
-            queryset = queryset.prefetch_related(
-                "trail_sections", "images", "location__contact", "location__images"
+            queryset = queryset.with_listing_data().prefetch_related(
+                "images", "location__contact", "location__images"
             )
 
         #
@@ -227,6 +230,16 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
         if self.action == "retrieve":
             return queryset
 
+        # The filters are applied to the trail search table (see TrailSearch),
+        # the trails are then loaded with a single "IN" subquery. Its shape is
+        # simplified, so the spatial filters only use it to narrow the search
+        # down, within the simplification tolerance, and are applied to the
+        # shape of the trails
+        search = TrailSearch.objects.all()
+        shape_filters = {}
+        filtered = False
+        center = None
+
         # TODO: move this to search view
         if search_term:
             trail_kwargs = {}
@@ -243,9 +256,14 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
             elif location["type"] == 10:
                 trail_kwargs["region_id"] = location["location_id"]
             else:
-                trail_kwargs["shape__dwithin"] = (location["shape"], 0)
+                trail_kwargs["shape__dwithin"] = (
+                    location["shape"],
+                    SIMPLIFIED_TOLERANCE,
+                )
+                shape_filters["shape__dwithin"] = (location["shape"], 0)
 
-            queryset = queryset.filter(**trail_kwargs)
+            search = search.filter(**trail_kwargs)
+            filtered = True
 
         #
         # Constrain by a location
@@ -265,11 +283,15 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
                 return queryset.none()
 
             if is_multilocation or is_loc_netw:
-                queryset = queryset.filter(location__in=locs)
+                search = search.filter(location_id__in=locs.values("location_id"))
             elif location:
-                queryset = queryset.filter(shape__intersects=location.shape)
+                search = search.filter(
+                    shape__dwithin=(location.shape, SIMPLIFIED_TOLERANCE)
+                )
+                shape_filters["shape__intersects"] = location.shape
             else:
                 return queryset.none()
+            filtered = True
 
         #
         # Constrain by a bounding box
@@ -279,45 +301,49 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
             bbox = Polygon.from_bbox(bbox_coord)
             center = bbox.centroid
             center.srid = 4326
-            queryset = (
-                queryset.filter(shape__bboverlaps=bbox)
-                .annotate(distance=Distance("shape", center))
-                .order_by("distance")
+            x_min, y_min, x_max, y_max = bbox.extent
+            margin = SIMPLIFIED_TOLERANCE
+            search_bbox = Polygon.from_bbox(
+                (x_min - margin, y_min - margin, x_max + margin, y_max + margin)
             )
+            search = search.filter(shape__bboverlaps=search_bbox)
+            shape_filters["shape__bboverlaps"] = bbox
+            filtered = True
 
         #
         # Constrain by a list of trail ids
         #
         if ids:
-            queryset = queryset.filter(pk__in=ids.split(","))
+            search = search.filter(trail_id__in=ids.split(","))
+            filtered = True
 
         #
         # Filter by activity
         #
         if activity_id:
-            activity_id = activity_id.split(",")
-            queryset = queryset.filter(activities__activity_id__in=activity_id)
+            search = search.filter(activity_ids__overlap=activity_id.split(","))
+            filtered = True
 
         #
         # Filter by activities
         #
         if activities:
-            queryset = queryset.filter(
-                activities__activity_id__in=activities.split(",")
-            )
+            search = search.filter(activity_ids__overlap=activities.split(","))
+            filtered = True
 
         #
         # Filter by path_type
         #
         if types:
-            queryset = queryset.filter(path_type__in=types.split(","))
+            search = search.filter(path_type__in=types.split(","))
+            filtered = True
 
         #
         # Filter by difficulty
         #
         if difficulty:
-            difficulty = difficulty.split(",")
-            queryset = queryset.filter(activities__difficulty__in=difficulty)
+            search = search.filter(difficulties__overlap=difficulty.split(","))
+            filtered = True
 
         #
         # Filter by length
@@ -325,17 +351,33 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
         if length:
             length_bounds = length.split("-")
             length_min = float(length_bounds[0])
-            queryset = queryset.filter(total_length__gte=length_min)
+            search = search.filter(total_length__gte=length_min)
             if len(length_bounds) > 1:
                 length_max = float(length_bounds[1])
-                queryset = queryset.filter(total_length__lte=length_max)
+                search = search.filter(total_length__lte=length_max)
+            filtered = True
 
         #
         # Filter by dogs allowed
         #
         if dog_allowed:
             dog_allowed = int(dog_allowed) == 1
-            queryset = queryset.filter(location__dog_allowed=dog_allowed)
+            search = search.filter(dog_allowed=dog_allowed)
+            filtered = True
+
+        if filtered:
+            queryset = queryset.filter(
+                pk__in=search.values("trail_id"), **shape_filters
+            )
+
+        #
+        # Order by distance to the center of the bounding box
+        #
+        if center:
+            limit, radius = knn.get_knn_params(self.request.GET)
+            return knn.nearest(
+                queryset, "shape_2d", center, limit=limit, radius=radius
+            )
 
         return queryset.order_by("trail_id")
 
@@ -407,7 +449,7 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
         :return: Response object with the trail objects
         """
 
-        data = request.self.request.GET
+        data = request.GET
         arguments = {}
 
         for key, value in data.items():
@@ -433,6 +475,26 @@ class TrailViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
         serializer = self.get_serializer(showcase_hikes, many=True)
         return Response(serializer.data)
 
+    @detail_route(methods=["get"])
+    def profile(self, request, pk=None) -> Response:
+        """
+        Get the elevation profile of a trail
+        :param request: Request object with the maximal number of points (points)
+        :return: Response object with the cumulative distances and the elevations,
+            in metres
+        """
+        profile = get_object_or_404(
+            Trail.objects.filter(pk=pk).values_list("profile", flat=True)
+        )
+        try:
+            points = int(request.GET.get("points", 0))
+        except ValueError:
+            return Response(
+                {"points": "A valid integer is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(get_profile(profile, points))
+
 
 class Trail3DViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Trail.objects.values("trail_id", "shape")
@@ -461,3 +523,46 @@ class EventTrailSectionViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
             )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RouteView(views.APIView):
+    """
+    Compute the shortest route on the trail section network.
+
+    The resource accepts the following query parameters (params appended with * are mandatory):
+    - start* [type: string] (e.g. -73.587738,45.504050)
+    - end* [type: string] (e.g. -73.587730,45.504058)
+    - via [type: string] points to go through, separated by ";" (e.g. -73.58,45.50;-73.59,45.51)
+    - organization [type: int] only route on the trail sections of this organization
+
+    The response contains the route length, in meters, and its topology: the ordered list of
+    trail sections with the start and end positions on each one, as expected by the "events"
+    of the trail admin.
+
+    Example request:
+    /route/?start=-73.587738,45.504050&end=-73.587730,45.504058
+    """
+
+    def get_trail_sections(self, organization_id):
+        if organization_id is None:
+            return TrailSection.objects.all(), "all"
+
+        organization = get_object_or_404(Organization, pk=organization_id)
+        return organization.trail_sections, organization.pk
+
+    def get(self, request):
+        serializer = RouteQuerySerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        trail_sections, graph_key = self.get_trail_sections(data.get("organization"))
+        points = [data["start"]] + data.get("via", []) + [data["end"]]
+
+        try:
+            anchors = [locate(point, trail_sections) for point in points]
+            graph = get_graph(trail_sections, graph_key)
+            length, topology = graph.route(anchors)
+        except RoutingError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"length": length, "topology": topology})
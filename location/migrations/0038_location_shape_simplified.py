@@ -0,0 +1,31 @@
+import os
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("location", "0037_populate_poitype_category"),
+        ("hike", "0067_shape_simplified"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="location",
+            name="shape_simplified",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                editable=False, null=True, spatial_index=False, srid=4326
+            ),
+        ),
+        migrations.RunSQL(
+            load_sql_statement_from_file("10_simplified_geometry.sql")
+        ),
+    ]
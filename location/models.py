@@ -50,6 +50,10 @@ class Location(models.Model):
     location_id = models.AutoField(primary_key=True)
     slug = models.SlugField(max_length=300, default="", blank=True)
     shape = models.GeometryField(srid=4326, null=True, blank=True)
+    # Simplified 2D shape for the maps, computed by a trigger
+    shape_simplified = models.GeometryField(
+        srid=4326, null=True, editable=False, spatial_index=False
+    )
     name = models.CharField(max_length=250, null=True)
     type = models.IntegerField(choices=LOCATION_TYPE, null=True, blank=True)
     parking = models.IntegerField(null=True, blank=True)
@@ -39,7 +39,7 @@ class LocationSerializer(
 
     class Meta:
         model = Location
-        fields = "__all__"
+        exclude = ["shape_simplified"]
         expandable_fields = {
             "address": AddressSerializer,
             "contact": (ContactSerializer, (), {"many": True}),
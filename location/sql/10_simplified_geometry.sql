@@ -0,0 +1,9 @@
+-- ft_simplify_geometry and simplify_shape are defined in
+-- hike/sql/90_simplified_geometry.sql
+
+DROP TRIGGER IF EXISTS location_simplify_shape_trg ON location_location;
+CREATE TRIGGER location_simplify_shape_trg
+BEFORE INSERT OR UPDATE OF shape ON location_location
+FOR EACH ROW EXECUTE PROCEDURE simplify_shape();
+
+UPDATE location_location SET shape_simplified = ft_simplify_geometry(shape);
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from django.db.models import Q
@@ -16,7 +15,8 @@ from hikster.location.serializers import \
 from hikster.location.models import Location, PointOfInterest, PointOfInterestType
 from hikster.location.tasks import send_deletion_email_task
 
-from hikster.helpers import pagination, permissions
+from hikster.helpers import knn, pagination, permissions
+from hikster.search import autosuggest
 
 
 class LocationViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
@@ -143,11 +143,9 @@ class LocationViewSet(NestedViewSetMixin, viewsets.ModelViewSet):
         :param request: Request object with the current term to look for
         :return: The reduced set of data containing the id, name and type
         """
-        location_kwargs = {"name__unaccent__icontains": request.query_params.get("search_term")}
-
-        # create query for
-
-        searched_location = Location.objects.filter(**location_kwargs).distinct()[:12]
+        searched_location = autosuggest.suggest(
+            Location.objects.all(), request.query_params.get("search_term")
+        )
         serialized_data = LocationSerializer(searched_location, context={'request': request}, many=True)
         return Response(serialized_data.data)
 
@@ -196,17 +194,26 @@ class PointOfInterestViewSet(viewsets.ModelViewSet):
     - search_term [type: string] (e.g. Mont Saint-Bruno (id))
     - category type: array (e.g. 1,4,6)
     - coordinate to rank result by distance from this point
+    - limit [type: int] the number of nearest points of interest, with coord
+    - radius [type: float] the maximal distance to coord, in meters
 
     Value for search_term is a string of the form "{location_name} ({id})"
     Values for "category" are 1=Hébergement, 3=Stationnement, 4=Activité, 5=Restaurant, 6=Autre
 
     Example request = /point-of-interests/?search_term=toilettes&category=1,4,5,6
+    Example request = /point-of-interests/?coord=-73.58,45.50&radius=5000&limit=20
+
+    The list is paginated by page number (page=2), or by keyset with the cursor
+    parameter: empty for the first page, then the next and prev links. The count
+    is then only returned with count=exact, or count=estimate for an estimate.
+
+    Example request = /point-of-interests/?coord=-73.58,45.50&cursor=&count=estimate
 
     """
     queryset = PointOfInterest.objects_with_eager_loading.filter(
         Q(visible_in_map=1) & (~Q(category__in=[1, 4, 5]) | Q(premium=True)))
     serializer_class = PointOfInterestSerializer
-    pagination_class = pagination.CustomPageNumberPagination
+    pagination_class = pagination.KeysetPagination
 
     def get_queryset(self):
         queryset = super(PointOfInterestViewSet, self).get_queryset()
@@ -253,9 +260,11 @@ class PointOfInterestViewSet(viewsets.ModelViewSet):
         #
         if coord:
             point = Point(*[float(x) for x in coord.split(',')], srid=4326)
-            queryset = queryset.annotate(
-                distance=Distance('shape', point)
-            ).order_by('distance')
+            limit, radius = knn.get_knn_params(self.request.GET)
+            queryset = knn.nearest(
+                queryset, 'shape', point, limit=limit, radius=radius,
+                distance='distance'
+            )
 
         return queryset
 
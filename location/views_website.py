@@ -1,11 +1,12 @@
 from collections import defaultdict
 
-from django.core.serializers import serialize
 from django.templatetags.static import static
 from django.views.generic import DetailView
 
 from hikster.admin.api.location.serializers import POIAdminSerializer
 from hikster.core.mixins import PageLoadMixin
+from hikster.hike.models import Trail
+from hikster.utils.geojson import DISPLAY_ZOOM, serialize_geojson
 from hikster.utils.helpers import is_email, is_url
 
 from .models import Location, PointOfInterest
@@ -39,13 +40,15 @@ class LocationDetailView(PageLoadMixin, ContactMixin, DetailView):
             context["banner"] = self.request.build_absolute_uri(banner.image.url)
 
         context["contacts"] = self._get_contacts()
-        context["geo_json"] = serialize(
-            "geojson",
+        context["geo_json"] = serialize_geojson(
             self.model.objects.filter(pk=self.object.pk),
-            geometry_field="shape",
+            fields=("pk", "location_id", "name"),
+            zoom=DISPLAY_ZOOM,
         )
-        context["trails_json"] = serialize(
-            "geojson", self.object.trails.all(), geometry_field="shape"
+        context["trails_json"] = serialize_geojson(
+            self.object.trails.all(),
+            fields=Trail.GEOJSON_FIELDS,
+            zoom=DISPLAY_ZOOM,
         )
         context["map_style"] = "location"
         context["poi_categories"] = get_poi_categories()
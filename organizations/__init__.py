@@ -0,0 +1 @@
+default_app_config = "hikster.organizations.apps.OrganizationsConfig"
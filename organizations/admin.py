@@ -32,3 +32,13 @@ class WidgetLoadAdmin(admin.ModelAdmin):
 @admin.register(models.PageLoad)
 class PageLoadAdmin(admin.ModelAdmin):
     list_display = ("organization", "date_created")
+
+
+@admin.register(models.MonthlyLoadCount)
+class MonthlyLoadCountAdmin(admin.ModelAdmin):
+    list_display = ("organization", "month", "widget_loads", "page_loads")
+
+
+@admin.register(models.DailyLoadCount)
+class DailyLoadCountAdmin(admin.ModelAdmin):
+    list_display = ("organization", "day", "referrer", "widget_loads", "page_loads")
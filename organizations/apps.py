@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OrganizationsConfig(AppConfig):
     name = 'hikster.organizations'
+
+    def ready(self):
+        import hikster.organizations.signals  # noqa
@@ -0,0 +1,377 @@
+"""
+Recording of the widget and page loads of the organizations.
+
+The loads are not written in the request: they are appended to a buffer (a
+Redis list, or an in-process queue with LOAD_BUFFER = "memory"), then
+flush_loads_task saves them with bulk inserts and adds them to the
+MonthlyLoadCount counters, which the quotas and the dashboard read. The
+counters lag behind by at most LOAD_BUFFER_FLUSH_INTERVAL seconds.
+
+A page load refers to its widget load by the key generated when the widget
+load is recorded, as the widget load may not be saved yet: a page load whose
+widget load is not found is put back in the buffer, up to
+MAX_PAGE_LOAD_ATTEMPTS times. The loads that can not be saved are moved to
+the dead-letter list of the buffer, the others of their batch are saved.
+"""
+import json
+import logging
+import threading
+import uuid
+from collections import Counter, deque
+
+import django_rq
+from django.conf import settings
+from django.db import DataError, IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DailyLoadCount, MonthlyLoadCount, PageLoad, WidgetLoad, get_month
+
+logger = logging.getLogger(__name__)
+
+LOAD_BUFFER_KEY = "hikster:loads"
+
+# Number of loads saved by transaction
+FLUSH_BATCH_SIZE = 1000
+
+# Number of flushes a page load waits for its widget load
+MAX_PAGE_LOAD_ATTEMPTS = 10
+
+# Errors of a load that can not be saved, e.g. of a deleted organization
+INVALID_LOAD_ERRORS = (DataError, IntegrityError, KeyError, TypeError, ValueError)
+
+# Lifetime of the flush lock, in seconds, in case the flush is killed
+FLUSH_LOCK_TIMEOUT = 10 * 60
+
+INCREMENT_SQL = f"""
+    INSERT INTO {MonthlyLoadCount._meta.db_table}
+        (organization_id, month, widget_loads, page_loads)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (organization_id, month) DO UPDATE SET
+        widget_loads = {MonthlyLoadCount._meta.db_table}.widget_loads
+            + EXCLUDED.widget_loads,
+        page_loads = {MonthlyLoadCount._meta.db_table}.page_loads
+            + EXCLUDED.page_loads
+"""
+
+# Recount the loads of the organizations from the recorded loads and the daily
+# counts of the compacted ones
+BACKFILL_SQL = f"""
+    INSERT INTO {MonthlyLoadCount._meta.db_table}
+        (organization_id, month, widget_loads, page_loads)
+    SELECT organization_id, month, sum(widget_loads), sum(page_loads)
+    FROM (
+        SELECT organization_id,
+            date_trunc('month', date_created AT TIME ZONE 'UTC')::date AS month,
+            count(*) AS widget_loads, 0 AS page_loads
+        FROM {WidgetLoad._meta.db_table}
+        GROUP BY 1, 2
+        UNION ALL
+        SELECT organization_id,
+            date_trunc('month', date_created AT TIME ZONE 'UTC')::date AS month,
+            0 AS widget_loads, count(*) AS page_loads
+        FROM {PageLoad._meta.db_table}
+        GROUP BY 1, 2
+        UNION ALL
+        SELECT organization_id, date_trunc('month', day)::date AS month,
+            sum(widget_loads) AS widget_loads, sum(page_loads) AS page_loads
+        FROM {DailyLoadCount._meta.db_table}
+        GROUP BY 1, 2
+    ) loads
+    GROUP BY organization_id, month
+    ON CONFLICT (organization_id, month) DO UPDATE SET
+        widget_loads = EXCLUDED.widget_loads,
+        page_loads = EXCLUDED.page_loads
+"""
+
+
+def increment_load_counts(organization_id, month=None, widget_loads=0, page_loads=0):
+    """
+    Add loads to the monthly counts of an organization, in a single upsert so
+    that concurrent loads are all counted.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            INCREMENT_SQL,
+            [organization_id, month or get_month(), widget_loads, page_loads],
+        )
+
+
+class RedisLoadBuffer:
+    """
+    Buffer of the loads in a Redis list, shared by the web and the Celery
+    processes. Uses the connection of the default RQ queue.
+    """
+
+    def __init__(self, key=LOAD_BUFFER_KEY):
+        self.key = key
+        self.failed_key = f"{key}:failed"
+        self.connection = django_rq.get_connection()
+
+    def lock(self):
+        return self.connection.lock(f"{self.key}:lock", timeout=FLUSH_LOCK_TIMEOUT)
+
+    def push(self, load):
+        self.connection.rpush(self.key, json.dumps(load))
+
+    def pop(self, count):
+        pipeline = self.connection.pipeline()
+        pipeline.lrange(self.key, 0, count - 1)
+        pipeline.ltrim(self.key, count, -1)
+        items, _ = pipeline.execute()
+        return [json.loads(item) for item in items]
+
+    def requeue(self, loads):
+        if loads:
+            self.connection.lpush(
+                self.key, *[json.dumps(load) for load in reversed(loads)]
+            )
+
+    def reject(self, loads):
+        if loads:
+            self.connection.rpush(
+                self.failed_key, *[json.dumps(load) for load in loads]
+            )
+
+
+class MemoryLoadBuffer:
+    """
+    Buffer of the loads in the memory of the process, for the tests and the
+    development server.
+    """
+
+    loads = deque()
+    failed = deque()
+    flush_lock = threading.Lock()
+
+    def lock(self):
+        return self.flush_lock
+
+    def push(self, load):
+        self.loads.append(load)
+
+    def pop(self, count):
+        return [self.loads.popleft() for _ in range(min(count, len(self.loads)))]
+
+    def requeue(self, loads):
+        self.loads.extendleft(reversed(loads))
+
+    def reject(self, loads):
+        self.failed.extend(loads)
+
+
+def get_load_buffer():
+    if getattr(settings, "LOAD_BUFFER", "redis") == "memory":
+        return MemoryLoadBuffer()
+    return RedisLoadBuffer()
+
+
+def record_widget_load(organization, referrer=""):
+    """
+    Buffer a widget load.
+
+    :return: the key of the widget load, to record its page loads
+    """
+    key = uuid.uuid4().hex
+    get_load_buffer().push(
+        {
+            "type": "widget",
+            "key": key,
+            "organization_id": organization.pk,
+            "referrer": referrer,
+            "date_created": timezone.now().isoformat(),
+        }
+    )
+    return key
+
+
+def record_page_load(
+    organization, widget_load_key=None, referrer="", url="", widget_load_id=None
+):
+    """
+    Buffer a page load of the widget load `widget_load_key`, or of the saved
+    widget load `widget_load_id`. The page load is recorded without widget
+    load when neither is known.
+    """
+    get_load_buffer().push(
+        {
+            "type": "page",
+            "widget_load_key": widget_load_key,
+            "widget_load_id": widget_load_id,
+            "organization_id": organization.pk,
+            "referrer": referrer,
+            "url": url,
+            "date_created": timezone.now().isoformat(),
+        }
+    )
+
+
+def get_widget_load_ids(keys):
+    return {
+        key.hex: pk
+        for key, pk in WidgetLoad.objects.filter(key__in=keys).values_list(
+            "key", "pk"
+        )
+    }
+
+
+@transaction.atomic
+def save_loads(loads):
+    """
+    Save buffered loads and add them to the monthly counts.
+
+    :return: the page loads not saved as their widget load is not found
+    """
+    widget_loads = [
+        WidgetLoad(
+            key=load["key"],
+            organization_id=load["organization_id"],
+            referrer=load["referrer"][:255],
+            date_created=parse_datetime(load["date_created"]),
+        )
+        for load in loads
+        if load["type"] == "widget"
+    ]
+    WidgetLoad.objects.bulk_create(widget_loads)
+
+    page_loads = [load for load in loads if load["type"] == "page"]
+    widget_load_ids = get_widget_load_ids(
+        {load["widget_load_key"] for load in page_loads if load["widget_load_key"]}
+    )
+    # The widget loads of the sessions opened before the loads were buffered
+    legacy_ids = set(
+        WidgetLoad.objects.filter(
+            pk__in={load.get("widget_load_id") for load in page_loads} - {None}
+        ).values_list("pk", flat=True)
+    )
+    unmatched, saved = [], []
+    for load in page_loads:
+        key, widget_load_id = load["widget_load_key"], load.get("widget_load_id")
+        if key and key not in widget_load_ids:
+            unmatched.append(load)
+            continue
+        saved.append(
+            PageLoad(
+                organization_id=load["organization_id"],
+                widget_load_id=widget_load_ids[key]
+                if key
+                else (widget_load_id if widget_load_id in legacy_ids else None),
+                referrer=load["referrer"][:255],
+                url=load["url"][:255],
+                date_created=parse_datetime(load["date_created"]),
+            )
+        )
+    page_loads = saved
+    PageLoad.objects.bulk_create(page_loads)
+
+    counts = Counter()
+    for load in widget_loads + page_loads:
+        field = "widget_loads" if isinstance(load, WidgetLoad) else "page_loads"
+        counts[load.organization_id, get_month(load.date_created.date()), field] += 1
+    for (organization_id, month, field), count in counts.items():
+        increment_load_counts(organization_id, month, **{field: count})
+
+    return unmatched
+
+
+def save_batch(load_buffer, loads, retried):
+    """
+    Save a batch of loads. When the batch fails, its loads are saved one by
+    one and the failing ones are moved to the dead-letter list.
+
+    :param retried: the list the page loads without widget load are added
+        to, to be put back in the buffer at the end of the flush (see
+        retry_loads)
+    :raise: the other errors, e.g. when the database is unavailable, the
+        loads not saved are put back in the buffer
+    :return: the number of loads saved
+    """
+    try:
+        unmatched = save_loads(loads)
+    except Exception:
+        logger.exception(f"Batch of {len(loads)} loads failed, saving them one by one")
+        unmatched, failed = [], []
+        for index, load in enumerate(loads):
+            try:
+                unmatched += save_loads([load])
+            except INVALID_LOAD_ERRORS:
+                failed.append(load)
+            except Exception:
+                retried += unmatched
+                load_buffer.requeue(loads[index:])
+                load_buffer.reject(failed)
+                raise
+        if failed:
+            logger.error(f"{len(failed)} loads could not be saved, moved aside")
+            load_buffer.reject(failed)
+        saved = len(loads) - len(failed) - len(unmatched)
+    else:
+        saved = len(loads) - len(unmatched)
+
+    retried += unmatched
+    return saved
+
+
+def retry_loads(load_buffer, loads):
+    """
+    Put back in the buffer the page loads whose widget load was not found,
+    for the next flush. They count an attempt per flush, and are moved to the
+    dead-letter list after MAX_PAGE_LOAD_ATTEMPTS attempts.
+    """
+    retried, dropped = [], []
+    for load in loads:
+        load["attempts"] = load.get("attempts", 0) + 1
+        if load["attempts"] < MAX_PAGE_LOAD_ATTEMPTS:
+            retried.append(load)
+        else:
+            dropped.append(load)
+    for load in retried:
+        load_buffer.push(load)
+    if dropped:
+        logger.warning(f"{len(dropped)} page loads without widget load moved aside")
+        load_buffer.reject(dropped)
+
+
+def flush_loads(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Save the buffered loads, `batch_size` loads by transaction (see
+    save_batch). Does nothing if another flush is running, so that the page
+    loads find the widget loads saved before them.
+
+    :return: the number of loads saved
+    """
+    load_buffer = get_load_buffer()
+    lock = load_buffer.lock()
+    if not lock.acquire(blocking=False):
+        logger.info("Loads already being flushed")
+        return 0
+
+    total, retried = 0, []
+    try:
+        while True:
+            loads = load_buffer.pop(batch_size)
+            if not loads:
+                break
+            total += save_batch(load_buffer, loads, retried)
+            if len(loads) < batch_size:
+                break
+    finally:
+        # Put back after the loop, not to pop them again in the same flush
+        try:
+            retry_loads(load_buffer, retried)
+        finally:
+            lock.release()
+
+    return total
+
+
+@transaction.atomic
+def backfill_load_counts():
+    """
+    Recompute the monthly counts from the recorded loads and the daily counts.
+
+    :return: the number of monthly counts written
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(BACKFILL_SQL)
+        return cursor.rowcount
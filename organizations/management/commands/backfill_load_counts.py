@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from hikster.organizations.loads import backfill_load_counts
+
+
+class Command(BaseCommand):
+    help = """Recompute the monthly widget and page load counts from the recorded loads."""
+
+    def handle(self, *args, **options):
+        count = backfill_load_counts()
+
+        if options["verbosity"] > 0:
+            self.stdout.write(
+                self.style.SUCCESS(f"{count} monthly load counts have been written")
+            )
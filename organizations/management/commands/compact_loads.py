@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from hikster.organizations.retention import compact_loads, prune_daily_load_counts
+
+
+class Command(BaseCommand):
+    help = """Compact the widget and page loads older than the retention period in daily counts."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            help="Months of loads kept (default: RAW_LOADS_RETENTION_MONTHS)",
+        )
+        parser.add_argument(
+            "--daily-months",
+            type=int,
+            help="Months of daily counts kept (default: DAILY_LOADS_RETENTION_MONTHS)",
+        )
+
+    def handle(self, *args, **options):
+        compacted = compact_loads(options["months"])
+        pruned = prune_daily_load_counts(options["daily_months"])
+
+        if options["verbosity"] > 0:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{compacted} daily load counts have been written, "
+                    f"{pruned} have been deleted"
+                )
+            )
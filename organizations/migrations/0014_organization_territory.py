@@ -0,0 +1,29 @@
+import os
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("location", "0038_location_shape_simplified"),
+        ("organizations", "0013_remove_incorrect_map_loads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="territory",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.RunSQL(load_sql_statement_from_file("10_territory.sql")),
+    ]
@@ -0,0 +1,52 @@
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("organizations", "0016_buffered_loads")]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyLoadCount",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("referrer", models.CharField(blank=True, max_length=255)),
+                ("widget_loads", models.IntegerField(default=0)),
+                ("page_loads", models.IntegerField(default=0)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_loads",
+                        to="organizations.Organization",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name="dailyloadcount", unique_together={("organization", "day", "referrer")}
+        ),
+        migrations.AddIndex(
+            model_name="widgetload",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["date_created"], name="widgetload_date_brin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pageload",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["date_created"], name="pageload_date_brin"
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("organizations", "0017_dailyloadcount")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="organization",
+            name="aid",
+            field=models.CharField(
+                blank=True, db_index=True, default=None, max_length=500, null=True
+            ),
+        )
+    ]
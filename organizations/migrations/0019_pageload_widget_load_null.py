@@ -0,0 +1,21 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("organizations", "0018_organization_aid_index")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pageload",
+            name="widget_load",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="page_loads",
+                to="organizations.WidgetLoad",
+            ),
+        )
+    ]
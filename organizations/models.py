@@ -1,5 +1,8 @@
 from django.conf import settings
-from django.db import models
+from django.contrib.gis.db import models
+from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import connection
 
 from hikster.hike.models import Trail, TrailSection
 from django.utils import timezone
@@ -8,6 +11,30 @@ from hikster.utils.models import Address
 from hikster.location.models import PointOfInterest
 
 
+# Distance around the locations included in the territory of an organization,
+# in degrees. Must match hikster/organizations/sql/10_territory.sql
+TERRITORY_BUFFER = 0.02
+
+
+def get_month(date=None):
+    """
+    Return the first day of the month of a date, of today by default.
+    """
+    date = date or timezone.now().date()
+    return date.replace(day=1)
+
+
+def get_territory(location_ids):
+    """
+    Return the union of the shapes of locations, buffered by TERRITORY_BUFFER,
+    computed by the database.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT ft_locations_territory(%s)", [list(location_ids)])
+        territory = cursor.fetchone()[0]
+    return GEOSGeometry(territory) if territory else None
+
+
 class OrganizationWidget(models.Model):
     organization = models.OneToOneField(
         "Organization", on_delete=models.CASCADE, related_name="widget"
@@ -27,7 +54,12 @@ class Organization(models.Model):
     address = models.OneToOneField(
         Address, null=True, blank=True, on_delete=models.CASCADE
     )
-    aid = models.CharField(max_length=500, default=None, null=True, blank=True)
+    aid = models.CharField(
+        max_length=500, default=None, null=True, blank=True, db_index=True
+    )
+    # Union of the buffered shapes of the locations, computed by a trigger
+    # (see get_territory)
+    territory = models.GeometryField(srid=4326, null=True, editable=False)
 
     class Meta:
         ordering = ["name"]
@@ -36,74 +68,76 @@ class Organization(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
+        # The territory is only written by the triggers of the locations
+        if (
+            not self._state.adding
+            and not kwargs.get("update_fields")
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "territory"
+            ]
         super().save(*args, **kwargs)
         if not hasattr(self, "widget"):
             OrganizationWidget.objects.create(organization=self)
 
-    def get_location_shape_query(self):
-        location_buffered_shapes = [
-            location.shape.buffer(0.02)
-            for location in self.locations.all()
-            if location.shape is not None
-        ]
-
-        # Turn the list of location shapes into a list of Q objects
-        queries = [models.Q(shape__within=shape) for shape in location_buffered_shapes]
-
-        if not queries:
-            return None
-
-        # Take one Q object from the list
-        query = queries.pop()
-        # Or the Q object with the ones remaining in the list
-        for item in queries:
-            query |= item
-
-        return query
-
     @property
     def trail_sections(self):
-        query = self.get_location_shape_query()
-
-        if query is None:
+        if self.territory is None:
             return TrailSection.objects.none()
 
-        return TrailSection.objects.filter(query)
+        return TrailSection.objects.filter(shape__within=self.territory)
 
     @property
     def point_of_interests(self):
-        query = self.get_location_shape_query()
-
-        if query is None:
+        if self.territory is None:
             return PointOfInterest.objects.none()
 
-        return PointOfInterest.objects.filter(query)
+        return PointOfInterest.objects.filter(shape__within=self.territory)
 
     @property
     def trails(self):
         return Trail.objects.filter(location__in=self.locations.all())
 
+    def get_load_counts(self, month=None):
+        """
+        Return the widget and page loads of a month, the current one by default.
+        """
+        month = month or get_month()
+        counts = self.monthly_loads.filter(month=month).values(
+            "widget_loads", "page_loads"
+        )
+        return counts.first() or {"widget_loads": 0, "page_loads": 0}
+
     @cached_property
-    def total_widget_loads(self):
-        return self.widget_loads.count()
+    def total_load_counts(self):
+        counts = self.monthly_loads.aggregate(
+            widget_loads=models.Sum("widget_loads"),
+            page_loads=models.Sum("page_loads"),
+        )
+        return {key: value or 0 for key, value in counts.items()}
 
     @cached_property
+    def current_month_load_counts(self):
+        return self.get_load_counts()
+
+    @property
+    def total_widget_loads(self):
+        return self.total_load_counts["widget_loads"]
+
+    @property
     def current_month_widget_loads(self):
-        current_date = timezone.now().date()
-        return self.widget_loads.filter(
-            date_created__year=current_date.year, date_created__month=current_date.month
-        ).count()
+        return self.current_month_load_counts["widget_loads"]
 
-    @cached_property
+    @property
     def total_page_loads(self):
-        return self.page_loads.count()
+        return self.total_load_counts["page_loads"]
 
-    @cached_property
+    @property
     def current_month_page_loads(self):
-        current_date = timezone.now().date()
-        return self.page_loads.filter(
-            date_created__year=current_date.year, date_created__month=current_date.month
-        ).count()
+        return self.current_month_load_counts["page_loads"]
 
     @property
     def consumed_max_widget_loads(self):
@@ -118,8 +152,14 @@ class WidgetLoad(models.Model):
     organization = models.ForeignKey(
         "Organization", on_delete=models.CASCADE, related_name="widget_loads"
     )
+    # Generated when the load is buffered, see organizations.loads
+    key = models.UUIDField(null=True, unique=True, editable=False)
     referrer = models.CharField(max_length=255, blank=True)
-    date_created = models.DateTimeField(auto_now_add=True)
+    date_created = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        # The loads are appended in date order
+        indexes = [BrinIndex(fields=["date_created"], name="widgetload_date_brin")]
 
     def __str__(self):
         return self.organization.name
@@ -130,16 +170,66 @@ class PageLoad(models.Model):
         "Organization", on_delete=models.CASCADE, related_name="page_loads"
     )
     widget_load = models.ForeignKey(
-        "WidgetLoad", on_delete=models.CASCADE, related_name="page_loads"
+        "WidgetLoad",
+        on_delete=models.CASCADE,
+        related_name="page_loads",
+        null=True,
+        blank=True,
     )
     referrer = models.CharField(max_length=255, blank=True)
     url = models.URLField(max_length=255, blank=True)
-    date_created = models.DateTimeField(auto_now_add=True)
+    date_created = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [BrinIndex(fields=["date_created"], name="pageload_date_brin")]
 
     def __str__(self):
         return self.organization.name
 
 
+class MonthlyLoadCount(models.Model):
+    """
+    Number of widget and page loads of an organization in a month, incremented
+    when the loads are recorded (see organizations.loads).
+    """
+
+    organization = models.ForeignKey(
+        "Organization", on_delete=models.CASCADE, related_name="monthly_loads"
+    )
+    # First day of the month
+    month = models.DateField()
+    widget_loads = models.IntegerField(default=0)
+    page_loads = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("organization", "month")
+
+    def __str__(self):
+        return f"{self.organization_id} - {self.month:%Y-%m}"
+
+
+class DailyLoadCount(models.Model):
+    """
+    Number of widget and page loads of an organization in a day, by referrer.
+    The loads older than the retention period are compacted here (see
+    organizations.retention).
+    """
+
+    organization = models.ForeignKey(
+        "Organization", on_delete=models.CASCADE, related_name="daily_loads"
+    )
+    day = models.DateField()
+    referrer = models.CharField(max_length=255, blank=True)
+    widget_loads = models.IntegerField(default=0)
+    page_loads = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("organization", "day", "referrer")
+
+    def __str__(self):
+        return f"{self.organization_id} - {self.day} - {self.referrer}"
+
+
 class OrganizationMember(models.Model):
     organization = models.ForeignKey(
         Organization, on_delete=models.CASCADE, related_name="members"
@@ -0,0 +1,116 @@
+"""
+Retention of the widget and page loads.
+
+The loads are kept RAW_LOADS_RETENTION_MONTHS months (the current month
+included). The older loads are compacted in DailyLoadCount, a month per
+transaction, and deleted. The daily counts are kept
+DAILY_LOADS_RETENTION_MONTHS months, the monthly counts (MonthlyLoadCount)
+are kept forever.
+"""
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DailyLoadCount, PageLoad, WidgetLoad, get_month
+
+# Move the loads of a month to the daily counts, in a single statement
+COMPACT_SQL = """
+    WITH deleted AS (
+        DELETE FROM {table}
+        WHERE date_created >= %s AND date_created < %s {condition}
+        RETURNING organization_id, date_created, referrer
+    )
+    INSERT INTO {daily_table} AS d
+        (organization_id, day, referrer, widget_loads, page_loads)
+    SELECT organization_id, (date_created AT TIME ZONE 'UTC')::date, referrer,
+        {widget_loads}, {page_loads}
+    FROM deleted
+    GROUP BY 1, 2, 3
+    ON CONFLICT (organization_id, day, referrer) DO UPDATE SET
+        widget_loads = d.widget_loads + EXCLUDED.widget_loads,
+        page_loads = d.page_loads + EXCLUDED.page_loads
+"""
+
+COMPACT_PAGE_LOADS_SQL = COMPACT_SQL.format(
+    daily_table=DailyLoadCount._meta.db_table,
+    table=PageLoad._meta.db_table,
+    condition="",
+    widget_loads="0",
+    page_loads="count(*)",
+)
+
+# The widget loads with recent page loads are compacted later, with them
+COMPACT_WIDGET_LOADS_SQL = COMPACT_SQL.format(
+    daily_table=DailyLoadCount._meta.db_table,
+    table=WidgetLoad._meta.db_table,
+    condition=f"""
+        AND NOT EXISTS (
+            SELECT 1 FROM {PageLoad._meta.db_table} p
+            WHERE p.widget_load_id = {WidgetLoad._meta.db_table}.id
+        )
+    """,
+    widget_loads="count(*)",
+    page_loads="0",
+)
+
+
+def get_retention_start(months):
+    """
+    Return the start of the oldest month of a retention period of `months`
+    months, the current month included.
+    """
+    month = get_month() - relativedelta(months=max(months, 1) - 1)
+    return datetime.datetime.combine(month, datetime.time(), tzinfo=timezone.utc)
+
+
+def get_oldest_load_date():
+    # The loads are appended, the first ones are the oldest
+    dates = [
+        model.objects.order_by("pk").values_list("date_created", flat=True).first()
+        for model in (WidgetLoad, PageLoad)
+    ]
+    dates = [date for date in dates if date is not None]
+    return min(dates) if dates else None
+
+
+def compact_loads(months=None):
+    """
+    Compact the loads older than `months` months in the daily counts.
+
+    :return: the number of daily counts written
+    """
+    if months is None:
+        months = getattr(settings, "RAW_LOADS_RETENTION_MONTHS", 6)
+    end = get_retention_start(months)
+    oldest = get_oldest_load_date()
+    if oldest is None or oldest >= end:
+        return 0
+
+    start = get_retention_start(1).replace(year=oldest.year, month=oldest.month)
+    total = 0
+    while start < end:
+        month_end = start + relativedelta(months=1)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(COMPACT_PAGE_LOADS_SQL, [start, month_end])
+            total += cursor.rowcount
+            cursor.execute(COMPACT_WIDGET_LOADS_SQL, [start, month_end])
+            total += cursor.rowcount
+        start = month_end
+
+    return total
+
+
+def prune_daily_load_counts(months=None):
+    """
+    Delete the daily counts older than `months` months.
+
+    :return: the number of daily counts deleted
+    """
+    if months is None:
+        months = getattr(settings, "DAILY_LOADS_RETENTION_MONTHS", 36)
+    start = get_retention_start(months).date()
+    deleted, _ = DailyLoadCount.objects.filter(day__lt=start).delete()
+    return deleted
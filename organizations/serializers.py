@@ -6,6 +6,7 @@ from rest_framework import serializers
 
 from hikster.utils.serializers import AddressSerializer
 from .models import Organization
+from .widget import get_widget
 
 
 class ValidateWidgetSerializer(serializers.Serializer):
@@ -13,21 +14,20 @@ class ValidateWidgetSerializer(serializers.Serializer):
     locations = serializers.CharField(required=False, allow_blank=True)
 
     def validate_token(self, value):
-        try:
-            org = Organization.objects.get(aid=value)
-
-            if not org.locations.exists():
-                raise serializers.ValidationError(
-                    _("Organization has no location."), code="org_no_location"
-                )
-        except Organization.DoesNotExist:
+        widget = get_widget(value)
+        if widget is None:
             raise serializers.ValidationError(_("Invalid token"), code="invalid_token")
 
-        return org
+        if not widget["locations"]:
+            raise serializers.ValidationError(
+                _("Organization has no location."), code="org_no_location"
+            )
+
+        return widget
 
     def validate(self, data):
         locations = data.get("locations", "").strip()
-        org_locations = data["token"].locations.all()
+        org_locations = list(data["token"]["locations"])
         if locations:
             try:
                 location_ids = list(map(int, locations.split(",")))
@@ -40,7 +40,7 @@ class ValidateWidgetSerializer(serializers.Serializer):
                     },
                     code="invalid_locations",
                 )
-            org_locations = org_locations.filter(location_id__in=location_ids)
+            org_locations = [i for i in org_locations if i in location_ids]
 
         if not org_locations:
             raise serializers.ValidationError(
@@ -64,7 +64,7 @@ class OrganizationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Organization
-        fields = "__all__"
+        exclude = ["territory"]
 
 
 class OrgWithUserSerializer(OrganizationSerializer):
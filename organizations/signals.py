@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from hikster.hike.models import Activity
+from hikster.location.models import Location, PointOfInterestType
+
+from .models import Organization, OrganizationWidget
+from .widget import (
+    invalidate_organization_widget,
+    invalidate_shared_widget,
+    invalidate_widget,
+)
+
+
+@receiver(pre_save, sender=Organization)
+def invalidate_organization(sender, instance: Organization, **kwargs):
+    # The previous token must stop working too
+    previous = Organization.objects.filter(pk=instance.pk).values_list(
+        "aid", flat=True
+    )
+    tokens = [instance.aid, *previous]
+    transaction.on_commit(lambda: invalidate_widget(*tokens))
+
+
+@receiver(post_delete, sender=Organization)
+def invalidate_deleted_organization(sender, instance: Organization, **kwargs):
+    transaction.on_commit(lambda: invalidate_widget(instance.aid))
+
+
+@receiver(post_save, sender=OrganizationWidget)
+def invalidate_organization_quotas(sender, instance: OrganizationWidget, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_organization_widget(instance.organization_id)
+    )
+
+
+@receiver(pre_save, sender=Location)
+def invalidate_location(sender, instance: Location, **kwargs):
+    # The location may move to another organization
+    previous = Location.objects.filter(pk=instance.pk).values_list(
+        "organization_id", flat=True
+    )
+    organization_ids = [instance.organization_id, *previous]
+    transaction.on_commit(
+        lambda: invalidate_organization_widget(*organization_ids)
+    )
+
+
+@receiver(post_delete, sender=Location)
+def invalidate_deleted_location(sender, instance: Location, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_organization_widget(instance.organization_id)
+    )
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+@receiver(post_save, sender=PointOfInterestType)
+@receiver(post_delete, sender=PointOfInterestType)
+def invalidate_widget_filters(sender, **kwargs):
+    transaction.on_commit(invalidate_shared_widget)
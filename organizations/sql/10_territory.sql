@@ -0,0 +1,76 @@
+-- Territory of the organizations: the union of the shapes of their locations,
+-- buffered by 0.02 degree. The buffer must match TERRITORY_BUFFER in
+-- hikster/organizations/models.py
+
+CREATE OR REPLACE FUNCTION ft_locations_territory(lids integer[]) RETURNS geometry AS $$
+    SELECT ST_Multi(ST_Union(ST_Buffer(shape, 0.02)))
+    FROM location_location
+    WHERE location_id = ANY(lids) AND shape IS NOT NULL;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION refresh_organization_territory(oids integer[]) RETURNS void AS $$
+BEGIN
+    UPDATE organizations_organization o SET territory = ft_locations_territory(
+        ARRAY(SELECT location_id FROM location_location WHERE organization_id = o.id)
+    )
+    WHERE o.id = ANY(oids);
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION location_territory_i() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_organization_territory(
+        ARRAY(SELECT DISTINCT organization_id FROM new_rows WHERE shape IS NOT NULL)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION location_territory_u() RETURNS trigger AS $$
+BEGIN
+    -- A location moved to another organization changes both territories
+    PERFORM refresh_organization_territory(ARRAY(
+        SELECT o.organization_id FROM old_rows o
+        JOIN new_rows n ON n.location_id = o.location_id
+        WHERE o.organization_id IS DISTINCT FROM n.organization_id
+            OR ST_AsBinary(o.shape) IS DISTINCT FROM ST_AsBinary(n.shape)
+        UNION
+        SELECT n.organization_id FROM old_rows o
+        JOIN new_rows n ON n.location_id = o.location_id
+        WHERE o.organization_id IS DISTINCT FROM n.organization_id
+            OR ST_AsBinary(o.shape) IS DISTINCT FROM ST_AsBinary(n.shape)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION location_territory_d() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_organization_territory(
+        ARRAY(SELECT DISTINCT organization_id FROM old_rows WHERE shape IS NOT NULL)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS location_territory_i_tgr ON location_location;
+CREATE TRIGGER location_territory_i_tgr
+AFTER INSERT ON location_location
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE location_territory_i();
+
+DROP TRIGGER IF EXISTS location_territory_u_tgr ON location_location;
+CREATE TRIGGER location_territory_u_tgr
+AFTER UPDATE ON location_location
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE location_territory_u();
+
+DROP TRIGGER IF EXISTS location_territory_d_tgr ON location_location;
+CREATE TRIGGER location_territory_d_tgr
+AFTER DELETE ON location_location
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE location_territory_d();
+
+
+SELECT refresh_organization_territory(ARRAY(SELECT id FROM organizations_organization));
@@ -0,0 +1,29 @@
+from celery.utils.log import get_task_logger
+
+from hikster.celery import app
+from .loads import flush_loads
+from .retention import compact_loads, prune_daily_load_counts
+
+logger = get_task_logger(__name__)
+
+
+@app.task(name="flush_loads_task")
+def flush_loads_task():
+    """
+    Save the buffered widget and page loads, see organizations.loads.
+    """
+    count = flush_loads()
+    logger.info(f"{count} loads saved")
+    return count
+
+
+@app.task(name="compact_loads_task")
+def compact_loads_task():
+    """
+    Compact the loads older than the retention period in the daily counts and
+    delete the old daily counts, see organizations.retention.
+    """
+    compacted = compact_loads()
+    pruned = prune_daily_load_counts()
+    logger.info(f"{compacted} daily load counts written, {pruned} deleted")
+    return compacted, pruned
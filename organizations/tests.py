@@ -1,3 +1,126 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase, override_settings
+
+from hikster.organizations.loads import MAX_PAGE_LOAD_ATTEMPTS, MemoryLoadBuffer, flush_loads
+
+
+def widget_load(key):
+    return {"type": "widget", "key": key, "organization_id": 1}
+
+
+def page_load(key):
+    return {"type": "page", "widget_load_key": key, "organization_id": 1}
+
+
+def unmatched_page_loads(loads):
+    return [load for load in loads if load["type"] == "page"]
+
+
+@override_settings(LOAD_BUFFER="memory")
+class LoadBufferTestCase(SimpleTestCase):
+    def setUp(self):
+        self.buffer = MemoryLoadBuffer()
+        self.buffer.loads.clear()
+        self.buffer.failed.clear()
+        self.addCleanup(self.buffer.loads.clear)
+        self.addCleanup(self.buffer.failed.clear)
+
+    def fill(self, loads):
+        for load in loads:
+            self.buffer.push(load)
+
+    def test_memory_buffer(self):
+        loads = [widget_load(str(index)) for index in range(5)]
+        self.fill(loads)
+
+        self.assertEqual(self.buffer.pop(2), loads[:2])
+        self.buffer.requeue(loads[:2])
+        self.assertEqual(self.buffer.pop(3), loads[:3])
+        self.buffer.reject(loads[:1])
+        self.assertEqual(self.buffer.pop(10), loads[3:])
+        self.assertEqual(self.buffer.pop(10), [])
+        self.assertEqual(list(self.buffer.failed), loads[:1])
+
+    @mock.patch("hikster.organizations.loads.save_loads", return_value=[])
+    def test_flush_batches(self, save_loads):
+        self.fill([widget_load(str(index)) for index in range(5)])
+
+        self.assertEqual(flush_loads(batch_size=2), 5)
+        self.assertEqual(
+            [len(call[0][0]) for call in save_loads.call_args_list], [2, 2, 1]
+        )
+        self.assertEqual(len(self.buffer.loads), 0)
+
+    @mock.patch(
+        "hikster.organizations.loads.save_loads", side_effect=unmatched_page_loads
+    )
+    def test_flush_retry(self, save_loads):
+        pages = [page_load(str(index)) for index in range(3)]
+        self.fill([widget_load("a"), pages[0], widget_load("b"), *pages[1:]])
+
+        self.assertEqual(flush_loads(batch_size=2), 2)
+        # The page loads are put back after the flush, not read again by it
+        self.assertEqual(save_loads.call_count, 3)
+        self.assertEqual(list(self.buffer.loads), pages)
+        self.assertTrue(all(load["attempts"] == 1 for load in pages))
+
+        save_loads.reset_mock()
+        self.assertEqual(flush_loads(batch_size=2), 0)
+        self.assertEqual(save_loads.call_count, 2)
+        self.assertTrue(all(load["attempts"] == 2 for load in pages))
+
+    @mock.patch(
+        "hikster.organizations.loads.save_loads", side_effect=unmatched_page_loads
+    )
+    def test_flush_retry_limit(self, save_loads):
+        self.fill([page_load("a")])
+
+        for _ in range(MAX_PAGE_LOAD_ATTEMPTS):
+            flush_loads()
+        self.assertEqual(len(self.buffer.loads), 0)
+        self.assertEqual(
+            list(self.buffer.failed),
+            [{**page_load("a"), "attempts": MAX_PAGE_LOAD_ATTEMPTS}],
+        )
+
+    def test_flush_invalid_load(self):
+        def save_loads(loads):
+            if any(load.get("key") == "invalid" for load in loads):
+                raise IntegrityError
+            return []
+
+        loads = [widget_load("a"), widget_load("invalid"), widget_load("b")]
+        self.fill(loads)
+        with mock.patch("hikster.organizations.loads.save_loads", save_loads):
+            self.assertEqual(flush_loads(), 2)
+        self.assertEqual(list(self.buffer.failed), loads[1:2])
+        self.assertEqual(len(self.buffer.loads), 0)
+
+    def test_flush_database_error(self):
+        def save_loads(loads):
+            if any(load.get("key") == "b" for load in loads):
+                raise OperationalError
+            return unmatched_page_loads(loads)
+
+        loads = [page_load("a"), widget_load("a"), widget_load("b"), widget_load("c")]
+        self.fill(loads)
+        with mock.patch("hikster.organizations.loads.save_loads", save_loads):
+            with self.assertRaises(OperationalError):
+                flush_loads()
+
+        # Nothing is lost, and the next flush can run
+        self.assertEqual(list(self.buffer.loads), loads[2:] + loads[:1])
+        self.assertEqual(len(self.buffer.failed), 0)
+        self.assertTrue(self.buffer.lock().acquire(blocking=False))
+        self.buffer.lock().release()
+
+    @mock.patch("hikster.organizations.loads.save_loads", return_value=[])
+    def test_flush_running(self, save_loads):
+        self.fill([widget_load("a")])
+
+        with self.buffer.lock():
+            self.assertEqual(flush_loads(), 0)
+        save_loads.assert_not_called()
+        self.assertEqual(len(self.buffer.loads), 1)
@@ -0,0 +1,157 @@
+"""
+Bootstrap data of the map widget of the organizations, cached by token.
+
+Every widget load needs the organization of the token, its locations and
+their bounds, the activities and the POI categories, which rarely change.
+They are cached in the WIDGET_CACHE cache: the data of an organization under
+its token, invalidated when the organization, its widget or its locations
+change (see signals), and the activities and POI categories shared by all
+the tokens, invalidated when an activity or a POI type changes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.gis.db.models import Extent
+from django.core.cache import caches
+
+from hikster.hike.models import Activity
+from hikster.location.models import Location
+from hikster.location.utils import get_poi_categories
+
+from .models import Organization
+
+WIDGET_CACHE_KEY = "hikster:widget:{}"
+WIDGET_SHARED_CACHE_KEY = "hikster:widget-shared"
+
+# Upper bound of the staleness of the data changed without the ORM
+WIDGET_CACHE_TIMEOUT = 60 * 60
+
+
+def get_cache():
+    return caches[getattr(settings, "WIDGET_CACHE", "default")]
+
+
+def get_timeout():
+    return getattr(settings, "WIDGET_CACHE_TIMEOUT", WIDGET_CACHE_TIMEOUT)
+
+
+def get_cache_key(token):
+    # The tokens are free text, not all caches accept them in keys
+    return WIDGET_CACHE_KEY.format(hashlib.sha1(token.encode()).hexdigest())
+
+
+def get_bounds(extents):
+    """
+    Return the bounds of a list of (min_lng, min_lat, max_lng, max_lat)
+    extents, None if there is none.
+    """
+    if not extents:
+        return None
+    min_lngs, min_lats, max_lngs, max_lats = zip(*extents)
+    return {
+        "min_lng": min(min_lngs),
+        "min_lat": min(min_lats),
+        "max_lng": max(max_lngs),
+        "max_lat": max(max_lats),
+    }
+
+
+def load_organization_widget(token):
+    """
+    Return the cached data of the organization of a token, None if the token
+    is invalid.
+    """
+    organization = (
+        Organization.objects.filter(aid=token)
+        .values("pk", "widget__max_widget_loads", "widget__max_page_loads")
+        .first()
+    )
+    if organization is None:
+        return None
+
+    extents = (
+        Location.objects.filter(organization_id=organization["pk"])
+        .values("location_id")
+        .annotate(extent=Extent("shape"))
+        .values_list("location_id", "extent")
+    )
+    return {
+        "organization_id": organization["pk"],
+        "max_widget_loads": organization["widget__max_widget_loads"] or 0,
+        "max_page_loads": organization["widget__max_page_loads"] or 0,
+        # Extent of the shape of each location, None without shape
+        "locations": dict(extents),
+    }
+
+
+def load_shared_widget():
+    return {
+        "activities": list(Activity.objects.values("id", "name").order_by("id")),
+        "poi_categories": get_poi_categories(),
+    }
+
+
+def get_widget(token):
+    """
+    Return the bootstrap data of the widget of a token, None if the token is
+    invalid:
+
+    - organization_id
+    - max_widget_loads, max_page_loads: the quotas of the organization
+    - locations: the ids of the locations of the organization, mapped to
+      their extent
+    - activities, poi_categories: the filters of the map
+
+    :param token: the `aid` of the organization
+    """
+    if not token:
+        return None
+
+    cache = get_cache()
+    key = get_cache_key(token)
+    cached = cache.get_many([key, WIDGET_SHARED_CACHE_KEY])
+
+    organization = cached.get(key)
+    if organization is None:
+        organization = load_organization_widget(token)
+        if organization is None:
+            return None
+        cache.set(key, organization, get_timeout())
+
+    shared = cached.get(WIDGET_SHARED_CACHE_KEY)
+    if shared is None:
+        shared = load_shared_widget()
+        cache.set(WIDGET_SHARED_CACHE_KEY, shared, get_timeout())
+
+    return {**organization, **shared}
+
+
+def get_widget_bounds(widget, location_ids=None):
+    """
+    Return the bounds of the locations of a widget, of all of them by default.
+    """
+    locations = widget["locations"]
+    if location_ids is None:
+        location_ids = locations
+    return get_bounds(
+        [
+            locations[location_id]
+            for location_id in location_ids
+            if locations.get(location_id) is not None
+        ]
+    )
+
+
+def invalidate_widget(*tokens):
+    get_cache().delete_many([get_cache_key(token) for token in tokens if token])
+
+
+def invalidate_organization_widget(*organization_ids):
+    tokens = Organization.objects.filter(
+        pk__in=[pk for pk in organization_ids if pk is not None]
+    ).values_list("aid", flat=True)
+    invalidate_widget(*tokens)
+
+
+def invalidate_shared_widget():
+    get_cache().delete(WIDGET_SHARED_CACHE_KEY)
@@ -0,0 +1,120 @@
+"""
+Autosuggest of the location, trail and point of interest names.
+
+The names are matched unaccented and case-folded against the trigram indexes
+created by search/sql/10_autosuggest.sql: a name matches when it contains the
+term, or when one of its words is similar enough to the term (typo tolerance,
+see pg_trgm.word_similarity_threshold). Names starting with the term are ranked
+first, then the most similar names, then the shortest ones.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from hikster.hike.models import Trail
+from hikster.location.models import Location, PointOfInterest
+
+# Shorter terms match too many names to be useful
+MIN_LENGTH = 2
+
+DEFAULT_LIMIT = 12
+
+NORMALIZED_NAME = 'immutable_unaccent(lower({table}.name))'
+NORMALIZED_TERM = 'immutable_unaccent(lower(%s))'
+
+SUGGEST_SQL = """
+    SELECT {table}.{pk} FROM {table}
+    WHERE {table}.{pk} IN ({subquery}) AND (
+        {name} LIKE {term}
+        OR {term} <%% {name}
+    )
+    ORDER BY
+        {name} LIKE {term} DESC,
+        word_similarity({term}, {name}) DESC,
+        length({table}.name),
+        {table}.name
+    LIMIT %s
+"""
+
+
+def get_querysets():
+    """
+    Return the querysets of the suggested objects, by type.
+    """
+    return {
+        'location': Location.objects.all(),
+        'trail': Trail.objects.all(),
+        'poi': PointOfInterest.objects.filter(
+            Q(visible_in_map=1) & (~Q(category__in=[1, 4, 5]) | Q(premium=True))
+        ),
+    }
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def suggest_ids(queryset, term, limit=DEFAULT_LIMIT):
+    """
+    Return the primary keys of the objects of a queryset whose name matches
+    the term, best match first.
+
+    :param queryset: the candidate objects, its filters are applied in a
+        subquery
+    :param term: the term typed by the user
+    :param limit: the maximum number of results
+
+    """
+    term = (term or '').strip()
+    if len(term) < MIN_LENGTH or limit <= 0:
+        return []
+
+    model = queryset.model
+    table = model._meta.db_table
+    subquery, subquery_params = (
+        queryset.order_by().values('pk').query.sql_with_params()
+    )
+    sql = SUGGEST_SQL.format(
+        table=table,
+        pk=model._meta.pk.column,
+        subquery=subquery,
+        name=NORMALIZED_NAME.format(table=table),
+        term=NORMALIZED_TERM,
+    )
+
+    escaped = escape_like(term)
+    params = [
+        *subquery_params,
+        f'%{escaped}%',
+        term,
+        f'{escaped}%',
+        term,
+        limit,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def suggest(queryset, term, limit=DEFAULT_LIMIT):
+    """
+    Same as suggest_ids, but return the objects, loaded with the queryset.
+    """
+    ids = suggest_ids(queryset, term, limit)
+    objs = queryset.in_bulk(ids)
+    return [objs[pk] for pk in ids if pk in objs]
+
+
+def suggest_all(term, limits):
+    """
+    Return the suggestions of several types of objects.
+
+    :param limits: the maximum number of results of each type, by type (see
+        get_querysets)
+
+    :return: a dict of the suggested objects, by type
+
+    """
+    querysets = get_querysets()
+    return {
+        type: suggest(querysets[type], term, limit) for type, limit in limits.items()
+    }
@@ -7,11 +7,25 @@ from hikster.search.models import Index
 class Command(BaseCommand):
     help = 'Re-builds the index table'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of objects read and written at once.',
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write('Adding locations...')
-        for location in Location.objects.all():
-            Index.objects.add(location)
+        for model in (Location, Trail):
+            name = model._meta.verbose_name_plural
+            self.stdout.write(f'Adding {name}...')
+
+            def progress(done, total):
+                self.stdout.write(f'  {done}/{total}')
 
-        self.stdout.write('Adding trails...')
-        for trail in Trail.objects.all():
-            Index.objects.add(trail)
+            written, removed = Index.objects.rebuild(
+                model, chunk_size=options['chunk_size'], progress=progress
+            )
+            self.stdout.write(
+                f'{written} {name} indexes written, {removed} stale indexes removed'
+            )
@@ -1,11 +1,11 @@
 import os
-import tempfile
-
-from subprocess import call, PIPE
+import subprocess
+from multiprocessing import Pool
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db import connection
-from django.conf import settings
+from django.db import connection, connections, transaction
+
+from hikster.hike.geometry import use_numpy_engine
 
 try:
     from osgeo import gdal, osr
@@ -13,137 +13,337 @@ except ImportError:
     msg = "GDAL Python bindings are not available. Can not proceed."
     raise CommandError(msg)
 
+DEM_TABLE = "mnt"
 
-class Command(BaseCommand):
-    help = "Load DEM data (projecting and clipping it if necessary).\n"
-    help += "You may need to create a GDAL Virtual Raster if your DEM is "
-    help += "composed of several files.\n"
-    can_import_settings = True
+# Files loaded in the DEM table, to resume an interrupted load
+LOADED_FILES_TABLE = "mnt_loaded_file"
+
+RASTER_EXTENSIONS = (".tif", ".tiff")
+
+
+def check_file(dem_path):
+    # Open GDAL dataset
+    ds = gdal.Open(dem_path)
+    if ds is None:
+        raise CommandError("DEM format is not recognized by GDAL: %s" % dem_path)
+
+    # GDAL dataset check 1: ensure dataset has a known SRS
+    if ds.GetProjection() == "":
+        raise CommandError("DEM coordinate system is unknown: %s" % dem_path)
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(ds.GetProjection())
+
+    # GDAL dataset check 2: ensure dataset has a known extent
+    if ds.GetGeoTransform() is None:
+        raise CommandError("DEM extent is unknown: %s" % dem_path)
+
+
+def get_file_state(dem_path):
+    stat = os.stat(dem_path)
+    return stat.st_size, stat.st_mtime
 
-    def add_arguments(self, parser):
-        parser.add_argument(
-            "--replace",
-            action="store_true",
-            default=False,
-            help="Replace existing DEM if any.",
-        )
 
-    def get_tif_files(self):
-        root = "/home/freebsd/extracted_mnt"
+def get_overview_tables(overviews):
+    factors = [int(f) for f in overviews.split(",") if f.strip()]
+    return [(f"o_{factor}_{DEM_TABLE}", factor) for factor in factors]
 
-        directories = []
 
-        for filename in os.listdir(root):
-            directories.append(filename)
+def get_dem_tables(overviews):
+    return [DEM_TABLE] + [table for table, _ in get_overview_tables(overviews)]
 
-        tif_files = []
 
-        for directory in directories:
-            for filename in os.listdir(os.path.join(root, directory)):
-                if filename.endswith(".tif"):
-                    tif_files.append(f"{root}/{directory}/{filename}")
+def raster2pgsql(dem_path, options, mode="-a"):
+    # -Y: COPY statements instead of an INSERT by tile, -F: the name of the
+    # file of the tiles, to replace them when the file changes
+    cmd = ["raster2pgsql", mode, "-Y", "-F", "-s", str(options["srid"])]
+    cmd += ["-t", options["tile_size"]]
+    if options["overviews"]:
+        cmd += ["-l", options["overviews"]]
+    return cmd + [dem_path, DEM_TABLE]
 
-        return tif_files
 
-    def load_to_sql(self, dem_path, verbose=True):
-        # Open GDAL dataset
-        if not os.path.exists(dem_path):
-            raise CommandError("DEM file does not exists at: %s" % dem_path)
+class CopyData:
+    """
+    File-like object reading the data of a COPY statement from the
+    raster2pgsql output, up to the end-of-data marker.
+    """
 
-        ds = gdal.Open(dem_path)
-        if ds is None:
-            raise CommandError("DEM format is not recognized by GDAL.")
+    def __init__(self, stream):
+        self.stream = stream
 
-        # GDAL dataset check 1: ensure dataset has a known SRS
-        if ds.GetProjection() == "":
-            raise CommandError("DEM coordinate system is unknown.")
+    def readline(self, size=-1):
+        line = self.stream.readline()
+        if not line or line.rstrip(b"\r\n") == b"\\.":
+            return b""
+        return line
 
-        # Obtain dataset SRS
-        srs_r = osr.SpatialReference()
-        srs_r.ImportFromWkt(ds.GetProjection())
+    def read(self, size=-1):
+        return self.readline()
 
-        # Obtain project SRS
-        srs_p = osr.SpatialReference()
-        srs_p.ImportFromEPSG(settings.SRID)
 
-        # Obtain dataset BBOX
-        gt = ds.GetGeoTransform()
-        if gt is None:
-            raise CommandError("DEM extent is unknown.")
+def execute_output(cursor, stream):
+    """
+    Run the raster2pgsql output: the COPY statements are streamed, the other
+    statements are executed one by one.
+    """
+    for line in iter(stream.readline, b""):
+        statement = line.decode().strip()
+        if not statement or statement in ("BEGIN;", "END;", "COMMIT;"):
+            # The file is loaded in the transaction of the command
+            continue
+        if statement.startswith("COPY "):
+            cursor.copy_expert(statement, CopyData(stream))
+        else:
+            cursor.execute(statement)
 
-        # Allow GDAL objects to be garbage-collected
-        ds = None
-        srs_p = None
-        srs_r = None
 
-        if verbose:
-            self.stdout.write("Everything looks fine, we can start loading DEM\n")
+def delete_file_tiles(cursor, dem_path, options):
+    """
+    Delete the tiles of a previous load of a DEM file.
+    """
+    for table in get_dem_tables(options["overviews"]):
+        cursor.execute(
+            f"DELETE FROM {table} WHERE filename = %s", [os.path.basename(dem_path)]
+        )
+
 
-        # Unfortunately, PostGISRaster driver in GDAL does not have write mode
-        # so far. Therefore, we relay parameters to standard commands using
-        # subprocesses.
+def load_file(args):
+    """
+    Load a DEM file in its own transaction and record it as loaded. Run in the
+    worker processes.
+
+    :param args: the path of the file, the raster2pgsql options and whether
+        the file was already loaded
+
+    :return: the path and the error message, if any
+    """
+    dem_path, options, reload = args
+    try:
+        check_file(dem_path)
+        size, mtime = get_file_state(dem_path)
+        process = subprocess.Popen(
+            raster2pgsql(dem_path, options),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            if reload:
+                delete_file_tiles(cursor, dem_path, options)
+            execute_output(cursor, process.stdout)
+            if process.wait() != 0:
+                raise Exception(
+                    "raster2pgsql failed with exit code %d: %s"
+                    % (process.returncode, process.stderr.read().decode())
+                )
+            cursor.execute(
+                f"""
+                INSERT INTO {LOADED_FILES_TABLE} (path, size, mtime, date_loaded)
+                VALUES (%s, %s, %s, now())
+                ON CONFLICT (path) DO UPDATE SET
+                    size = EXCLUDED.size,
+                    mtime = EXCLUDED.mtime,
+                    date_loaded = EXCLUDED.date_loaded
+                """,
+                [dem_path, size, mtime],
+            )
+    except Exception as e:
+        return dem_path, "%s: %s" % (e.__class__.__name__, e)
+    finally:
+        connection.close()
+    return dem_path, None
 
-        # Step 2: Convert to PostGISRaster format
-        output = tempfile.NamedTemporaryFile()  # SQL code for raster creation
-        # cmd = "raster2pgsql -c -C -x -I -M -t 100x100 %s mnt %s" % (
-        #     dem_path,
-        #     "" if verbose else "2>/dev/null",
-        # )
 
-        cmd = "raster2pgsql -a -I -M -t 100x100 %s mnt %s" % (
-            dem_path,
-            "" if verbose else "2>/dev/null",
+class Command(BaseCommand):
+    help = "Load DEM data (GeoTIFF files, directories of GeoTIFF files or GDAL "
+    help += "Virtual Rasters) with raster2pgsql, in parallel.\n"
+    help += "The loaded files are recorded, an interrupted load is resumed "
+    help += "where it stopped when the command is run again."
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="DEM files or directories.")
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            default=False,
+            help="Replace existing DEM if any.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of files loaded at once.",
+        )
+        parser.add_argument("--srid", type=int, default=4326)
+        parser.add_argument("--tile-size", default="100x100")
+        parser.add_argument(
+            "--overviews",
+            default="4,16",
+            help="Overview factors, comma separated (empty for no overview).",
         )
-        try:
-            if verbose:
-                self.stdout.write("\n-- Relaying to raster2pgsql ------------\n")
-                self.stdout.write(cmd)
-            kwargs_raster2 = {"shell": True, "stdout": output.file, "stderr": PIPE}
-            ret = self.call_command_system(cmd, **kwargs_raster2)
-            if ret != 0:
-                raise Exception("raster2pgsql failed with exit code %d" % ret)
-        except Exception as e:
-            output.close()
-            msg = "Caught %s: %s" % (e.__class__.__name__, e)
-            raise CommandError(msg)
-
-        if verbose:
-            self.stdout.write("DEM successfully converted to SQL.\n")
-
-        # Step 3: Dump SQL code into database
-        if verbose:
-            self.stdout.write("\n-- Loading DEM into database -----------\n")
-
-        cur = connection.cursor()
-        output.file.seek(0)
-        for sql_line in output.file:
-            # if sql_line.startswith(b"CREATE TABLE"):
-            #     continue
-            cur.execute(sql_line)
-
-        cur.close()
-        output.close()
-        if verbose:
-            self.stdout.write("DEM successfully loaded.\n")
-        return
-
-    def load(self, verbose):
-        # Check if DEM table already exists
-        cur = connection.cursor()
-        sql = "SELECT * FROM raster_columns WHERE r_table_name = 'mnt'"
-        cur.execute(sql)
-        dem_exists = cur.rowcount != 0
-        cur.close()
-
-        for dem_path in self.get_tif_files():
-            self.load_to_sql(dem_path)
-
-        return
+
+    def get_dem_files(self, paths):
+        dem_files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, filenames in os.walk(path):
+                    dem_files += [
+                        os.path.join(root, filename)
+                        for filename in sorted(filenames)
+                        if filename.lower().endswith(RASTER_EXTENSIONS)
+                    ]
+            elif os.path.exists(path):
+                dem_files.append(path)
+            else:
+                raise CommandError("DEM file does not exists at: %s" % path)
+
+        # The tiles are tracked by file name
+        names = [os.path.basename(path) for path in dem_files]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise CommandError(
+                "DEM file names must be unique: %s" % ", ".join(duplicates)
+            )
+
+        return [os.path.abspath(path) for path in dem_files]
+
+    def prepare(self, dem_files, options):
+        """
+        Create the DEM, overview and loaded files tables if needed, empty them
+        with --replace.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {LOADED_FILES_TABLE} (
+                    path text PRIMARY KEY,
+                    size bigint NOT NULL,
+                    mtime double precision NOT NULL,
+                    date_loaded timestamp with time zone NOT NULL
+                )
+                """
+            )
+            cursor.execute("SELECT to_regclass(%s)", [DEM_TABLE])
+            dem_exists = cursor.fetchone()[0] is not None
+
+            if dem_exists and options["replace"]:
+                tables = get_dem_tables(options["overviews"]) + [LOADED_FILES_TABLE]
+                for table in tables:
+                    cursor.execute("SELECT to_regclass(%s)", [table])
+                    if cursor.fetchone()[0] is not None:
+                        cursor.execute(f"TRUNCATE {table}")
+
+            if dem_exists and not options["replace"]:
+                cursor.execute(
+                    """
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = %s AND column_name = 'filename'
+                    """,
+                    [DEM_TABLE],
+                )
+                if cursor.fetchone() is None:
+                    raise CommandError(
+                        "The DEM was loaded without the file names of the tiles, "
+                        "load it again with --replace."
+                    )
+
+            if not dem_exists:
+                # Prepare mode only creates the tables
+                output = subprocess.run(
+                    raster2pgsql(dem_files[0], options, mode="-p"),
+                    stdout=subprocess.PIPE,
+                    check=True,
+                ).stdout
+                cursor.execute(output.decode())
+
+    def get_loaded_files(self):
+        """
+        :return: the state (size, mtime) of the loaded files, by path
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT path, size, mtime FROM {LOADED_FILES_TABLE}")
+            return {path: (size, mtime) for path, size, mtime in cursor.fetchall()}
+
+    def get_pending_files(self, dem_files, loaded):
+        return [path for path in dem_files if loaded.get(path) != get_file_state(path)]
+
+    def finish(self, options):
+        """
+        Index the tiles and register the overviews.
+        """
+        with connection.cursor() as cursor:
+            for table in get_dem_tables(options["overviews"]):
+                cursor.execute(
+                    f"""
+                    CREATE INDEX IF NOT EXISTS {table}_rast_gist
+                    ON {table} USING gist (ST_ConvexHull(rast))
+                    """
+                )
+                cursor.execute(
+                    f"""
+                    CREATE INDEX IF NOT EXISTS {table}_filename
+                    ON {table} (filename)
+                    """
+                )
+                cursor.execute(f"ANALYZE {table}")
+
+            cursor.execute("SELECT o_table_name FROM raster_overviews")
+            registered = {row[0] for row in cursor.fetchall()}
+            for table, factor in get_overview_tables(options["overviews"]):
+                if table not in registered:
+                    cursor.execute(
+                        "SELECT AddOverviewConstraints(%s, 'rast', %s, 'rast', %s)",
+                        [table, DEM_TABLE, factor],
+                    )
 
     def handle(self, *args, **options):
-        verbose = options["verbosity"] != 0
-        self.load(True)
+        dem_files = self.get_dem_files(options["paths"])
+        if not dem_files:
+            raise CommandError("No DEM file found.")
+
+        self.prepare(dem_files, options)
+        loaded = self.get_loaded_files()
+        pending = self.get_pending_files(dem_files, loaded)
+        # A file moved since it was loaded has tiles under the same name
+        loaded_names = {os.path.basename(path) for path in loaded}
+        self.stdout.write(
+            f"{len(dem_files) - len(pending)} files already loaded, "
+            f"{len(pending)} files to load"
+        )
 
-    def call_command_system(self, cmd, **kwargs):
-        return_code = call(cmd, **kwargs)
-        return return_code
+        load_options = {
+            key: options[key] for key in ("srid", "tile_size", "overviews")
+        }
+
+        # The workers open their own connection
+        connections.close_all()
+        errors = []
+        with Pool(max(options["processes"], 1)) as pool:
+            results = pool.imap_unordered(
+                load_file,
+                [
+                    (path, load_options, os.path.basename(path) in loaded_names)
+                    for path in pending
+                ],
+            )
+            for done, (path, error) in enumerate(results, 1):
+                if error:
+                    errors.append(path)
+                    self.stderr.write(f"{path}: {error}")
+                else:
+                    self.stdout.write(f"  {done}/{len(pending)} {path}")
+
+        self.finish(options)
+
+        reloaded = any(os.path.basename(path) in loaded_names for path in pending)
+        if (options["replace"] or reloaded) and use_numpy_engine():
+            from hikster.hike.elevation import Dem
+
+            Dem.clear_cache()
+
+        if errors:
+            raise CommandError(
+                f"{len(errors)} files could not be loaded, run the command again "
+                "to retry them."
+            )
+        self.stdout.write("DEM successfully loaded.")
@@ -0,0 +1,22 @@
+import os
+
+from django.db import migrations
+
+
+def load_sql_statement_from_file(file_name):
+    file_path = os.path.join(os.path.dirname(__file__), "../sql", file_name)
+    sql_statement = open(file_path).read()
+    return sql_statement
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search", "0005_auto_20181110_2044"),
+        ("hike", "0067_shape_simplified"),
+        ("location", "0038_location_shape_simplified"),
+    ]
+
+    operations = [
+        migrations.RunSQL(load_sql_statement_from_file("10_autosuggest.sql"))
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import connection, models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 
 from hikster.hike.models import Trail
 from hikster.location.models import Location
@@ -10,6 +11,37 @@ from . import types
 
 INDEXABLE = (Trail, Location)
 
+# Relations read to compute the address of the indexed objects
+INDEX_SELECT_RELATED = {Trail: ('location__address',), Location: ('address',)}
+
+UPSERT_SQL = """
+    INSERT INTO {table} (name, obj_ct_id, obj_id, type, address, date_created, date_modified)
+    VALUES {values}
+    ON CONFLICT (obj_ct_id, obj_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        type = EXCLUDED.type,
+        address = EXCLUDED.address,
+        date_modified = EXCLUDED.date_modified
+    WHERE ({table}.name, {table}.type, {table}.address)
+        IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.type, EXCLUDED.address)
+"""
+
+DELETE_STALE_SQL = """
+    DELETE FROM {table} idx
+    WHERE idx.obj_ct_id = %s AND NOT EXISTS (
+        SELECT 1 FROM {obj_table} obj
+        WHERE obj.{obj_pk} = idx.obj_id AND obj.name IS NOT NULL AND obj.name <> ''
+    )
+"""
+
+
+def get_address(obj):
+    if hasattr(obj, 'location') and obj.location and obj.location.address:
+        return str(obj.location.address)
+    elif hasattr(obj, 'address') and obj.address:
+        return str(obj.address)
+    return None
+
 
 class IndexManager(models.Manager):
     def add(self, obj):
@@ -37,10 +69,9 @@ class IndexManager(models.Manager):
 
         idx.name = obj.name
         idx.type = obj.index_type
-        if hasattr(obj, 'location') and obj.location and obj.location.address:
-            idx.address = str(obj.location.address)
-        elif hasattr(obj, 'address') and obj.address:
-            idx.address = str(obj.address)
+        address = get_address(obj)
+        if address is not None:
+            idx.address = address
         idx.save()
 
         return idx
@@ -64,6 +95,127 @@ class IndexManager(models.Manager):
 
         idx.delete()
 
+    def bulk_add(self, objs):
+        """
+        Adds or updates the index of several objects of the same model in one
+        query. Unchanged indexes are not written.
+
+        :param objs: the objects to add to the index, their addresses relations
+            should be loaded (see INDEX_SELECT_RELATED)
+
+        :return: the number of indexes created or updated
+
+        """
+        objs = [obj for obj in objs if obj.name]
+        if not objs:
+            return 0
+
+        model = type(objs[0])
+        if model not in INDEXABLE:
+            raise Exception('Invalid index object')
+
+        ct = ContentType.objects.get_for_model(model)
+        now = timezone.now()
+        params = []
+        for obj in objs:
+            params += [
+                obj.name,
+                ct.pk,
+                getattr(obj, obj.id_field),
+                obj.index_type,
+                get_address(obj),
+                now,
+                now,
+            ]
+
+        sql = UPSERT_SQL.format(
+            table=self.model._meta.db_table,
+            values=', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(objs)),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def remove_stale(self, model):
+        """
+        Removes in one query the indexes of a model whose object was deleted
+        or has no name anymore.
+
+        :return: the number of removed indexes
+
+        """
+        ct = ContentType.objects.get_for_model(model)
+        sql = DELETE_STALE_SQL.format(
+            table=self.model._meta.db_table,
+            obj_table=model._meta.db_table,
+            obj_pk=model._meta.pk.column,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [ct.pk])
+            return cursor.rowcount
+
+    def update_objects(self, model, ids):
+        """
+        Synchronizes the indexes of some objects of a model with the database:
+        existing objects are added or updated, the indexes of deleted or
+        nameless objects are removed.
+
+        :return: the primary keys of the removed indexes
+
+        """
+        objs = list(
+            model.objects.filter(pk__in=ids)
+            .exclude(name__isnull=True)
+            .exclude(name='')
+            .select_related(*INDEX_SELECT_RELATED[model])
+        )
+        self.bulk_add(objs)
+
+        ct = ContentType.objects.get_for_model(model)
+        stale = self.filter(obj_ct=ct, obj_id__in=ids).exclude(
+            obj_id__in=[obj.pk for obj in objs]
+        )
+        removed = list(stale.values_list('pk', flat=True))
+        if removed:
+            self.filter(pk__in=removed).delete()
+
+        return removed
+
+    def rebuild(self, model, chunk_size=1000, progress=None):
+        """
+        Re-builds the indexes of a model, reading and writing the objects by
+        chunks, then removes the stale indexes.
+
+        :param progress: called with the number of objects done and the total
+            after each chunk
+
+        :return: the number of indexes created or updated and removed
+
+        """
+        queryset = (
+            model.objects.exclude(name__isnull=True)
+            .exclude(name='')
+            .select_related(*INDEX_SELECT_RELATED[model])
+            .order_by('pk')
+        )
+        total = queryset.count()
+        done = written = 0
+        last_pk = None
+
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+
+            written += self.bulk_add(chunk)
+            done += len(chunk)
+            last_pk = chunk[-1].pk
+            if progress is not None:
+                progress(done, total)
+
+        return written, self.remove_stale(model)
+
 
 class Index(models.Model):
     objects = IndexManager()
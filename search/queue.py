@@ -0,0 +1,59 @@
+"""
+Deferred indexing of the searchable objects.
+
+The saved and deleted objects are collected during the transaction and sent in
+one batch to update_search_index_task once it is committed. The task reads the
+objects from the database, so the same object saved many times is indexed once,
+and objects of a rolled back transaction are harmless.
+"""
+import threading
+import weakref
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+class FlushCallback:
+    """
+    The on_commit callback of a queue. The queue only keeps a weak reference
+    to it: once run, or discarded by a rollback, the callback is freed and
+    the queue knows it must register a new one.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __call__(self):
+        self.queue.flush()
+
+
+class IndexQueue(threading.local):
+    def __init__(self):
+        self.pending = defaultdict(set)
+        # Weak references to the registered callbacks, by connection
+        self.scheduled = {}
+
+    def add(self, obj, using=DEFAULT_DB_ALIAS):
+        self.pending[obj._meta.label].add(obj.pk)
+
+        # The flush may have been discarded by a rollback, register it again
+        if not self.is_scheduled(using):
+            callback = FlushCallback(self)
+            self.scheduled[using] = weakref.ref(callback)
+            transaction.on_commit(callback, using=using)
+
+    def is_scheduled(self, using):
+        callback = self.scheduled.get(using)
+        return callback is not None and callback() is not None
+
+    def flush(self):
+        from .tasks import update_search_index_task
+
+        self.scheduled.clear()
+        pending = {label: sorted(ids) for label, ids in self.pending.items()}
+        self.pending.clear()
+        if pending:
+            update_search_index_task.delay(pending)
+
+
+queue = IndexQueue()
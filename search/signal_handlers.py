@@ -1,13 +1,14 @@
 from django.db.models.signals import post_delete, post_save
 
-from .models import INDEXABLE, Index
+from .models import INDEXABLE
+from .queue import queue
 
 
-def add_to_index(sender, instance, created, **kwargs):
+def add_to_index(sender, instance, created, using, **kwargs):
     if not isinstance(instance, INDEXABLE):
         return
 
-    Index.objects.add(instance)
+    queue.add(instance, using=using)
 
 
 post_save.connect(add_to_index, dispatch_uid='add-to-index')
@@ -17,7 +18,7 @@ def remove_from_index(sender, instance, using, **kwargs):
     if not isinstance(instance, INDEXABLE):
         return
 
-    Index.objects.remove(instance)
+    queue.add(instance, using=using)
 
 
 post_delete.connect(remove_from_index, dispatch_uid='remove-from-index')
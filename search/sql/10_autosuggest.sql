@@ -0,0 +1,21 @@
+-- Trigram indexes of the unaccented, lower case names used by the autosuggest
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent is only STABLE, it can not be used in an index without this wrapper
+CREATE OR REPLACE FUNCTION immutable_unaccent(value text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, value);
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+DROP INDEX IF EXISTS location_location_name_trgm_idx;
+CREATE INDEX location_location_name_trgm_idx ON location_location
+USING gin (immutable_unaccent(lower(name)) gin_trgm_ops);
+
+DROP INDEX IF EXISTS hike_trail_name_trgm_idx;
+CREATE INDEX hike_trail_name_trgm_idx ON hike_trail
+USING gin (immutable_unaccent(lower(name)) gin_trgm_ops);
+
+DROP INDEX IF EXISTS location_pointofinterest_name_trgm_idx;
+CREATE INDEX location_pointofinterest_name_trgm_idx ON location_pointofinterest
+USING gin (immutable_unaccent(lower(name)) gin_trgm_ops);
@@ -0,0 +1,35 @@
+from celery.utils.log import get_task_logger
+from django.apps import apps
+from haystack import connections
+
+from hikster.celery import app
+from .models import Index
+
+logger = get_task_logger(__name__)
+
+
+@app.task(name='update_search_index_task')
+def update_search_index_task(pending):
+    """
+    Updates the index table and the search engine for the objects collected
+    by the indexing queue.
+
+    :param pending: the primary keys of the objects by model label
+    """
+    backend = connections['default'].get_backend()
+    search_index = connections['default'].get_unified_index().get_index(Index)
+
+    for label, ids in pending.items():
+        model = apps.get_model(label)
+        removed = Index.objects.update_objects(model, ids)
+
+        indexes = Index.objects.filter(
+            obj_ct__app_label=model._meta.app_label,
+            obj_ct__model=model._meta.model_name,
+            obj_id__in=ids,
+        )
+        backend.update(search_index, indexes)
+        for pk in removed:
+            backend.remove(f'search.index.{pk}')
+
+        logger.info(f'{label}: {len(ids)} objects indexed, {len(removed)} removed')
@@ -1,8 +1,11 @@
 from haystack.query import SearchQuerySet
 from rest_framework.generics import ListAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Q
 from ..location.models import Location
 from ..hike.models import Trail
+from . import autosuggest
 from .models import Index
 from .serializers import IndexSerializer
 
@@ -28,4 +31,36 @@ class SearchView(ListAPIView):
             trail_ids  = list(Trail.objects.filter(location_id__in=location_ids).values_list('trail_id', flat=True))
             q_set = q_set.filter(Q(type='network', obj_id__in=location_ids) | Q(type='trail', obj_id__in=trail_ids))
 
-        return q_set
\ No newline at end of file
+        return q_set
+
+
+class AutosuggestView(APIView):
+    """
+    Suggestions of locations, trails and points of interest for a term.
+
+    The number of suggestions of each type can be given in the location,
+    trail and poi parameters (0 to skip a type).
+
+    Example request: /search/autosuggest/?search_term=mont&trail=0
+    """
+    default_limit = 5
+    max_limit = 20
+
+    def get_limits(self):
+        limits = {}
+        for type in autosuggest.get_querysets():
+            try:
+                limit = int(self.request.GET.get(type, self.default_limit))
+            except ValueError:
+                limit = self.default_limit
+            limits[type] = max(0, min(limit, self.max_limit))
+        return limits
+
+    def get(self, request):
+        suggestions = autosuggest.suggest_all(
+            request.GET.get('search_term'), self.get_limits()
+        )
+        return Response({
+            type: [{'id': obj.pk, 'name': obj.name} for obj in objs]
+            for type, objs in suggestions.items()
+        })
@@ -1,11 +1,11 @@
-from django.contrib.gis.db.models import Extent
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import TemplateView
 
 from hikster.hike.models import Activity, Trail, TrailActivity
-from hikster.location.models import Location
 from hikster.location.utils import get_poi_categories
-from hikster.organizations.models import Organization, WidgetLoad
+from hikster.organizations.loads import record_widget_load
+from hikster.organizations.models import Organization
+from hikster.organizations.widget import get_widget, get_widget_bounds
 
 
 class SearchView(TemplateView):
@@ -50,58 +50,48 @@ class SearchViewIframe(TemplateView):
             context["error_message"] = _("Unauthorized organization")
             return context
 
-        organization = Organization.objects.filter(aid=token).first()
-        if not organization:
+        widget = get_widget(token)
+        if not widget:
             context["error_message"] = _("Invalid organization")
             return context
 
-        if organization.consumed_max_widget_loads:
+        organization = Organization(pk=widget["organization_id"])
+        widget_loads = organization.get_load_counts()["widget_loads"]
+        if widget_loads >= widget["max_widget_loads"]:
             context["error_message"] = _(
                 "You have exceeded the monthly map load limit."
             )
             return context
 
-        locations = Location.objects.filter(organization=organization)
-        if not locations.exists():
+        locations = list(widget["locations"])
+        if not locations:
             context["error_message"] = _("Organization without location")
             return context
 
         if arg_locations:
-            locations = locations.filter(location_id__in=location_ids)
-            if not locations.exists():
+            locations = [i for i in locations if i in location_ids]
+            if not locations:
                 context["error_message"] = _(
                     "These locations do not apply to the organization"
                 )
                 return context
 
-        widget_load = WidgetLoad.objects.create(
-            organization=organization, referrer=request.META.get("HTTP_REFERER", "")
+        widget_load_key = record_widget_load(
+            organization, referrer=request.META.get("HTTP_REFERER", "")
         )
 
         request.session["widget_org_id"] = organization.pk
-        request.session["widget_load_id"] = widget_load.pk
-        bounds = locations.aggregate(Extent("shape"))["shape__extent"]
+        request.session["widget_load_key"] = widget_load_key
 
-        loc_arg = list(locations.values_list("location_id", flat=True))
-        loc_arg = [str(i) for i in loc_arg]
-        loc_arg = ",".join(loc_arg)
-
-        context["activities"] = list(
-            Activity.objects.values("id", "name").order_by("id")
-        )
+        context["activities"] = widget["activities"]
         context["types"] = Trail.PATH_TYPES
         context["difficulties"] = TrailActivity.DIFFICULTY_CHOICES
         context["map_style"] = "widget"
-        context["poi_categories"] = get_poi_categories()
+        context["poi_categories"] = widget["poi_categories"]
         context["default_sport"] = 1
         context["inner_discovery"] = True
-        context["locations"] = loc_arg
-        context["bounds"] = {
-            "min_lng": bounds[0],
-            "min_lat": bounds[1],
-            "max_lng": bounds[2],
-            "max_lat": bounds[3],
-        }
-
-        context["token"] = organization is not None
+        context["locations"] = ",".join(str(i) for i in locations)
+        context["bounds"] = get_widget_bounds(widget, locations)
+
+        context["token"] = True
         return context
@@ -190,3 +190,46 @@ SESSION_COOKIE_SAMESITE = None
 
 # default key for dev
 THUNDERFOREST_KEY = "9808d4cd9b8049efaa10f74e075afb89"
+
+# Cache alias storing the trail section routing graphs (see hikster.hike.routing)
+ROUTING_GRAPH_CACHE = "default"
+ROUTING_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Bootstrap data of the map widget, by token (see hikster.organizations.widget)
+WIDGET_CACHE = "default"
+WIDGET_CACHE_TIMEOUT = 60 * 60
+
+# "postgis" drapes the trails on the DEM in the triggers, "numpy" with
+# hikster.hike.elevation (requires numpy)
+ELEVATION_ENGINE = "postgis"
+# Memory-mapped copies of the DEM tiles read by hikster.hike.elevation
+DEM_CACHE_DIR = os.path.join(PROJECT_DIR, "dem")
+
+# Buffer of the widget and page loads (see hikster.organizations.loads):
+# "redis" or "memory" (in the process, for the tests)
+LOAD_BUFFER = "redis"
+LOAD_BUFFER_FLUSH_INTERVAL = 30
+
+# Months of raw loads kept, the older ones are compacted in daily counts, and
+# months of daily counts kept (see hikster.organizations.retention)
+RAW_LOADS_RETENTION_MONTHS = 6
+DAILY_LOADS_RETENTION_MONTHS = 36
+
+# Interval of the computation of the event geometries left in the queue by the
+# writes without signal (.update(), SQL) or by a failed task, in seconds
+PENDING_EVENT_GEOMETRIES_INTERVAL = 5 * 60
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-loads": {
+        "task": "flush_loads_task",
+        "schedule": LOAD_BUFFER_FLUSH_INTERVAL,
+    },
+    "compact-loads": {
+        "task": "compact_loads_task",
+        "schedule": 60 * 60 * 24,
+    },
+    "update-pending-event-geometries": {
+        "task": "update_pending_event_geometries_task",
+        "schedule": PENDING_EVENT_GEOMETRIES_INTERVAL,
+    },
+}
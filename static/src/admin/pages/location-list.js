@@ -24,7 +24,6 @@ new Vue({
   },
   mounted() {
     this.setInitialData();
-    this.geoJSON = this.getGeojsonData("geojson-data");
     this.locations = this.getJsonData("locations-data");
     console.log(this.locations)
     this.locations = this.locations.map(item => {
@@ -34,7 +33,10 @@ new Vue({
     this.poiCategories = this.getJsonData("poi-categories-data");
     this.sport = defaultSport;
     this.initMap();
-    this.selectNetwork(this.geoJSON);
+    this.fetchGeojson(this.getJsonData("geojson-url")).then(geojson => {
+      this.geoJSON = geojson;
+      this.selectNetwork(this.geoJSON);
+    });
     this.sortData("name");
   },
   filters: {
@@ -59,6 +61,9 @@ new Vue({
       };
     },
     highlightLocation(locationId) {
+      if (!this.geoJSON) {
+        return;
+      }
       const geoJSON = this.geoJSON.features.find(item => {
         return Number.parseInt(item.properties.pk) == locationId;
       });
@@ -37,7 +37,6 @@ new Vue({
     };
   },
   mounted() {
-    this.geoJSON = this.getGeojsonData("geojson-data");
     this.trailSectionsGeojson = this.getGeojsonData("trail_sections_geojson");
     this.poiCategories = this.getJsonData("poi-categories-data");
     this.selectedCategory = this.getJsonData("selected-category-data");
@@ -55,6 +54,10 @@ new Vue({
       animate: true
     });
     this.setPois(this.getJsonData("poi-data"));
+    this.fetchGeojson(this.getJsonData("geojson-url")).then(geojson => {
+      this.geoJSON = geojson;
+      this.showPois(this.geoJSON);
+    });
     this.loading = false;
     $("#scrollable-container").removeClass("d-none");
   },
@@ -138,11 +141,12 @@ new Vue({
         headers: { "X-Requested-With": "XMLHttpRequest" }
       })
         .then(response => {
-          const geojson = response.data.geo_json;
-          if (geojson != "") {
-            this.geoJSON = JSON.parse(geojson);
-          }
           this.setPois(response.data.point_of_interests);
+          return this.fetchGeojson(response.data.geo_json_url);
+        })
+        .then(geojson => {
+          this.geoJSON = geojson;
+          this.showPois(this.geoJSON);
         })
         .catch(error => {
           console.log(error);
@@ -216,6 +220,9 @@ new Vue({
       return "";
     },
     highlightPoi(poiId) {
+      if (!this.geoJSON) {
+        return;
+      }
       const geoJSON = this.geoJSON.features.find(item => {
         return Number.parseInt(item.properties.pk) == poiId;
       });
@@ -33,8 +33,6 @@ new Vue({
   },
   mounted() {
     this.setInitialData();
-    // TODO:
-    this.geoJSON = this.getGeojsonData("geojson-data");
     this.activities = this.getJsonData("activities-data");
     this.selectedActivity = this.getJsonData("selected-activity-data");
     this.locations = this.getJsonData("locations-data");
@@ -44,7 +42,10 @@ new Vue({
 
     this.setTrails(this.getJsonData("trails-data"));
     this.initMap();
-    this.selectNetwork(this.geoJSON);
+    this.fetchGeojson(this.getJsonData("geojson-url")).then(geojson => {
+      this.geoJSON = geojson;
+      this.selectNetwork(this.geoJSON);
+    });
     this.sortData("name");
     this.loading = false;
     $("#scrollable-container").removeClass("d-none");
@@ -110,13 +111,12 @@ new Vue({
         headers: { "X-Requested-With": "XMLHttpRequest" }
       })
         .then(response => {
-          const geojson = response.data.geo_json;
           this.setTrails(response.data.trails);
-
-          if (geojson != "") {
-            this.geoJSON = JSON.parse(geojson);
-            this.selectNetwork(this.geoJSON);
-          }
+          return this.fetchGeojson(response.data.geo_json_url);
+        })
+        .then(geojson => {
+          this.geoJSON = geojson;
+          this.selectNetwork(this.geoJSON);
         })
         .catch(error => {
           console.log(error);
@@ -165,6 +165,9 @@ new Vue({
         });
     },
     highlightTrail(trailId) {
+      if (!this.geoJSON) {
+        return;
+      }
       const geoJSON = this.geoJSON.features.find(item => {
         return Number.parseInt(item.properties.pk) == trailId;
       });
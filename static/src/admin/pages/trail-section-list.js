@@ -82,7 +82,6 @@ new Vue({
   },
   mounted() {
     this.setInitialData();
-    this.geoJSON = this.getGeojsonData("geojson-data");
     this.trailSections = this.getJsonData("trail-sections-data");
     const activities = [
       {
@@ -101,7 +100,10 @@ new Vue({
       this.setTrailSectionsByActivity();
       this.updateSelectedActivity(this.activities[0]);
     }
-    this.setMapSections();
+    this.fetchGeojson(this.getJsonData("geojson-url")).then(geojson => {
+      this.geoJSON = geojson;
+      this.setMapSections();
+    });
   },
   methods: {
     ...mapMethods,
@@ -129,6 +131,9 @@ new Vue({
       // this.updateTrailLayer({ sport: this.sport });
     },
     setMapSections() {
+      if (!this.geoJSON) {
+        return;
+      }
       if (this.hasTrailSections) {
         this.selectNetwork(this.filteredGeoJSON);
       } else {
@@ -201,11 +206,13 @@ new Vue({
               }
             }
 
-            const idx = this.geoJSON.features.findIndex(
-              f => Number.parseInt(f.properties.pk) == id
-            );
-            if (idx >= 0) {
-              this.geoJSON.features.splice(idx, 1);
+            if (this.geoJSON) {
+              const idx = this.geoJSON.features.findIndex(
+                f => Number.parseInt(f.properties.pk) == id
+              );
+              if (idx >= 0) {
+                this.geoJSON.features.splice(idx, 1);
+              }
             }
           });
           this.setMapSections();
@@ -219,6 +226,9 @@ new Vue({
         });
     },
     highlightTrailSection(trailSectionId) {
+      if (!this.geoJSON) {
+        return;
+      }
       const geoJSON = this.geoJSON.features.find(item => {
         return Number.parseInt(item.properties.pk) == trailSectionId;
       });
@@ -1,3 +1,5 @@
+import axios from "axios";
+
 export const mapUtils = {
   isTrailPage() {
     return mapStyle === "trail";
@@ -80,6 +82,15 @@ export const mapUtils = {
     );
   },
 
+  fetchGeojson(url) {
+    /**
+     * Fetches a GeoJSON FeatureCollection, e.g. the features of a list page
+     * @param {String} url The URL of the GeoJSON (?format=geojson)
+     * @return {Promise} Resolved with the FeatureCollection
+     */
+    return axios.get(url).then(response => response.data);
+  },
+
   geoJSONToTrailLayer(geoJSON, highlight = true) {
     let trailLayer;
     try {
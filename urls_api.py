@@ -8,6 +8,7 @@ from hikster.hike.views import (
     ActivityViewSet,
     EventTrailSectionViewSet,
     EventViewSet,
+    RouteView,
     Trail3DViewSet,
     TrailSectionViewSet,
     TrailViewSet,
@@ -15,7 +16,7 @@ from hikster.hike.views import (
 from hikster.location.views import LocationViewSet, PointOfInterestViewSet
 from hikster.mailing.views import ReservationMailView
 from hikster.organizations.views import OrganizationViewSet, ValidateWidgetView
-from hikster.search.views import SearchView
+from hikster.search.views import AutosuggestView, SearchView
 
 
 trail_routes = ExtendedDefaultRouter()
@@ -77,7 +78,9 @@ urlpatterns = [
     url(r"^", include(org_routes.urls)),
     url(r"^", include(activity_routes.urls)),
     url(r"^validate-widget", ValidateWidgetView.as_view()),
+    url(r"^route/$", RouteView.as_view()),
     url(r"^search/$", SearchView.as_view()),
+    url(r"^search/autosuggest/$", AutosuggestView.as_view()),
     url(r"^reservations/", ReservationMailView.as_view()),
     url(r"^api-auth/", include("rest_framework.urls")),
     url(
@@ -21,6 +21,11 @@ urlpatterns = [
         name="location-detail",
     ),
     path("poi/<int:pk>/", location_views.POIDetailView.as_view(), name="poi-detail"),
+    path(
+        "tiles/<slug:layer>/<int:z>/<int:x>/<int:y>.pbf",
+        core_views.TileView.as_view(),
+        name="tiles",
+    ),
     path("results/", search_views.SearchView.as_view(), name="search"),
     path(
         "map-widget/",
@@ -0,0 +1,148 @@
+"""
+GeoJSON output shared by the map views.
+
+The geometries are simplified, flattened to 2D and rounded by PostGIS, and the
+features are built around the ST_AsGeoJSON text, so no model instance nor GEOS
+geometry is created on the Python side. The rows are read with a server-side
+cursor and the collection can be streamed with GeoJSONStreamingResponse.
+"""
+import json
+
+from django.contrib.gis.db.models.functions import AsGeoJSON, GeomOutputGeoFunc
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Value
+from django.http import StreamingHttpResponse
+
+# Number of decimals of the coordinates, 6 decimals is about 10 cm
+PRECISION = 6
+FULL_PRECISION = 15
+
+# Zoom level of the overview maps of the site and the admin
+DISPLAY_ZOOM = 14
+
+# Tolerance of the precomputed <geometry>_simplified columns, in degrees.
+# Must match ft_simplify_geometry in hike/sql/90_simplified_geometry.sql
+SIMPLIFIED_TOLERANCE = 0.00004
+
+GEOMETRY_ALIAS = "geojson_geometry"
+
+# Number of rows fetched at once from the server-side cursor
+CHUNK_SIZE = 2000
+
+CRS = {"type": "name", "properties": {"name": "EPSG:4326"}}
+
+
+class Force2D(GeomOutputGeoFunc):
+    function = "ST_Force2D"
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    function = "ST_SimplifyPreserveTopology"
+
+
+def zoom_tolerance(zoom):
+    """
+    Return the simplification tolerance for a zoom level, in degrees: half of a
+    256px tile pixel at the equator.
+    """
+    return 180 / (256 * 2 ** zoom)
+
+
+def geometry_source(model, geometry_field, tolerance):
+    """
+    Return the field the geometry should be read from: the precomputed
+    simplified geometry when it is precise enough, the geometry otherwise.
+    """
+    if tolerance is None or tolerance < SIMPLIFIED_TOLERANCE:
+        return geometry_field
+
+    try:
+        model._meta.get_field(f"{geometry_field}_simplified")
+    except FieldDoesNotExist:
+        return geometry_field
+
+    return f"{geometry_field}_simplified"
+
+
+def geojson_values(
+    queryset,
+    geometry_field="shape",
+    fields=("pk",),
+    zoom=None,
+    tolerance=None,
+    precision=PRECISION,
+    force_2d=True,
+):
+    """
+    Return a values queryset of the properties and the GeoJSON geometry text.
+
+    :param geometry_field: name of the geometry field
+    :param fields: properties of the features, "pk" is output as a string like
+        the django geojson serializer does
+    :param zoom: zoom level the geometries are displayed at, used to compute the
+        tolerance when it is not given
+    :param tolerance: simplification tolerance, in degrees
+    :param precision: number of decimals of the coordinates
+    :param force_2d: drop the Z coordinates
+    """
+    if tolerance is None and zoom is not None:
+        tolerance = zoom_tolerance(zoom)
+
+    geometry = F(geometry_source(queryset.model, geometry_field, tolerance))
+    if force_2d:
+        geometry = Force2D(geometry)
+    if tolerance:
+        geometry = SimplifyPreserveTopology(geometry, Value(tolerance))
+
+    return (
+        queryset.prefetch_related(None)
+        .annotate(**{GEOMETRY_ALIAS: AsGeoJSON(geometry, precision=precision)})
+        .values(*fields, GEOMETRY_ALIAS)
+    )
+
+
+def feature(row):
+    """
+    Return the GeoJSON text of a feature from a row of geojson_values.
+    """
+    geometry = row.pop(GEOMETRY_ALIAS) or "null"
+    if "pk" in row:
+        row["pk"] = str(row["pk"])
+    properties = json.dumps(row, cls=DjangoJSONEncoder)
+    return f'{{"type": "Feature", "properties": {properties}, "geometry": {geometry}}}'
+
+
+def iter_geojson(queryset, chunk_size=CHUNK_SIZE, **kwargs):
+    """
+    Yield the GeoJSON FeatureCollection of a queryset piece by piece, see
+    geojson_values for the arguments.
+    """
+    crs = json.dumps(CRS)
+    yield f'{{"type": "FeatureCollection", "crs": {crs}, "features": ['
+
+    rows = geojson_values(queryset, **kwargs).iterator(chunk_size=chunk_size)
+    for index, row in enumerate(rows):
+        yield feature(row) if index == 0 else ", " + feature(row)
+
+    yield "]}"
+
+
+def serialize_geojson(queryset, **kwargs):
+    """
+    Serialize a queryset into a GeoJSON FeatureCollection. Replaces
+    serialize("geojson", ...), see geojson_values for the arguments.
+    """
+    return "".join(iter_geojson(queryset, **kwargs))
+
+
+class GeoJSONStreamingResponse(StreamingHttpResponse):
+    """
+    Stream the GeoJSON FeatureCollection of a queryset.
+    """
+
+    def __init__(self, queryset, chunk_size=CHUNK_SIZE, **kwargs):
+        super().__init__(
+            iter_geojson(queryset, chunk_size=chunk_size, **kwargs),
+            content_type="application/geo+json",
+        )